@@ -0,0 +1,139 @@
+# alternative to Executor that runs everything from a single asyncio event loop:
+# queue consumption, scheduled events and handlers. async handlers (ship actions, system, market, shipyard and
+# jump gate fetches) await shared AsyncClient requests concurrently (bounded by the rate limiter),
+# plain handlers - paging through listings with thread pools - are offloaded to threads.
+# ordering guarantees are the same as in Executor - events sharing a partition key run in queue order
+import asyncio
+from datetime import datetime, timezone
+from queue import Empty
+from threading import Thread
+
+from loguru import logger
+
+from event_queue import QueueEvent, ALL_PARTITIONS, EXIT_CMD, event_scope
+from global_params import GlobalParams
+from handle_result import HandleResult
+from handlers import handle_event_async
+
+
+class AsyncExecutor:
+    def __init__(self, params: GlobalParams, concurrency: int = 16):
+        self.__params = params
+        self.__concurrency = max(1, concurrency)
+
+        # created within the loop
+        self.__wakeup: asyncio.Event | None = None
+        self.__semaphore: asyncio.Semaphore | None = None
+
+        # last task queued for each partition key
+        self.__tails: dict[str, asyncio.Task] = {}
+        self.__tasks: set[asyncio.Task] = set()
+
+        self.__thread: Thread | None = None
+
+    def start(self):
+        self.__thread = Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        self.__thread.start()
+
+        logger.debug(f"Async executor started with concurrency {self.__concurrency}")
+
+    def join(self):
+        if self.__thread is not None:
+            self.__thread.join()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.__wakeup = asyncio.Event()
+        self.__semaphore = asyncio.Semaphore(self.__concurrency)
+
+        event_queue = self.__params.event_queue
+        # queue may be filled from any thread, wake the loop up when it happens
+        event_queue.add_listener(lambda: loop.call_soon_threadsafe(self.__wakeup.set))
+
+        try:
+            while True:
+                self.__wakeup.clear()
+
+                if not self.__drain_queue():
+                    break
+
+                await self.__wait_for_events()
+
+            if self.__tasks:
+                logger.debug(f"[async executor] exit requested, draining {len(self.__tasks)} events...")
+                await asyncio.wait(self.__tasks)
+            logger.debug("[async executor] exiting...")
+        finally:
+            await self.__params.client.aclose()
+
+    def __drain_queue(self) -> bool:
+        """
+        Starts tasks for queued (and due scheduled) events while there are free slots.
+        Returns False when exit was requested
+        """
+        # the rest stays in the queue, where more urgent events can still overtake them
+        while len(self.__tasks) < self.__concurrency:
+            try:
+                event: QueueEvent = self.__params.event_queue.get(block=False)
+            except Empty:
+                return True
+
+            if event.event_name == EXIT_CMD:
+                return False
+
+            self.__submit(event)
+        return True
+
+    async def __wait_for_events(self):
+        timeout = None
+        # with no free slots only a finished task matters
+        if len(self.__tasks) < self.__concurrency and (
+                next_time := self.__params.event_queue.next_scheduled_time()) is not None:
+            timeout = max(0.0, (next_time - datetime.now(tz=timezone.utc)).total_seconds())
+
+        try:
+            await asyncio.wait_for(self.__wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def __submit(self, event: QueueEvent):
+        keys = event.partition_keys
+
+        if ALL_PARTITIONS in keys:
+            # barrier waits for everything that's in flight
+            previous = set(self.__tasks)
+        else:
+            previous = {
+                self.__tails[key] for key in keys | {ALL_PARTITIONS} if key in self.__tails
+            }
+
+        task = asyncio.create_task(self.__run(event, previous))
+        self.__tasks.add(task)
+        for key in keys:
+            self.__tails[key] = task
+        task.add_done_callback(lambda done: self.__on_task_done(done, keys))
+
+    def __on_task_done(self, task: asyncio.Task, keys: frozenset[str]):
+        self.__tasks.discard(task)
+        # a slot has been freed
+        self.__wakeup.set()
+        for key in keys:
+            if self.__tails.get(key, None) is task:
+                del self.__tails[key]
+
+    async def __run(self, event: QueueEvent, previous: set[asyncio.Task]):
+        if previous:
+            await asyncio.wait(previous)
+
+        # requests are accounted to the event, events queued by its callbacks inherit its origin
+        # (tasks run in their own context copy, threads of sync handlers get a copy as well)
+        with event_scope(event):
+            async with self.__semaphore:
+                logger.debug(f"[async executor] executing {event}")
+                outcome = await handle_event_async(self.__params, event)
+
+            if outcome.result == HandleResult.SKIP:
+                logger.debug(f"{event} has been skipped by handler")
+            # notify event queue that processing for this event is complete
+            # this resolves its future and notifies all subscribers
+            self.__params.event_queue.event_done(event, outcome.result, outcome.response, outcome.error)
@@ -12,8 +12,10 @@ def bind_db():
     host = getenv("POSTGRESQL_HOST")
     port = getenv("POSTGRESQL_PORT")
 
+    # entities have to be declared before mapping
+    from database import crawl_state, ship, survey, system, trade_transaction  # noqa: F401
+    from database.migrations import migrate
+
     db.bind(provider="postgres", user=user, password=password, host=host, database=database, port=port)
+    migrate(db)
     db.generate_mapping(create_tables=True)
-
-
-
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from pony.orm import PrimaryKey, Optional, Required, Json
+
+from database import db
+
+
+class DBCrawlState(db.Entity):
+    _table_ = "crawl_state"
+
+    # name of the crawled listing, e.g. "systems"
+    name: str = PrimaryKey(str, auto=False)
+    # total item count reported by the API, unknown until the first page is fetched
+    total: int | None = Optional(int, nullable=True)
+    # numbers of pages already stored
+    done_pages: list[int] = Required(Json, default=[])
+    updated: datetime = Required(datetime, default=datetime.utcnow)
@@ -0,0 +1,96 @@
+# bulk upserts of crawled systems and waypoints. callers wrap them in a db_session,
+# so a whole chunk of pages lands in a single transaction.
+# systems and waypoints referenced before they are fetched (a market, a survey) are stored as stubs - symbol only,
+# without position - and filled in once the system listing or the waypoints arrive
+from typing import Iterable
+
+from pony.orm import select
+
+from database.crawl_state import DBCrawlState
+from database.system import DBSystem, DBWaypoint
+from space_traders_api_client.models import System, Waypoint
+from space_traders_api_client.types import Unset
+
+
+def get_crawl_state(name: str) -> DBCrawlState:
+    return DBCrawlState.get(name=name) or DBCrawlState(name=name)
+
+
+def get_system_row(system_symbol: str) -> DBSystem:
+    """
+    Stored system, a stub is stored when it isn't known yet
+    """
+    return DBSystem.get(symbol=system_symbol) or DBSystem(symbol=system_symbol)
+
+
+def get_waypoint_row(waypoint_symbol: str, system_symbol: str) -> DBWaypoint:
+    """
+    Stored waypoint, a stub (along with a stub system) is stored when it isn't known yet
+    """
+    return DBWaypoint.get(symbol=waypoint_symbol) or DBWaypoint(
+        symbol=waypoint_symbol, traits=[], system=get_system_row(system_symbol)
+    )
+
+
+def upsert_systems(systems: Iterable[System]) -> int:
+    """
+    Stores systems along with their (trait-less) waypoints. Returns count of new systems
+    """
+    systems = list(systems)
+    symbols = [system.symbol for system in systems]
+    existing = {db_system.symbol: db_system for db_system in select(s for s in DBSystem if s.symbol in symbols)}
+    waypoint_symbols = [waypoint.symbol for system in systems for waypoint in system.waypoints]
+    existing_waypoints = {
+        db_waypoint.symbol: db_waypoint
+        for db_waypoint in select(w for w in DBWaypoint if w.symbol in waypoint_symbols)
+    }
+
+    created = 0
+    for system in systems:
+        values = dict(sector=system.sector_symbol, coord_x=system.x, coord_y=system.y, type=str(system.type))
+        db_system = existing.get(system.symbol, None)
+        if db_system is None:
+            db_system = DBSystem(symbol=system.symbol, **values)
+            created += 1
+        else:
+            db_system.set(**values)
+
+        # positions are known from the system listing already, traits come with the waypoint crawl
+        for waypoint in system.waypoints:
+            values = dict(type=str(waypoint.type), coord_x=waypoint.x, coord_y=waypoint.y)
+            db_waypoint = existing_waypoints.get(waypoint.symbol, None)
+            if db_waypoint is None:
+                DBWaypoint(symbol=waypoint.symbol, traits=[], system=db_system, **values)
+            elif db_waypoint.coord_x is None:
+                db_waypoint.set(**values)
+
+    return created
+
+
+def upsert_waypoints(system_symbol: str, waypoints: Iterable[Waypoint], complete: bool = True):
+    """
+    Stores full waypoint data of a system. Complete listings mark the system crawled
+    """
+    db_system = get_system_row(system_symbol)
+    waypoints = list(waypoints)
+    symbols = [waypoint.symbol for waypoint in waypoints]
+    existing = {
+        db_waypoint.symbol: db_waypoint for db_waypoint in select(w for w in DBWaypoint if w.symbol in symbols)
+    }
+
+    for waypoint in waypoints:
+        values = dict(
+            type=str(waypoint.type), coord_x=waypoint.x, coord_y=waypoint.y,
+            faction=None if isinstance(waypoint.faction, Unset) else str(waypoint.faction.symbol),
+            traits=[str(trait.symbol) for trait in waypoint.traits],
+            chart=not isinstance(waypoint.chart, Unset),
+            data=waypoint.to_dict(),
+        )
+        db_waypoint = existing.get(waypoint.symbol, None)
+        if db_waypoint is None:
+            DBWaypoint(symbol=waypoint.symbol, system=db_system, **values)
+        else:
+            db_waypoint.set(**values)
+
+    if complete:
+        db_system.waypoints_crawled = True
@@ -0,0 +1,24 @@
+# schema changes of tables created by earlier versions. generate_mapping only creates missing tables,
+# so columns added or changed on existing ones are migrated here, before the mapping is generated.
+# every statement is idempotent and skips tables that don't exist yet - they run on every start
+from pony.orm import Database, db_session
+
+MIGRATIONS = [
+    # full API representation of fetched waypoints
+    'ALTER TABLE IF EXISTS "waypoints" ADD COLUMN IF NOT EXISTS "data" JSONB',
+    # stubs of systems and waypoints referenced before being fetched have no position
+    'ALTER TABLE IF EXISTS "systems" ALTER COLUMN "coord_x" DROP NOT NULL, ALTER COLUMN "coord_y" DROP NOT NULL',
+    'ALTER TABLE IF EXISTS "waypoints" ALTER COLUMN "coord_x" DROP NOT NULL, ALTER COLUMN "coord_y" DROP NOT NULL',
+    # supply is a level name (SCARCE, ABUNDANT, ...), not a number
+    'ALTER TABLE IF EXISTS "market_trades" ALTER COLUMN "supply" TYPE TEXT USING "supply"::TEXT',
+    'ALTER TABLE IF EXISTS "market_trades" '
+    'ADD COLUMN IF NOT EXISTS "updated" TIMESTAMP NOT NULL DEFAULT timezone(\'utc\', now())',
+    'ALTER TABLE IF EXISTS "shipyard_trades" '
+    'ADD COLUMN IF NOT EXISTS "updated" TIMESTAMP NOT NULL DEFAULT timezone(\'utc\', now())',
+]
+
+
+def migrate(db: Database):
+    with db_session:
+        for statement in MIGRATIONS:
+            db.execute(statement)
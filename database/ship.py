@@ -1,4 +1,4 @@
-from pony.orm import PrimaryKey, Optional, Json, Required
+from pony.orm import PrimaryKey, Optional, Json, Required, Set
 
 from database import db
 
@@ -22,3 +22,5 @@ class DBShip(db.Entity):
     engine = Optional(Json)
     modules = Optional(Json)
     mounts = Optional(Json)
+
+    transactions = Set("DBTradeTransaction")
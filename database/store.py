@@ -0,0 +1,203 @@
+# local store of fetched game data: upserts of API models and indexed lookups by system, waypoint and resource.
+# callers wrap these in a db_session, so a whole batch (e.g. a chunk of crawled pages) lands in a single transaction
+from datetime import datetime
+from typing import Iterable
+
+from pony.orm import select, count
+
+from database.galaxy import get_waypoint_row, get_system_row
+from database.survey import DBSurvey
+from database.system import DBSystem, DBWaypoint, DBMarketTrade, DBShipyardTrade
+from space_traders_api_client.models import (
+    Waypoint, Market, MarketTradeGood, MarketTradeGoodSupply, Shipyard, JumpGate, Survey
+)
+from space_traders_api_client.types import Unset
+
+
+def get_system_symbol(waypoint_symbol: str) -> str:
+    return "-".join(waypoint_symbol.split("-")[0:2])
+
+
+# systems and waypoints, upserts are in database.galaxy
+
+def get_waypoint_stub(waypoint_symbol: str) -> DBWaypoint:
+    # data referencing a waypoint can be stored before the waypoint itself is fetched
+    return get_waypoint_row(waypoint_symbol, get_system_symbol(waypoint_symbol))
+
+
+def get_waypoint(waypoint_symbol: str) -> Waypoint | None:
+    db_waypoint = DBWaypoint.get(symbol=waypoint_symbol)
+    if db_waypoint is None or db_waypoint.data is None:
+        return None
+    return Waypoint.from_dict(db_waypoint.data)
+
+
+def get_system_waypoints(system_symbol: str) -> list[Waypoint]:
+    return [
+        Waypoint.from_dict(data)
+        for data in select(w.data for w in DBWaypoint if w.system.symbol == system_symbol and w.data is not None)
+    ]
+
+
+def get_jump_gate_symbol(system_symbol: str) -> str | None:
+    return select(w.symbol for w in DBWaypoint if w.system.symbol == system_symbol and w.type == "JUMP_GATE").first()
+
+
+def get_system_summaries(system_symbols: list[str]) -> dict[str, tuple[int, int, int, bool]]:
+    """
+    System to (waypoints, marketplaces, shipyards, waypoints crawled); traits are only known for crawled systems
+    """
+    crawled = dict(select((s.symbol, s.waypoints_crawled) for s in DBSystem if s.symbol in system_symbols))
+    waypoints = dict(select((w.system.symbol, count(w)) for w in DBWaypoint if w.system.symbol in system_symbols))
+    markets = dict(select(
+        (w.system.symbol, count(w)) for w in DBWaypoint
+        if w.system.symbol in system_symbols and "MARKETPLACE" in w.traits
+    ))
+    shipyards = dict(select(
+        (w.system.symbol, count(w)) for w in DBWaypoint
+        if w.system.symbol in system_symbols and "SHIPYARD" in w.traits
+    ))
+    return {
+        symbol: (waypoints.get(symbol, 0), markets.get(symbol, 0), shipyards.get(symbol, 0), is_crawled)
+        for symbol, is_crawled in crawled.items()
+    }
+
+
+def upsert_jump_gate(waypoint_symbol: str, jump_gate: JumpGate):
+    """
+    Links connected systems to the gate waypoint, storing the systems not known yet
+    """
+    db_waypoint = get_waypoint_stub(waypoint_symbol)
+    symbols = [system.symbol for system in jump_gate.connected_systems]
+    existing = {db_system.symbol: db_system for db_system in select(s for s in DBSystem if s.symbol in symbols)}
+
+    connected = []
+    for system in jump_gate.connected_systems:
+        db_system = existing.get(system.symbol, None) or get_system_row(system.symbol)
+        if db_system.coord_x is None:
+            db_system.set(sector=system.sector_symbol, coord_x=system.x, coord_y=system.y, type=str(system.type))
+        connected.append(db_system)
+
+    db_waypoint.connected_systems = connected
+
+
+def get_system_coords() -> list[tuple[str, int, int]]:
+    # stubs have no position yet
+    return list(select((s.symbol, s.coord_x, s.coord_y) for s in DBSystem if s.coord_x is not None))
+
+
+def get_jump_links() -> list[tuple[str, str]]:
+    """
+    Charted jump gates as (gate system, connected system)
+    """
+    return list(select((w.system.symbol, s.symbol) for w in DBWaypoint for s in w.connected_systems))
+
+
+# markets and shipyards
+
+def upsert_market(market: Market):
+    """
+    Stores current trade goods of a market
+    """
+    if isinstance(market.trade_goods, Unset):
+        # prices are only visible with a ship present
+        return
+
+    db_waypoint = get_waypoint_stub(market.symbol)
+    existing = {trade.resource_symbol: trade for trade in db_waypoint.trades}
+    now = datetime.utcnow()
+
+    for good in market.trade_goods:
+        values = dict(
+            trade_volume=good.trade_volume, supply=str(good.supply), purchase_price=good.purchase_price,
+            sell_price=good.sell_price, updated=now
+        )
+        trade = existing.get(good.symbol, None)
+        if trade is None:
+            DBMarketTrade(waypoint=db_waypoint, resource_symbol=good.symbol, **values)
+        else:
+            trade.set(**values)
+
+
+def __to_trade_good(trade: DBMarketTrade) -> MarketTradeGood:
+    return MarketTradeGood(
+        symbol=trade.resource_symbol, trade_volume=trade.trade_volume, supply=MarketTradeGoodSupply(trade.supply),
+        purchase_price=trade.purchase_price, sell_price=trade.sell_price
+    )
+
+
+def get_system_markets(system_symbol: str) -> dict[str, Market]:
+    """
+    Stored markets of a system, with trade goods only
+    """
+    markets: dict[str, Market] = {}
+    trades = select(t for t in DBMarketTrade if t.waypoint.system.symbol == system_symbol).prefetch(DBWaypoint)
+    for trade in trades:
+        waypoint_symbol = trade.waypoint.symbol
+        market = markets.get(waypoint_symbol, None)
+        if market is None:
+            market = markets[waypoint_symbol] = Market(
+                symbol=waypoint_symbol, exports=[], imports=[], exchange=[], trade_goods=[]
+            )
+        market.trade_goods.append(__to_trade_good(trade))
+    return markets
+
+
+def find_resource_trades(resource_symbol: str, system_symbol: str | None = None) -> list[tuple[str, MarketTradeGood]]:
+    """
+    Markets trading the resource as (waypoint symbol, trade good), optionally within a system
+    """
+    trades = select(t for t in DBMarketTrade if t.resource_symbol == resource_symbol)
+    if system_symbol is not None:
+        trades = trades.filter(lambda t: t.waypoint.system.symbol == system_symbol)
+    return [(trade.waypoint.symbol, __to_trade_good(trade)) for trade in trades.prefetch(DBWaypoint)]
+
+
+def upsert_shipyard(shipyard: Shipyard):
+    if isinstance(shipyard.ships, Unset):
+        return
+
+    db_waypoint = get_waypoint_stub(shipyard.symbol)
+    existing = {trade.type: trade for trade in db_waypoint.ships}
+    now = datetime.utcnow()
+
+    for ship in shipyard.ships:
+        if isinstance(ship.type, Unset):
+            continue
+        values = dict(
+            purchase_price=ship.purchase_price, updated=now, frame=ship.frame.to_dict(),
+            reactor=ship.reactor.to_dict(), engine=ship.engine.to_dict(),
+            modules=[module.to_dict() for module in ship.modules], mounts=[mount.to_dict() for mount in ship.mounts]
+        )
+        trade = existing.get(str(ship.type), None)
+        if trade is None:
+            DBShipyardTrade(waypoint=db_waypoint, type=str(ship.type), **values)
+        else:
+            trade.set(**values)
+
+
+# surveys
+
+def insert_surveys(surveys: Iterable[Survey]):
+    """
+    Stores new surveys
+    """
+    for survey in surveys:
+        if DBSurvey.exists(signature=survey.signature):
+            continue
+        DBSurvey(
+            signature=survey.signature, deposits=[deposit.symbol for deposit in survey.deposits],
+            size=str(survey.size), expiration=survey.expiration, waypoint=get_waypoint_stub(survey.symbol)
+        )
+
+
+def get_survey(signature: str) -> Survey | None:
+    db_survey = DBSurvey.get(signature=signature)
+    return db_survey.build_request_body() if db_survey is not None else None
+
+
+def get_waypoint_surveys(waypoint_symbol: str, valid_at: datetime) -> list[Survey]:
+    return [
+        db_survey.build_request_body()
+        for db_survey in select(s for s in DBSurvey if s.waypoint.symbol == waypoint_symbol and s.expiration > valid_at)
+    ]
@@ -1,4 +1,6 @@
-from pony.orm import StrArray, Json, PrimaryKey, Optional, Required, Set
+from datetime import datetime
+
+from pony.orm import StrArray, Json, PrimaryKey, Optional, Required, Set, composite_key
 
 from database import db
 
@@ -8,50 +10,67 @@ class DBSystem(db.Entity):
 
     symbol: str = PrimaryKey(str, auto=False)
     sector: str = Optional(str)
-    coord_x: int = Required(int)
-    coord_y: int = Required(int)
-    type: str = Required(str)
+    # missing for stubs, systems referenced before being fetched
+    coord_x: int | None = Optional(int)
+    coord_y: int | None = Optional(int)
+    type: str = Optional(str)
+
+    # set once all waypoints of the system are stored (crawler checkpoint)
+    waypoints_crawled: bool = Required(bool, default=False, index=True)
 
-    waypoints: list["DBWaypoint"] | Set = Set("DBWaypoint")
+    waypoints: list["DBWaypoint"] | Set = Set("DBWaypoint", reverse="system")
+    # jump gates leading into this system
+    gates: list["DBWaypoint"] | Set = Set("DBWaypoint", reverse="connected_systems")
 
 
 class DBWaypoint(db.Entity):
     _table_ = "waypoints"
 
     symbol: str = PrimaryKey(str, auto=False)
-    type: str = Required(str)
-    coord_x: int = Required(int)
-    coord_y: int = Required(int)
+    # missing for stubs, waypoints referenced before being fetched
+    type: str = Optional(str)
+    coord_x: int | None = Optional(int)
+    coord_y: int | None = Optional(int)
     faction: str = Optional(str, nullable=True)
     traits: list[str] = Required(StrArray)
     chart: bool | None = Optional(bool, sql_default=False)
+    # full API representation, missing for waypoints known only from system listings
+    data: dict | None = Optional(Json)
 
-    system: "DBSystem" = Required(DBSystem)
+    system: "DBSystem" = Required(DBSystem, reverse="waypoints")
 
     # market trades
     trades: list["DBMarketTrade"] | Set = Set("DBMarketTrade")
     # shipyard trades
     ships: list["DBShipyardTrade"] | Set = Set("DBShipyardTrade")
     # gateway systems
-    connected_systems: list["DBWaypoint"] | Set = Set("DBSystem")
+    connected_systems: list["DBSystem"] | Set = Set("DBSystem", reverse="gates")
 
-    surveys: list["DBSurvey"]
+    surveys: list["DBSurvey"] | Set = Set("DBSurvey")
 
 
 class DBMarketTrade(db.Entity):
     _table_ = "market_trades"
-    resource_symbol: str = Required(str, auto=False, index=True)
+    resource_symbol: str = Required(str, index=True)
     trade_volume: int = Required(int)
-    supply: int = Required(int)
+    supply: str = Required(str)
     purchase_price: int = Required(int)
     sell_price: int = Required(int)
+    updated: datetime = Required(datetime, default=datetime.utcnow)
+
+    waypoint: "DBWaypoint" = Required(DBWaypoint)
+    composite_key(waypoint, resource_symbol)
 
 
 class DBShipyardTrade(db.Entity):
     _table_ = "shipyard_trades"
-    type = Required(str, auto=False, index=True)
+    type = Required(str, index=True)
 
     purchase_price: int = Required(int)
+    updated: datetime = Required(datetime, default=datetime.utcnow)
+
+    waypoint: "DBWaypoint" = Required(DBWaypoint)
+    composite_key(waypoint, type)
 
     # this is not great, ngl
     frame = Optional(Json)
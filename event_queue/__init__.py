@@ -1,62 +1,262 @@
 from collections import defaultdict
 from datetime import datetime, timezone
-from queue import Queue, PriorityQueue, Empty
-from threading import Lock
+from queue import Empty
+from threading import Lock, Condition
+from time import monotonic
 from traceback import format_exc
 from typing import Any, Callable, Iterable
 
 from loguru import logger
 
-from .event_types import EventType
-from .queue_event import QueueEvent
+from handle_result import HandleResult
+from .event_future import EventFuture
+from .context import current_event, current_origin, origin_scope, event_scope
+from .event_types import EventType, EventLane
+from .journal import EventJournal
+from .lanes import LaneQueue, OriginPolicy
+from .queue_event import QueueEvent, EventCallback, ALL_PARTITIONS, EXIT_CMD
+from .scheduler import EventScheduler
 
 
 class EventQueue:
     def __init__(self):
-        self.__queue = Queue()
         self.__current_id = 0
         self.__id_lock = Lock()
         # self.__event_lock = Lock()
 
-        self.__scheduled_lock = Lock()
-        self.__scheduled_events = PriorityQueue()
+        # guards both ready and scheduled events;
+        # consumers sleep on it until an event is queued or the earliest scheduled one is due
+        self.__condition = Condition()
+        # ready events by lane - higher lanes get more turns, per-key order is kept
+        self.__ready = LaneQueue()
+        self.__scheduled = EventScheduler()
 
+        # type-level broadcast, for observers interested in every event of a kind
         self.event_subscribers = defaultdict(dict)
+        # event id to callbacks of whoever queued it and its future; popped once the event is done
+        self.__completion_lock = Lock()
+        self.__completion_callbacks: dict[int, list[EventCallback]] = {}
+        self.__futures: dict[int, EventFuture] = {}
+        # called (from any thread) whenever an event is queued or scheduled, or held keys are released
+        self.__listeners: list[Callable[[], None]] = []
+        # persists pending events, if attached
+        self.__journal: EventJournal | None = None
 
     def get_new_id(self) -> int:
         with self.__id_lock:
             self.__current_id = self.__current_id + 1
             return self.__current_id
 
-    def get(self, *args, **kwargs):
-        return self.__queue.get(*args, **kwargs)
+    def get(self, block: bool = True, timeout: float | None = None) -> QueueEvent:
+        """
+        Returns the next ready event, moving due scheduled events into the queue first.
+        Raises queue.Empty if nothing is ready (immediately if not blocking, or after the timeout)
+        """
+        deadline = monotonic() + timeout if timeout is not None else None
 
-    def new_event(self, event_type: EventType, event_name: str, args: Any | None = None) -> QueueEvent:
+        with self.__condition:
+            while True:
+                self.__release_due()
+                # events of ships with a running (or retried) event are left for later
+                if (event := self.__ready.popleft()) is not None:
+                    return event
+
+                if not block:
+                    raise Empty
+
+                wait = self.__seconds_until_scheduled()
+                if deadline is not None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    wait = remaining if wait is None else min(wait, remaining)
+
+                self.__condition.wait(wait)
+
+    def __release_due(self):
+        # must be called with condition acquired
+        self.__ready.extend(self.__scheduled.pop_due(datetime.now(tz=timezone.utc)))
+
+    def __seconds_until_scheduled(self) -> float | None:
+        # must be called with condition acquired
+        next_time = self.__scheduled.peek_time()
+        if next_time is None:
+            return None
+        return max(0.0, (next_time - datetime.now(tz=timezone.utc)).total_seconds())
+
+    def new_event(self, event_type: EventType, event_name: str, args: Any | None = None,
+                  lane: EventLane = EventLane.NORMAL, origin: str | None = None) -> QueueEvent:
         new_id = self.get_new_id()
-        return QueueEvent(id=new_id, event_type=event_type, event_name=event_name, args=args)
+        return QueueEvent(
+            id=new_id, event_type=event_type, event_name=event_name, args=args, lane=lane,
+            origin=origin or current_origin.get()
+        )
 
-    def new_events_from(self, *src: tuple[EventType, str, Any | None]) -> list[QueueEvent]:
+    def new_events_from(self, *src: tuple[EventType, str, Any | None],
+                        lane: EventLane = EventLane.NORMAL, origin: str | None = None) -> list[QueueEvent]:
         return [
-            QueueEvent(id=self.get_new_id(), event_type=event_data[0], event_name=event_data[1], args=event_data[2])
+            self.new_event(event_data[0], event_data[1], event_data[2], lane, origin)
             for event_data in src
         ]
 
     def put(self, event_type: EventType | None = None, event_name: str | None = None, args: Any | None = None,
-            event: QueueEvent | None = None) -> int:
+            event: QueueEvent | None = None, on_done: EventCallback | None = None,
+            lane: EventLane = EventLane.NORMAL, origin: str | None = None) -> EventFuture:
         if event is None:
-            event = self.new_event(event_type, event_name, args)
+            event = self.new_event(event_type, event_name, args, lane, origin)
+
+        future = self.__get_future(event)
+        if on_done is not None:
+            self.on_complete(event.id, on_done)
+
+        if self.__is_journaled(event):
+            self.__journal.record_queued(event)
+
+        with self.__condition:
+            self.__ready.append(event)
+            self.__condition.notify_all()
+        self.__notify_listeners()
+
+        return future
+
+    def __is_journaled(self, event: QueueEvent) -> bool:
+        # exit must not be replayed on the next start
+        return self.__journal is not None and event.event_name != EXIT_CMD
+
+    def attach_journal(self, journal: EventJournal, replay: bool = False) -> int:
+        """
+        Starts journaling queue activity. With replay, assignments active in the previous run are queued again,
+        so strategies pick their ships up and plan from fresh state, along with pending events that don't act on
+        ships (fetches, crawl chunks). Pending ship actions are dropped: their completion callbacks are gone, and
+        scheduled ones would fire against state that has moved on. Returns amount of replayed events
+        """
+        pending, assignments = journal.load_pending() if replay else ([], [])
+
+        journal.open()
+        self.__journal = journal
+
+        replayed = 0
+        for previous_event in assignments:
+            self.put(event=self.__renew(previous_event))
+            replayed += 1
+
+        dropped = 0
+        for previous_event, when in pending:
+            if previous_event.ship_symbol is not None:
+                dropped += 1
+                continue
+
+            event = self.__renew(previous_event)
+            if when is None:
+                self.put(event=event)
+            else:
+                self.schedule(when, event)
+            replayed += 1
+
+        journal.commit()
+        if dropped:
+            logger.info(f"[journal] dropped {dropped} pending ship actions, their strategies plan again")
+        return replayed
+
+    def __renew(self, previous_event: QueueEvent) -> QueueEvent:
+        # events of the previous run get ids of this one
+        return self.new_event(
+            previous_event.event_type, previous_event.event_name, previous_event.args,
+            previous_event.lane, previous_event.origin
+        )
+
+    def remember_assignment(self, key: str, event: QueueEvent):
+        """
+        Keeps the event that assigned key (e.g. a ship) to a strategy, to be queued again on the next start
+        """
+        if self.__is_journaled(event):
+            self.__journal.record_assigned(key, event)
+
+    def forget_assignment(self, key: str):
+        if self.__journal is not None:
+            self.__journal.record_released(key)
+
+    def __get_future(self, event: QueueEvent) -> EventFuture:
+        with self.__completion_lock:
+            future = self.__futures.get(event.id, None)
+            if future is None:
+                future = self.__futures[event.id] = EventFuture(event)
+            return future
+
+    def get_future(self, event_id: int) -> EventFuture | None:
+        """
+        Future of a pending event, None if it's already done or unknown
+        """
+        with self.__completion_lock:
+            return self.__futures.get(event_id, None)
+
+    def on_complete(self, event_id: int, callback: EventCallback):
+        """
+        Calls back once this particular event has been successfully handled
+        """
+        with self.__completion_lock:
+            self.__completion_callbacks.setdefault(event_id, []).append(callback)
+
+    def __release(self, *events: QueueEvent):
+        # frees partition keys of done or cancelled events, events waiting for them become eligible
+        with self.__condition:
+            for event in events:
+                self.__ready.release(event)
+            self.__condition.notify_all()
+        self.__notify_listeners()
+
+    def __drop_callbacks(self, event_ids: Iterable[int]):
+        # cancelled events never run, their futures are cancelled as well
+        event_ids = list(event_ids)
+        if self.__journal is not None:
+            self.__journal.record_cancelled(event_ids)
+
+        with self.__completion_lock:
+            futures = []
+            for event_id in event_ids:
+                self.__completion_callbacks.pop(event_id, None)
+                if (future := self.__futures.pop(event_id, None)) is not None:
+                    futures.append(future)
+
+        for future in futures:
+            future.cancel()
+
+    def event_done(self, event: QueueEvent, result: HandleResult, response: Any | None = None,
+                   error: Exception | None = None):
+        # retried events will come back through the queue, notify only once they are done;
+        # until then they keep holding their partition keys
+        if result == HandleResult.RETRY:
+            logger.debug(f"{event} will be retried, notification postponed")
+            return
 
-        self.__queue.put(event)
+        self.__release(event)
 
-        return event.id
+        if self.__is_journaled(event):
+            self.__journal.record_done(event)
 
-    def event_done(self, event: QueueEvent, result: bool):
-        self.__queue.task_done()
+        with self.__completion_lock:
+            callbacks = self.__completion_callbacks.pop(event.id, None)
+            future = self.__futures.pop(event.id, None)
 
-        if result is False:
+        if result == HandleResult.FAIL:
             logger.debug(f"Failed to handle {event}, notification discarded!")
+            if future is not None:
+                future.set_exception(error or RuntimeError(f"Failed to handle {event}"))
+            return
+
+        if future is not None:
+            future.set_result(response)
+
+        # skipped events did nothing, there's nothing to react to
+        if result == HandleResult.SKIP:
             return
 
+        for callback in callbacks or []:
+            try:
+                callback(event, response)
+            except Exception as e:
+                logger.error(f"EXCEPTION IN QUEUE: {e}\n{format_exc()}")
+
         # with self.__event_lock:
         event_type_subscribers = self.event_subscribers.get(event.event_type, {})
         subscribers = event_type_subscribers.get(event.event_name, None)
@@ -67,39 +267,115 @@ class EventQueue:
             except Exception as e:
                 logger.error(f"EXCEPTION IN QUEUE: {e}\n{format_exc()}")
 
-    def schedule(self, when: datetime, event: QueueEvent | Iterable[QueueEvent]):
+    def schedule(self, when: datetime, event: QueueEvent | Iterable[QueueEvent], replace: bool = False,
+                 on_done: EventCallback | None = None) -> EventFuture | list[EventFuture]:
+        """
+        Schedules event(s) to be queued at `when`. Returns future of the event that will run (list for many):
+        identical ship events scheduled at the same time are coalesced into one.
+        With replace, previously scheduled events of the same name for the same ship are cancelled.
+        on_done is attached to every scheduled event
+        """
         if type(event) is not QueueEvent:
             logger.debug(f"Scheduled multiple events at {when}")
-            for _event in event:
-                self.schedule(when, _event)
-        else:
-            logger.debug(f"Scheduled {event} to enqueue {when}")
-            # while put itself is threadsafe, we're reading index in update
-            # which is NOT threadsafe as we can't access internal locks of queue reliably
-            # guarding with own lock instead
-            with self.__scheduled_lock:
-                self.__scheduled_events.put((when, event))
-
-    def update_scheduled(self):
-        current_time = datetime.now(tz=timezone.utc)
-        while True:
-            with self.__scheduled_lock:
-                try:
-                    scheduled = self.__scheduled_events.queue[0]
-                except (Empty, IndexError):
-                    break
-
-                # if the first-fetched item is in the future, the rest will be as well
-                # (because schedule is priority queue)
-                # so we can stop checking items at this point
-                # otherwise process item and proceed with the next iteration
-                if scheduled[0] > current_time:
-                    break
-
-                self.__scheduled_events.get()
-                # logger.debug(f"Re-queueing scheduled event - {scheduled}")
-                self.__queue.put(scheduled[1])
-                self.__scheduled_events.task_done()
+            return [self.schedule(when, _event, replace, on_done) for _event in event]
+
+        with self.__condition:
+            replaced = []
+            if replace and (ship_symbol := event.ship_symbol) is not None:
+                replaced = self.__scheduled.cancel_for_ship(ship_symbol, event.event_name)
+
+            scheduled = self.__scheduled.push(when, event)
+            # attach before releasing the condition, so an already due event can't complete without it
+            future = self.__get_future(scheduled)
+            if on_done is not None:
+                self.on_complete(scheduled.id, on_done)
+            # the new event may be due earlier than the one consumers are sleeping for
+            self.__condition.notify_all()
+
+        self.__drop_callbacks(replaced_event.id for replaced_event in replaced)
+        if replaced:
+            self.__release(*replaced)
+
+        if scheduled is not event:
+            logger.debug(f"{event} coalesced into already scheduled {scheduled}")
+            # the coalesced event never runs, a retry of it can't hold its ship back
+            self.__release(event)
+            return future
+
+        if self.__is_journaled(event):
+            self.__journal.record_scheduled(event, when)
+
+        logger.debug(f"Scheduled {event} to enqueue {when}")
+        self.__notify_listeners()
+        return future
+
+    def cancel(self, event_id: int) -> bool:
+        """
+        Removes a scheduled (or queued, but not yet taken) event
+        """
+        with self.__condition:
+            event = self.__scheduled.cancel(event_id)
+
+            if event is None:
+                event = next(iter(self.__ready.remove_if(lambda queued: queued.id == event_id)), None)
+
+        if event is None:
+            return False
+        self.__drop_callbacks((event_id,))
+        # a cancelled retry no longer holds back its ship
+        self.__release(event)
+        return True
+
+    def cancel_for_ship(self, ship_symbol: str, event_name: str | None = None) -> int:
+        """
+        Removes all pending (scheduled or queued, but not yet taken) events of a ship. Returns amount of them
+        """
+        with self.__condition:
+            cancelled = self.__scheduled.cancel_for_ship(ship_symbol, event_name)
+
+            cancelled.extend(self.__ready.remove_if(
+                lambda event: event.ship_symbol == ship_symbol and (event_name is None or event.event_name == event_name)
+            ))
+
+        self.__drop_callbacks(event.id for event in cancelled)
+        if cancelled:
+            self.__release(*cancelled)
+        logger.debug(f"Cancelled {len(cancelled)} pending events of {ship_symbol}")
+        return len(cancelled)
+
+    def reschedule(self, event_id: int, when: datetime) -> bool:
+        with self.__condition:
+            event = self.__scheduled.reschedule(event_id, when)
+            if event is None:
+                return False
+            self.__condition.notify_all()
+
+        if self.__is_journaled(event):
+            self.__journal.record_scheduled(event, when)
+        self.__notify_listeners()
+        return True
+
+    def set_lane_weights(self, weights: dict[EventLane, int]):
+        with self.__condition:
+            self.__ready.weights.update(weights)
+
+    def set_origin_policy(self, policy: OriginPolicy | None):
+        """
+        Lets the policy pass over ready events of some origins when handing out the next event
+        """
+        with self.__condition:
+            self.__ready.origin_policy = policy
+
+    def next_scheduled_time(self) -> datetime | None:
+        with self.__condition:
+            return self.__scheduled.peek_time()
+
+    def add_listener(self, callback: Callable[[], None]):
+        self.__listeners.append(callback)
+
+    def __notify_listeners(self):
+        for listener in self.__listeners:
+            listener()
 
     def subscribe(self, event_type: EventType, event_name: str, callback: Callable):
         if event_name not in self.event_subscribers[event_type]:
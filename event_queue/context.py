@@ -0,0 +1,37 @@
+# execution context shared between the executors, strategies and http hooks.
+# events created while another event runs inherit its origin, so strategy chains stay attributed to the strategy
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .queue_event import QueueEvent
+
+# event that is being handled right now (set per thread / per task)
+current_event: ContextVar[QueueEvent | None] = ContextVar("current_event", default=None)
+# origin assigned to new events, unless given explicitly
+current_origin: ContextVar[str | None] = ContextVar("current_origin", default=None)
+
+
+@contextmanager
+def origin_scope(origin: str | None):
+    """
+    Events created within are attributed to origin
+    """
+    token = current_origin.set(origin)
+    try:
+        yield
+    finally:
+        current_origin.reset(token)
+
+
+@contextmanager
+def event_scope(event: QueueEvent):
+    """
+    Marks event as the one being handled - for its handler and completion callbacks
+    """
+    event_token = current_event.set(event)
+    origin_token = current_origin.set(event.origin)
+    try:
+        yield
+    finally:
+        current_origin.reset(origin_token)
+        current_event.reset(event_token)
@@ -0,0 +1,25 @@
+from asyncio import wrap_future
+from concurrent.futures import Future
+
+from .queue_event import QueueEvent
+
+
+class EventFuture(Future):
+    """
+    Handle of a queued event, resolved with whatever its handler returned (usually parsed response data).
+    Holds the exception if the event has failed for good, None if it was skipped, and is cancelled with the event.
+    Can be waited for from threads (result) or awaited from the async executor loop
+    """
+    def __init__(self, event: QueueEvent):
+        super().__init__()
+        self.event = event
+
+    @property
+    def id(self) -> int:
+        return self.event.id
+
+    def __await__(self):
+        return wrap_future(self).__await__()
+
+    def __repr__(self):
+        return f"EventFuture[{self.event}]"
@@ -13,3 +13,14 @@ class EventType(str, Enum):
 
     def __str__(self) -> str:
         return str(self.value)
+
+
+class EventLane(str, Enum):
+    # revenue and cooldown-bound actions - selling, extracting, delivering
+    CRITICAL = "critical"
+    NORMAL = "normal"
+    # bulk jobs - market scans, crawlers
+    BACKGROUND = "background"
+
+    def __str__(self) -> str:
+        return str(self.value)
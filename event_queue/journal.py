@@ -0,0 +1,178 @@
+# append-only journal of queue activity, so pending events survive restarts.
+# records are buffered and written by a background thread, with a single fsync per batch.
+# every start compacts the journal: pending events of the previous run are re-queued (when replaying)
+# and written into a fresh file, which then atomically replaces the old one.
+# besides events, the journal keeps assignments - the strategy events that put a ship (or system) to work,
+# until they are replaced or released - so a restart can hand ships back to their strategies
+from datetime import datetime
+from json import dumps, loads
+from os import fsync, replace
+from threading import Thread, Condition, Lock
+from typing import Any, Iterable
+
+from loguru import logger
+
+from .event_types import EventType, EventLane
+from .queue_event import QueueEvent
+
+RECORD_QUEUED = "queued"
+RECORD_SCHEDULED = "scheduled"
+RECORD_DONE = "done"
+RECORD_CANCELLED = "cancelled"
+RECORD_ASSIGNED = "assigned"
+RECORD_RELEASED = "released"
+
+
+def _event_to_record(kind: str, event: QueueEvent, when: datetime | None = None) -> dict[str, Any]:
+    return {
+        "kind": kind,
+        "id": event.id,
+        "type": str(event.event_type),
+        "name": event.event_name,
+        "args": event.args,
+        "lane": str(event.lane),
+        "origin": event.origin,
+        "when": when.isoformat() if when is not None else None,
+    }
+
+
+def _record_to_event(record: dict[str, Any]) -> QueueEvent:
+    return QueueEvent(
+        id=record["id"], event_type=EventType(record["type"]), event_name=record["name"],
+        args=record["args"], lane=EventLane(record["lane"]), origin=record["origin"],
+    )
+
+
+class EventJournal:
+    def __init__(self, path: str, flush_interval: float = 0.5, batch_size: int = 256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self.__condition = Condition()
+        self.__buffer: list[str] = []
+        # taking a batch and writing it is one step, so batches land in the file in order
+        self.__write_lock = Lock()
+        self.__file = None
+        self.__closed = False
+        self.__thread: Thread | None = None
+
+    def load_pending(self) -> tuple[list[tuple[QueueEvent, datetime | None]], list[QueueEvent]]:
+        """
+        Events of the previous run that were queued or scheduled, but never done or cancelled, in journal order;
+        and assignments that were still active, in the order they were made
+        """
+        pending: dict[int, tuple[dict[str, Any], datetime | None]] = {}
+        assignments: dict[str, dict[str, Any]] = {}
+
+        try:
+            with open(self.path, "r") as src:
+                for line_number, line in enumerate(src, start=1):
+                    try:
+                        record = loads(line)
+                    except ValueError:
+                        # last line may be cut off by a crash
+                        logger.warning(f"[journal] skipping malformed record at line {line_number}")
+                        continue
+
+                    kind = record["kind"]
+                    if kind in (RECORD_DONE, RECORD_CANCELLED):
+                        pending.pop(record["id"], None)
+                    elif kind in (RECORD_ASSIGNED, RECORD_RELEASED):
+                        # a new assignment of the same key replaces the previous one
+                        assignments.pop(record["key"], None)
+                        if kind == RECORD_ASSIGNED:
+                            assignments[record["key"]] = record
+                    else:
+                        when = datetime.fromisoformat(record["when"]) if record["when"] else None
+                        # re-scheduling (retries) moves the event instead of duplicating it
+                        pending.pop(record["id"], None)
+                        pending[record["id"]] = (record, when)
+        except FileNotFoundError:
+            return [], []
+
+        return (
+            [(_record_to_event(record), when) for record, when in pending.values()],
+            [_record_to_event(record) for record in assignments.values()]
+        )
+
+    def open(self):
+        # fresh file next to the old one, replaces it on commit
+        self.__file = open(f"{self.path}.tmp", "w")
+        self.__thread = Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+
+    def commit(self):
+        """
+        Replaces the previous journal with the current one, once everything replayed is on disk
+        """
+        self.flush()
+        replace(f"{self.path}.tmp", self.path)
+
+    def __append(self, record: dict[str, Any]):
+        line = dumps(record, default=str)
+        with self.__condition:
+            if self.__file is None or self.__closed:
+                return
+            self.__buffer.append(line)
+            if len(self.__buffer) >= self.batch_size:
+                self.__condition.notify()
+
+    def record_queued(self, event: QueueEvent):
+        self.__append(_event_to_record(RECORD_QUEUED, event))
+
+    def record_scheduled(self, event: QueueEvent, when: datetime):
+        self.__append(_event_to_record(RECORD_SCHEDULED, event, when))
+
+    def record_done(self, event: QueueEvent):
+        self.__append({"kind": RECORD_DONE, "id": event.id})
+
+    def record_cancelled(self, event_ids: Iterable[int]):
+        for event_id in event_ids:
+            self.__append({"kind": RECORD_CANCELLED, "id": event_id})
+
+    def record_assigned(self, key: str, event: QueueEvent):
+        self.__append({**_event_to_record(RECORD_ASSIGNED, event), "key": key})
+
+    def record_released(self, key: str):
+        self.__append({"kind": RECORD_RELEASED, "key": key})
+
+    def __write_pending(self):
+        with self.__write_lock:
+            with self.__condition:
+                lines, self.__buffer = self.__buffer, []
+            if not lines:
+                return
+
+            try:
+                self.__file.write("\n".join(lines) + "\n")
+                self.__file.flush()
+                fsync(self.__file.fileno())
+            except OSError as e:
+                logger.error(f"[journal] failed to write {len(lines)} records: {e}")
+
+    def __write_loop(self):
+        while True:
+            with self.__condition:
+                # collect a batch, unless it fills up sooner
+                if len(self.__buffer) < self.batch_size and not self.__closed:
+                    self.__condition.wait(self.flush_interval)
+                closed = self.__closed
+
+            self.__write_pending()
+
+            if closed:
+                return
+
+    def flush(self):
+        self.__write_pending()
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+
+        if self.__thread is not None:
+            self.__thread.join()
+        if self.__file is not None:
+            self.__file.close()
@@ -0,0 +1,172 @@
+from collections import Counter, deque
+from itertools import count
+from typing import Callable, Iterable, Mapping
+
+from .event_types import EventLane
+from .queue_event import QueueEvent, ALL_PARTITIONS
+
+# relative share of handed out events while every lane has work
+DEFAULT_LANE_WEIGHTS = {
+    EventLane.CRITICAL: 6,
+    EventLane.NORMAL: 3,
+    EventLane.BACKGROUND: 1,
+}
+
+# ready events per origin to origins that have to wait this turn (e.g. RequestBudget.get_deferred)
+OriginPolicy = Callable[[Mapping[str | None, int]], set[str | None]]
+
+
+class LaneQueue:
+    """
+    Ready events split by lane, handed out with smooth weighted round-robin between lanes that have work.
+    Priority never breaks ordering: an event is only eligible while it is the oldest queued event for each of
+    its partition keys, and barrier events split the queue into before and after.
+    Keys of taken events stay held until they are done - or, for retried events, until the retry runs -
+    so later events of the same ship can't overtake an event that failed and comes back.
+    An origin policy may pass over eligible events of some origins, as long as other origins have eligible events.
+    Not thread-safe on its own - EventQueue guards it with its condition
+    """
+    def __init__(self, weights: dict[EventLane, int] | None = None, origin_policy: OriginPolicy | None = None):
+        self.weights = dict(weights or DEFAULT_LANE_WEIGHTS)
+        self.origin_policy = origin_policy
+
+        self.__sequence = count()
+        # [sequence, event] in arrival order
+        self.__lanes: dict[EventLane, deque[list]] = {lane: deque() for lane in EventLane}
+        # smooth weighted round-robin state
+        self.__current_weight: dict[EventLane, int] = {lane: 0 for lane in EventLane}
+        # partition key to ids of queued events in arrival order
+        self.__key_order: dict[str, deque[int]] = {}
+        # sequences of queued barrier events
+        self.__barriers: deque[int] = deque()
+        # partition key to id of the taken (running or waiting for a retry) event holding it
+        self.__held: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self.__lanes.values())
+
+    def append(self, event: QueueEvent):
+        sequence = next(self.__sequence)
+        self.__lanes[event.lane].append([sequence, event])
+
+        for key in event.partition_keys:
+            if key == ALL_PARTITIONS:
+                self.__barriers.append(sequence)
+                continue
+
+            order = self.__key_order.setdefault(key, deque())
+            # a retried event comes back ahead of the events queued after it
+            if self.__held.get(key, None) == event.id:
+                order.appendleft(event.id)
+            else:
+                order.append(event.id)
+
+    def extend(self, events: Iterable[QueueEvent]):
+        for event in events:
+            self.append(event)
+
+    def hold(self, event: QueueEvent):
+        """
+        Holds partition keys of a taken event, nothing else with them is handed out until release
+        """
+        for key in event.partition_keys:
+            self.__held[key] = event.id
+
+    def release(self, event: QueueEvent):
+        for key in event.partition_keys:
+            if self.__held.get(key, None) == event.id:
+                del self.__held[key]
+
+    def __is_held(self, key: str, event: QueueEvent) -> bool:
+        return self.__held.get(key, event.id) != event.id
+
+    def __is_eligible(self, sequence: int, event: QueueEvent, oldest: int) -> bool:
+        if self.__is_held(ALL_PARTITIONS, event):
+            return False
+        if self.__barriers:
+            first_barrier = self.__barriers[0]
+            # nothing queued after a barrier goes before it, and the barrier waits for everything older
+            if sequence > first_barrier:
+                return False
+            if sequence == first_barrier:
+                return sequence == oldest
+
+        for key in event.partition_keys:
+            if key == ALL_PARTITIONS:
+                # a barrier waits for every taken event
+                if any(holder != event.id for holder in self.__held.values()):
+                    return False
+            elif self.__key_order[key][0] != event.id or self.__is_held(key, event):
+                return False
+        return True
+
+    def __find_eligible(self, lane: EventLane, oldest: int) -> list[int]:
+        return [
+            index for index, (sequence, event) in enumerate(self.__lanes[lane])
+            if self.__is_eligible(sequence, event, oldest)
+        ]
+
+    def popleft(self) -> QueueEvent | None:
+        """
+        Takes the next event by lane weights and holds its keys. Returns None when no event is eligible
+        """
+        oldest = min((lane[0][0] for lane in self.__lanes.values() if lane), default=None)
+        if oldest is None:
+            return None
+
+        eligible = {lane: self.__find_eligible(lane, oldest) for lane in EventLane}
+        deferred = set()
+        if self.origin_policy is not None:
+            waiting = Counter(
+                self.__lanes[lane][index][1].origin for lane, indices in eligible.items() for index in indices
+            )
+            if waiting:
+                deferred = self.origin_policy(waiting)
+
+        candidates = {}
+        for lane, indices in eligible.items():
+            index = next((index for index in indices if self.__lanes[lane][index][1].origin not in deferred), None)
+            if index is not None:
+                candidates[lane] = index
+
+        # everything left waits for held keys
+        if not candidates:
+            return None
+
+        total = 0
+        for lane in candidates:
+            self.__current_weight[lane] += self.weights[lane]
+            total += self.weights[lane]
+        lane = max(candidates, key=lambda candidate: self.__current_weight[candidate])
+        self.__current_weight[lane] -= total
+
+        entries = self.__lanes[lane]
+        sequence, event = entries[candidates[lane]]
+        del entries[candidates[lane]]
+        self.__forget(sequence, event)
+        self.hold(event)
+        return event
+
+    def remove_if(self, predicate: Callable[[QueueEvent], bool]) -> list[QueueEvent]:
+        removed = []
+        for entries in self.__lanes.values():
+            matching = [entry for entry in entries if predicate(entry[1])]
+            for entry in matching:
+                entries.remove(entry)
+                self.__forget(*entry)
+                removed.append(entry[1])
+        return removed
+
+    def __forget(self, sequence: int, event: QueueEvent):
+        for key in event.partition_keys:
+            if key == ALL_PARTITIONS:
+                self.__barriers.remove(sequence)
+                continue
+
+            order = self.__key_order[key]
+            if order[0] == event.id:
+                order.popleft()
+            else:
+                order.remove(event.id)
+            if not order:
+                del self.__key_order[key]
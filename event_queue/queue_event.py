@@ -1,7 +1,20 @@
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Callable
 
-from .event_types import EventType
+from .event_types import EventType, EventLane
+
+EXIT_CMD = "exit"
+# ship events that don't have ship symbol as the first argument
+NON_SHIP_EVENTS = {"purchase", "fetch_all", "load_survey"}
+# events that replace whole parts of game state - nothing may run alongside them,
+# and everything queued after waits for them to complete
+# exit is one as well, so it runs only after everything queued before it regardless of lanes
+BARRIER_EVENTS = {
+    (EventType.AGENT, "bootstrap"), (EventType.SHIP, "fetch_all"), (EventType.CONTRACT, "fetch_all"),
+    (EventType.DEFAULT, EXIT_CMD),
+}
+# partition key shared by every event
+ALL_PARTITIONS = "*"
 
 
 @dataclass(slots=True)
@@ -10,9 +23,12 @@ class QueueEvent:
     event_type: EventType
     event_name: str
     args: Any
+    lane: EventLane = EventLane.NORMAL
+    # strategy (or other actor) the event is done for, requests are accounted to it
+    origin: str | None = None
 
     def __str__(self):
-        return f"QueueEvent[<{self.id}> {self.event_type}.{self.event_name} {self.args}]"
+        return f"QueueEvent[<{self.id}> {self.event_type}.{self.event_name} {self.args} ({self.lane})]"
 
     # implementing compare methods ourselves to only include ID
 
@@ -27,3 +43,36 @@ class QueueEvent:
 
     def __ge__(self, other):
         return self.id >= other.id
+
+    @property
+    def ship_symbol(self) -> str | None:
+        """
+        Symbol of the ship this event acts upon, if any
+        """
+        if not self.args:
+            return None
+        if self.event_type == EventType.SHIP and self.event_name not in NON_SHIP_EVENTS:
+            return self.args[0]
+        if self.event_type == EventType.CONTRACT and self.event_name == "deliver":
+            return self.args[1]
+        return None
+
+    @property
+    def partition_keys(self) -> frozenset[str]:
+        """
+        Events sharing a key have to be executed in order they were queued;
+        events without keys can run alongside anything
+        """
+        if (self.event_type, self.event_name) in BARRIER_EVENTS:
+            return frozenset((ALL_PARTITIONS,))
+
+        keys = set()
+        if ship_symbol := self.ship_symbol:
+            keys.add(f"ship:{ship_symbol}")
+        if self.event_type == EventType.CONTRACT and self.args:
+            keys.add(f"contract:{self.args[0]}")
+        return frozenset(keys)
+
+
+# called with the event and its handler response once it has been handled
+EventCallback = Callable[[QueueEvent, Any], None]
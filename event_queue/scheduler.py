@@ -0,0 +1,146 @@
+from collections import defaultdict
+from datetime import datetime
+from heapq import heappush, heappop
+from itertools import count
+from typing import Any
+
+from .queue_event import QueueEvent
+
+
+def _normalize_args(args: Any) -> Any:
+    # strategies mix lists and tuples for the same payload
+    return tuple(args) if isinstance(args, (list, tuple)) else args
+
+
+class EventScheduler:
+    """
+    Binary heap of events ordered by the time they should be queued at.
+    Ship events are additionally indexed by (ship symbol, event name) to cancel, replace and coalesce them.
+    Cancelled entries are only marked and dropped lazily once they reach the top.
+    Not thread-safe on its own - EventQueue guards it with its condition
+    """
+    def __init__(self):
+        # [when, sequence, event]; sequence keeps insertion order for equal times, event is None once cancelled
+        self.__heap: list[list] = []
+        self.__entries: dict[int, list] = {}
+        self.__sequence = count()
+        # (ship symbol, event name) to ids of scheduled events
+        self.__by_ship: dict[tuple[str, str], set[int]] = defaultdict(set)
+        # ship symbol to id of its most recently scheduled event, the only one a new event may coalesce into
+        self.__last_by_ship: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, event_id: int) -> bool:
+        return event_id in self.__entries
+
+    def push(self, when: datetime, event: QueueEvent) -> QueueEvent:
+        """
+        Schedules the event, returns the event that will actually be queued:
+        an identical event for the same ship at the same time is kept instead of adding a duplicate,
+        as long as it is the last one scheduled for the ship - steps in between (dock, orbit, dock) all stay
+        """
+        # scheduling the same event again moves it
+        self.cancel(event.id)
+
+        ship_symbol = event.ship_symbol
+        if ship_symbol is not None:
+            if duplicate := self.__find_duplicate(ship_symbol, when, event):
+                return duplicate
+
+            self.__by_ship[(ship_symbol, event.event_name)].add(event.id)
+            self.__last_by_ship[ship_symbol] = event.id
+
+        entry = [when, next(self.__sequence), event]
+        self.__entries[event.id] = entry
+        heappush(self.__heap, entry)
+
+        return event
+
+    def __find_duplicate(self, ship_symbol: str, when: datetime, event: QueueEvent) -> QueueEvent | None:
+        entry = self.__entries.get(self.__last_by_ship.get(ship_symbol, None), None)
+        if entry is None:
+            return None
+
+        scheduled_when, _, scheduled = entry
+        if (
+            scheduled.event_name == event.event_name and scheduled_when == when
+            and _normalize_args(scheduled.args) == _normalize_args(event.args)
+        ):
+            return scheduled
+        return None
+
+    def cancel(self, event_id: int) -> QueueEvent | None:
+        entry = self.__entries.pop(event_id, None)
+        if entry is None:
+            return None
+
+        event = entry[2]
+        entry[2] = None
+        self.__unindex(event)
+        return event
+
+    def cancel_for_ship(self, ship_symbol: str, event_name: str | None = None) -> list[QueueEvent]:
+        index_keys = [
+            key for key in self.__by_ship
+            if key[0] == ship_symbol and (event_name is None or key[1] == event_name)
+        ]
+
+        cancelled = []
+        for index_key in index_keys:
+            for event_id in list(self.__by_ship.get(index_key, ())):
+                cancelled.append(self.cancel(event_id))
+        return cancelled
+
+    def reschedule(self, event_id: int, when: datetime) -> QueueEvent | None:
+        event = self.cancel(event_id)
+        if event is None:
+            return None
+
+        return self.push(when, event)
+
+    def get_when(self, event_id: int) -> datetime | None:
+        entry = self.__entries.get(event_id, None)
+        return entry[0] if entry is not None else None
+
+    def peek_time(self) -> datetime | None:
+        self.__drop_cancelled()
+        return self.__heap[0][0] if self.__heap else None
+
+    def pop_due(self, current_time: datetime) -> list[QueueEvent]:
+        due = []
+        while self.__heap:
+            self.__drop_cancelled()
+            # everything after the first future entry is in the future as well
+            if not self.__heap or self.__heap[0][0] > current_time:
+                break
+
+            _, _, event = heappop(self.__heap)
+            del self.__entries[event.id]
+            self.__unindex(event)
+            due.append(event)
+
+        return due
+
+    def __unindex(self, event: QueueEvent):
+        ship_symbol = event.ship_symbol
+        if ship_symbol is None:
+            return
+
+        # a cancelled or queued last event leaves nothing to coalesce into
+        if self.__last_by_ship.get(ship_symbol, None) == event.id:
+            del self.__last_by_ship[ship_symbol]
+
+        index_key = (ship_symbol, event.event_name)
+        event_ids = self.__by_ship.get(index_key, None)
+        if event_ids is None:
+            return
+
+        event_ids.discard(event.id)
+        if not event_ids:
+            del self.__by_ship[index_key]
+
+    def __drop_cancelled(self):
+        while self.__heap and self.__heap[0][2] is None:
+            heappop(self.__heap)
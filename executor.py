@@ -0,0 +1,121 @@
+# consumes events from the event queue with a pool of worker threads.
+# events are partitioned by QueueEvent.partition_keys (ship symbol, contract id):
+# events sharing a key run strictly in the order they were queued, everything else runs in parallel.
+# all workers share the client, and with it the rate limiter.
+# only a small window of events is pulled ahead, so the queue lanes decide what goes next
+from threading import Thread, Condition, get_ident as get_thread_id
+
+from loguru import logger
+
+from event_queue import QueueEvent, ALL_PARTITIONS, EXIT_CMD, event_scope
+from global_params import GlobalParams
+from handle_result import HandleResult
+from handlers import handle_event
+
+
+class Executor:
+    def __init__(self, params: GlobalParams, workers: int = 1):
+        self.__params = params
+        self.__workers_count = max(1, workers)
+        # events pulled from the queue ahead of free workers
+        self.__window = 2 * self.__workers_count
+
+        self.__condition = Condition()
+        # events pulled from the queue in arrival order, waiting for their partition keys to free up
+        self.__waiting: list[tuple[QueueEvent, frozenset[str]]] = []
+        # keys of events that are being executed right now
+        self.__busy_keys: set[str] = set()
+        self.__running = 0
+        self.__stopping = False
+
+        self.__threads: list[Thread] = []
+
+    def start(self):
+        self.__threads = [Thread(target=self.__dispatch, daemon=True)]
+        self.__threads.extend(
+            Thread(target=self.__work, daemon=True) for _ in range(self.__workers_count)
+        )
+        for thread in self.__threads:
+            thread.start()
+
+        logger.debug(f"Executor started with {self.__workers_count} workers")
+
+    def join(self):
+        for thread in self.__threads:
+            thread.join()
+
+    def __dispatch(self):
+        while True:
+            # leave the rest in the queue, where more urgent events can still overtake them
+            with self.__condition:
+                while len(self.__waiting) >= self.__window:
+                    self.__condition.wait()
+
+            # sleeps until an event is queued or the earliest scheduled event is due
+            event: QueueEvent = self.__params.event_queue.get()
+
+            with self.__condition:
+                if event.event_name == EXIT_CMD:
+                    logger.debug(f"[dispatcher] exit requested, draining {len(self.__waiting)} events...")
+                    self.__stopping = True
+                    self.__condition.notify_all()
+                    return
+
+                self.__waiting.append((event, event.partition_keys))
+                self.__condition.notify()
+
+    def __take_runnable(self) -> tuple[QueueEvent, frozenset[str]] | None:
+        # first waiting event that doesn't share keys with running events or with events queued before it;
+        # must be called with condition acquired
+        blocked = set(self.__busy_keys)
+        for index, (event, keys) in enumerate(self.__waiting):
+            if ALL_PARTITIONS in blocked:
+                return None
+
+            if ALL_PARTITIONS in keys:
+                runnable = index == 0 and self.__running == 0
+            else:
+                runnable = keys.isdisjoint(blocked)
+
+            if runnable:
+                del self.__waiting[index]
+                self.__busy_keys.update(keys)
+                self.__running += 1
+                return event, keys
+            blocked.update(keys)
+        return None
+
+    def __work(self):
+        thread_id = get_thread_id()
+
+        while True:
+            with self.__condition:
+                while (entry := self.__take_runnable()) is None:
+                    if self.__stopping and not self.__waiting:
+                        logger.debug(f"[thread {thread_id}] exiting...")
+                        return
+                    self.__condition.wait()
+                # room in the window for the dispatcher
+                self.__condition.notify_all()
+
+            event, keys = entry
+            try:
+                self.__run(event, thread_id)
+            finally:
+                with self.__condition:
+                    self.__busy_keys.difference_update(keys)
+                    self.__running -= 1
+                    self.__condition.notify_all()
+
+    def __run(self, event: QueueEvent, thread_id: int):
+        logger.debug(f"[thread {thread_id}] executing {event}")
+
+        # requests are accounted to the event, events queued by its callbacks inherit its origin
+        with event_scope(event):
+            outcome = handle_event(self.__params, event)
+
+            if outcome.result == HandleResult.SKIP:
+                logger.debug(f"{event} has been skipped by handler")
+            # notify event queue that processing for this event is complete
+            # this resolves its future and notifies all subscribers
+            self.__params.event_queue.event_done(event, outcome.result, outcome.response, outcome.error)
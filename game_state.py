@@ -0,0 +1,264 @@
+# game state kept up to date from API responses field by field: a response only overwrites the fields that differ,
+# and every difference becomes a typed change - cargo and credits deltas, nav status transitions, fuel.
+# ships count their changes in versions, observers subscribe to change types instead of rescanning the fleet.
+# updates run under GlobalParams.lock, so observers are called with it held and have to stay short.
+# readers that take long (views, route searches) work on snapshots instead: copies are taken only of ships that
+# changed since the previous snapshot, so taking one holds the lock briefly, and writers never touch the copies
+from collections import Counter, defaultdict, deque
+from copy import deepcopy
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping
+
+import attr
+
+from space_traders_api_client.models import Agent, Ship, ShipNav, ShipFuel, ShipCargo, Cooldown, Contract, Faction, \
+    Survey, Market, ShipNavStatus
+
+# changes kept for views
+RECENT_CHANGES = 200
+# ship fields updated from full ship listings; additional_properties hold local data (cooldown)
+SHIP_FIELDS = [
+    ship_field.name for ship_field in attr.fields(Ship) if ship_field.name not in ("symbol", "additional_properties")
+]
+
+
+@dataclass(slots=True)
+class ShipChange:
+    ship_symbol: str
+    version: int
+    # changed ship fields, "added" / "removed" when the ship joined or left the fleet
+    fields: set[str] = field(default_factory=set)
+
+
+@dataclass(slots=True)
+class CargoChange:
+    ship_symbol: str
+    version: int
+    # resource to units gained, negative when sold, used or jettisoned
+    deltas: dict[str, int]
+    units: int
+    capacity: int
+
+
+@dataclass(slots=True)
+class StatusChange:
+    ship_symbol: str
+    version: int
+    previous: ShipNavStatus | None
+    status: ShipNavStatus
+    waypoint_symbol: str
+
+
+@dataclass(slots=True)
+class FuelChange:
+    ship_symbol: str
+    version: int
+    previous: int
+    current: int
+
+
+@dataclass(slots=True)
+class CreditsChange:
+    version: int
+    previous: int
+    credits: int
+
+    @property
+    def delta(self) -> int:
+        return self.credits - self.previous
+
+
+StateChange = ShipChange | CargoChange | StatusChange | FuelChange | CreditsChange
+StateObserver = Callable[[StateChange], None]
+
+
+@dataclass(frozen=True, slots=True)
+class GameSnapshot:
+    """
+    Read-only view of the game state at one point in time; its objects are shared between snapshots, never modify
+    """
+    agent: Agent | None
+    ships: Mapping[str, Ship]
+    contracts: Mapping[str, Contract]
+    markets: Mapping[str, Market]
+    versions: Mapping[str, int]
+
+
+def merge_fields(target: Any, source: Any) -> set[str]:
+    """
+    Copies attrs fields of source that differ onto target, keeping target's additional properties.
+    Returns names of the changed fields
+    """
+    changed = set()
+    for model_field in attr.fields(type(target)):
+        if model_field.name == "additional_properties":
+            continue
+        value = getattr(source, model_field.name)
+        if getattr(target, model_field.name) != value:
+            setattr(target, model_field.name, value)
+            changed.add(model_field.name)
+    return changed
+
+
+def get_inventory(cargo: ShipCargo) -> dict[str, int]:
+    return {item.symbol: item.units for item in cargo.inventory}
+
+
+class GameState:
+    __slots__ = [
+        "agent", "ships", "contracts", "faction", "versions", "agent_version", "changes", "__observers",
+        "__ship_copies", "__agent_copy",
+    ]
+
+    agent: Agent
+    ships: dict[str, Ship]
+    contracts: dict[str, Contract]
+    faction: Faction | None
+    # waypoint to dict of signature to survey
+    surveys: dict[str, dict[str, Survey]] = defaultdict(dict)
+
+    markets: dict[str, Market] = {}
+
+    def __init__(self):
+        # filled page by page during bootstrap
+        self.agent = None
+        self.ships = {}
+        self.contracts = {}
+        self.faction = None
+
+        # ship to the number of its recorded changes
+        self.versions: Counter[str] = Counter()
+        self.agent_version = 0
+        self.changes: deque[StateChange] = deque(maxlen=RECENT_CHANGES)
+        self.__observers: dict[type, list[StateObserver]] = defaultdict(list)
+
+        # copies handed out in snapshots, with the version they were taken at
+        self.__ship_copies: dict[str, tuple[int, Ship]] = {}
+        self.__agent_copy: tuple[int, Agent | None] = (0, None)
+
+    def subscribe(self, change_type: type, callback: StateObserver):
+        """
+        Calls back on every change of the given type, as soon as it is made (with GlobalParams.lock held)
+        """
+        self.__observers[change_type].append(callback)
+
+    def __emit(self, changes: list[StateChange]) -> list[StateChange]:
+        self.changes.extend(changes)
+        for change in changes:
+            for observer in self.__observers.get(type(change), ()):
+                observer(change)
+        return changes
+
+    def update_agent(self, agent: Agent) -> list[StateChange]:
+        if self.agent is None:
+            self.agent = agent
+            self.agent_version += 1
+            return []
+
+        previous_credits = self.agent.credits_
+        if not merge_fields(self.agent, agent):
+            return []
+
+        self.agent_version += 1
+        if agent.credits_ == previous_credits:
+            return []
+        return self.__emit([CreditsChange(self.agent_version, previous_credits, agent.credits_)])
+
+    def update_ship(self, ship_symbol: str, nav: ShipNav | None = None, fuel: ShipFuel | None = None,
+                    cargo: ShipCargo | None = None, cooldown: Cooldown | None = None) -> list[StateChange]:
+        """
+        Applies parts of a ship returned by an action; parts left as None are unchanged
+        """
+        fields = {name: value for name, value in (("nav", nav), ("fuel", fuel), ("cargo", cargo)) if value is not None}
+        return self.__update_ship(self.ships[ship_symbol], fields, cooldown)
+
+    def __update_ship(self, ship: Ship, fields: dict[str, Any], cooldown: Cooldown | None = None) -> list[StateChange]:
+        previous_status = ship.nav.status
+        previous_fuel = ship.fuel.current
+        previous_inventory = get_inventory(ship.cargo)
+
+        changed = set()
+        for name, value in fields.items():
+            current = getattr(ship, name)
+            if attr.has(type(current)):
+                if merge_fields(current, value):
+                    changed.add(name)
+            elif current != value:
+                setattr(ship, name, value)
+                changed.add(name)
+        if cooldown is not None and ship.additional_properties.get("cooldown", None) != cooldown:
+            ship.additional_properties["cooldown"] = cooldown
+            changed.add("cooldown")
+        if not changed:
+            return []
+
+        self.versions[ship.symbol] += 1
+        version = self.versions[ship.symbol]
+        changes: list[StateChange] = [ShipChange(ship.symbol, version, changed)]
+        if "cargo" in changed:
+            inventory = get_inventory(ship.cargo)
+            deltas = {
+                symbol: inventory.get(symbol, 0) - previous_inventory.get(symbol, 0)
+                for symbol in inventory.keys() | previous_inventory.keys()
+                if inventory.get(symbol, 0) != previous_inventory.get(symbol, 0)
+            }
+            if deltas:
+                changes.append(CargoChange(ship.symbol, version, deltas, ship.cargo.units, ship.cargo.capacity))
+        if "nav" in changed and ship.nav.status != previous_status:
+            changes.append(
+                StatusChange(ship.symbol, version, previous_status, ship.nav.status, ship.nav.waypoint_symbol)
+            )
+        if "fuel" in changed and ship.fuel.current != previous_fuel:
+            changes.append(FuelChange(ship.symbol, version, previous_fuel, ship.fuel.current))
+        return self.__emit(changes)
+
+    def put_ships(self, ships: Iterable[Ship], replace: bool = False) -> list[StateChange]:
+        """
+        Merges full ship listings into the fleet; with replace, ships missing from the listing are dropped
+        """
+        changes = []
+        fleet_changes = []
+        symbols = set()
+        for ship in ships:
+            symbols.add(ship.symbol)
+            existing = self.ships.get(ship.symbol, None)
+            if existing is None:
+                self.ships[ship.symbol] = ship
+                self.versions[ship.symbol] += 1
+                fleet_changes.append(ShipChange(ship.symbol, self.versions[ship.symbol], {"added"}))
+            else:
+                changes.extend(self.__update_ship(existing, {name: getattr(ship, name) for name in SHIP_FIELDS}))
+
+        if replace:
+            for ship_symbol in set(self.ships) - symbols:
+                del self.ships[ship_symbol]
+                self.versions[ship_symbol] += 1
+                fleet_changes.append(ShipChange(ship_symbol, self.versions[ship_symbol], {"removed"}))
+        return changes + self.__emit(fleet_changes)
+
+    def snapshot(self) -> GameSnapshot:
+        """
+        Copies ships and agent changed since the last snapshot. Has to be called under the lock,
+        the snapshot itself is then read without it. Markets and contracts are replaced, never modified, on updates
+        """
+        ships = {}
+        for ship_symbol, ship in self.ships.items():
+            version = self.versions[ship_symbol]
+            copy = self.__ship_copies.get(ship_symbol, None)
+            if copy is None or copy[0] != version:
+                copy = self.__ship_copies[ship_symbol] = (version, deepcopy(ship))
+            ships[ship_symbol] = copy[1]
+        for ship_symbol in self.__ship_copies.keys() - self.ships.keys():
+            del self.__ship_copies[ship_symbol]
+
+        if self.__agent_copy[0] != self.agent_version:
+            self.__agent_copy = (self.agent_version, deepcopy(self.agent))
+
+        return GameSnapshot(
+            agent=self.__agent_copy[1],
+            ships=MappingProxyType(ships),
+            contracts=MappingProxyType(dict(self.contracts)),
+            markets=MappingProxyType(dict(self.markets)),
+            versions=MappingProxyType({ship_symbol: self.versions[ship_symbol] for ship_symbol in ships}),
+        )
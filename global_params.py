@@ -1,28 +1,21 @@
-from collections import defaultdict
 from threading import Lock
 
 from console import console
 from event_queue import EventQueue, event_queue
+from game_state import GameState, GameSnapshot
+from market_history import MarketHistory
+from rate_limiter import RateLimiter
+from request_budget import RequestBudget
+from retry_policy import RetryPolicy
 from space_traders_api_client import AuthenticatedClient
-from space_traders_api_client.models import Agent, Ship, Contract, Faction, Survey
-from space_traders_api_client.models.market import Market
-
-
-class GameState:
-    __slots__ = ["agent", "ships", "contracts", "faction"]
-
-    agent: Agent
-    ships: dict[str, Ship]
-    contracts: dict[str, Contract]
-    faction: Faction | None
-    # waypoint to dict of signature to survey
-    surveys: dict[str, dict[str, Survey]] = defaultdict(dict)
-
-    markets: dict[str, Market] = {}
+from system_graph import SystemGraph
 
 
 class GlobalParams:
-    __slots__ = ["lock", "event_queue", "game_state", "console", "client"]
+    __slots__ = [
+        "lock", "event_queue", "game_state", "console", "client", "rate_limiter", "request_budget", "retry_policy",
+        "market_history", "system_graph",
+    ]
 
     def __init__(self):
         self.lock = Lock()
@@ -31,11 +24,42 @@ class GlobalParams:
 
         self.console = console
 
+        # shared by every request that goes through the client
+        self.rate_limiter = RateLimiter()
+        # attributes requests to strategies; the queue keeps them within their shares
+        self.request_budget = RequestBudget()
+        self.event_queue.set_origin_policy(self.request_budget.get_deferred)
+        # failed requests are re-queued or collected as dead letters
+        self.retry_policy = RetryPolicy()
+        # every fetched market is appended, so strategies see price dynamics without re-fetching
+        self.market_history = MarketHistory()
+        # systems and charted jump gates, routes between systems come from here
+        self.system_graph = SystemGraph()
+
         self.client = AuthenticatedClient(
             base_url="https://api.spacetraders.io/v2",
-            token="", follow_redirects=True, verify_ssl=True, raise_on_unexpected_status=True, timeout=30
+            token="", follow_redirects=True, verify_ssl=True, raise_on_unexpected_status=True, timeout=30,
+            httpx_args={
+                "event_hooks": {
+                    "request": [self.request_budget.on_request, self.rate_limiter.on_request],
+                    "response": [self.rate_limiter.on_response],
+                }
+            },
+            async_httpx_args={
+                "event_hooks": {
+                    "request": [self.request_budget.on_request_async, self.rate_limiter.on_request_async],
+                    "response": [self.rate_limiter.on_response_async],
+                }
+            }
         )
 
+    def snapshot(self) -> GameSnapshot:
+        """
+        Read-only copy of the game state, to print or compute on without holding the lock
+        """
+        with self.lock:
+            return self.game_state.snapshot()
+
 
 RESERVED_ITEMS = {
     "ANTIMATTER": True
@@ -1,4 +1,6 @@
+from dataclasses import dataclass
 from enum import Enum
+from typing import Any
 
 
 class HandleResult(str, Enum):
@@ -10,3 +12,13 @@ class HandleResult(str, Enum):
     SKIP = "skip"
     # request fulfilled, and should not wait (doesn't do requests)
     INSTANCE = "instant"
+    # request failed for a transient reason and has been rescheduled
+    RETRY = "retry"
+
+
+@dataclass(slots=True)
+class HandleOutcome:
+    result: HandleResult
+    # whatever the handler returned besides a HandleResult - usually parsed response data
+    response: Any = None
+    error: Exception | None = None
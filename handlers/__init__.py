@@ -1,10 +1,14 @@
+from asyncio import to_thread
+from inspect import iscoroutinefunction
 from traceback import format_exc
+from typing import Any, Callable
 
 from loguru import logger
 
 from event_queue.queue_event import QueueEvent
 from global_params import GlobalParams
-from handle_result import HandleResult
+from handle_result import HandleResult, HandleOutcome
+from .api import run_sync
 from .agent import AgentHandler
 from .contract import ContractHandler
 from .ship import ShipHandler
@@ -22,21 +26,70 @@ __HANDLERS = {
 }
 
 
-def handle_event(params: GlobalParams, event: QueueEvent) -> HandleResult:
+def __get_event_handler(event: QueueEvent) -> Callable | None:
     event_type_handler = __HANDLERS.get(event.event_type, None)
 
     if not event_type_handler:
         logger.error(f"NO EVENT TYPE HANDLER FOR {event.event_type}")
-        return HandleResult.FAIL
+        return None
 
     event_handler = event_type_handler.handlers.get(event.event_name, None)
 
     if not event_handler:
         logger.error(f"NO EVENT NAME HANDLER FOR {event.event_name}")
-        return HandleResult.FAIL
+        return None
+
+    return event_handler
+
+
+def __handle_failure(params: GlobalParams, event: QueueEvent, error: Exception) -> HandleOutcome:
+    # retryable failures are rescheduled, the rest end up in dead letters
+    result = params.retry_policy.handle_failure(params.event_queue, event, error)
+    if result == HandleResult.FAIL:
+        logger.critical(f"Error in event runner: {error}\n{format_exc()}")
+    return HandleOutcome(result, error=error)
+
+
+def __to_outcome(params: GlobalParams, event: QueueEvent, returned: Any) -> HandleOutcome:
+    params.retry_policy.forget(event)
+    # handlers either return a HandleResult or their response data on success
+    if isinstance(returned, HandleResult):
+        return HandleOutcome(returned)
+    return HandleOutcome(HandleResult.SUCCESS, response=returned)
+
+
+def handle_event(params: GlobalParams, event: QueueEvent) -> HandleOutcome:
+    event_handler = __get_event_handler(event)
+
+    if not event_handler:
+        return HandleOutcome(HandleResult.FAIL, error=LookupError(f"No handler for {event}"))
 
     try:
-        return event_handler(params, event) or HandleResult.SUCCESS
+        # worker threads have no event loop, async handlers make sync requests there
+        if iscoroutinefunction(event_handler):
+            returned = run_sync(event_handler(params, event))
+        else:
+            returned = event_handler(params, event)
     except Exception as e:
-        logger.critical(f"Error in event runner: {e}\n{format_exc()}")
-        return HandleResult.FAIL
+        return __handle_failure(params, event, e)
+
+    return __to_outcome(params, event, returned)
+
+
+async def handle_event_async(params: GlobalParams, event: QueueEvent) -> HandleOutcome:
+    event_handler = __get_event_handler(event)
+
+    if not event_handler:
+        return HandleOutcome(HandleResult.FAIL, error=LookupError(f"No handler for {event}"))
+
+    try:
+        # async handlers share the event loop (and async client);
+        # plain ones (paging with thread pools, bulk crawling) are moved to a thread to not block it
+        if iscoroutinefunction(event_handler):
+            returned = await event_handler(params, event)
+        else:
+            returned = await to_thread(event_handler, params, event)
+    except Exception as e:
+        return __handle_failure(params, event, e)
+
+    return __to_outcome(params, event, returned)
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from os import getenv
 
 from loguru import logger
@@ -10,6 +12,8 @@ from space_traders_api_client.api.agents import get_my_agent
 from space_traders_api_client.api.default import register
 from space_traders_api_client.client import Client
 from space_traders_api_client.models.register_json_body import RegisterJsonBody, RegisterJsonBodyFaction
+from .contract import ContractHandler
+from .ship import ShipHandler
 
 
 class AgentHandler:
@@ -18,7 +22,8 @@ class AgentHandler:
     def __init__(self):
         self.handlers = {
             "register": self.register,
-            "fetch": self.fetch
+            "fetch": self.fetch,
+            "bootstrap": self.bootstrap,
         }
 
         event_queue.subscribe("agent", "fetch", self.fetch_complete)
@@ -34,20 +39,20 @@ class AgentHandler:
         # authenticated client always includes bearer
         # which invalidates requests
         # use base client and save token into auth
-        auth_base_client = Client(base_url="https://api.spacetraders.io/v2", timeout=30)
         body = RegisterJsonBody(
             faction=RegisterJsonBodyFaction.VOID,
             symbol=event.args[1],
             email=event.args[2],
         )
-        result = register.sync(client=auth_base_client, json_body=body)
+        with Client(base_url="https://api.spacetraders.io/v2", timeout=30) as auth_base_client:
+            result = register.sync(client=auth_base_client, json_body=body)
         logger.info(f"TOKEN: {result.data.token}")
 
         with params.lock:
-            params.game_state.agent = result.data.agent
-            params.game_state.contracts = [result.data.contract, ]
+            params.game_state.update_agent(result.data.agent)
+            params.game_state.contracts = {result.data.contract.id: result.data.contract}
             params.game_state.faction = result.data.faction
-            params.game_state.ships = [result.data.ship, ]
+            params.game_state.put_ships([result.data.ship])
 
         logger.info(f"Registered new account")
 
@@ -58,7 +63,21 @@ class AgentHandler:
         result = get_my_agent.sync(client=params.client)
 
         with params.lock:
-            params.game_state.agent = result.data
+            params.game_state.update_agent(result.data)
         params.console.print(
            f"{SUCCESS_PREFIX}[bold magenta]Account[/]: [agent]{result.data.symbol}[/] [dim]{result.data.account_id}[/]"
         )
+
+        return result.data
+
+    @classmethod
+    def bootstrap(cls, params: GlobalParams, event: QueueEvent):
+        # agent, fleet and contracts don't depend on each other - fetch all of them (and all their pages) at once
+        fetchers = (cls.fetch, ShipHandler.fetch_all, ContractHandler.fetch_all)
+
+        with ThreadPoolExecutor(max_workers=len(fetchers)) as pool:
+            futures = [pool.submit(copy_context().run, fetcher, params, event) for fetcher in fetchers]
+            # re-raises the first failure, so the whole bootstrap is retried
+            results = [future.result() for future in futures]
+
+        return results
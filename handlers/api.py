@@ -0,0 +1,40 @@
+# handlers are written once as coroutines and run under both executors:
+# inside the asyncio executor requests are awaited on the shared AsyncClient, so handlers of different ships
+# wait for their responses concurrently; worker threads of the threaded executor have no running loop, there
+# requests go through the sync client and the coroutine completes without ever suspending
+from asyncio import get_running_loop
+from types import ModuleType
+from typing import Any, Coroutine
+
+from global_params import GlobalParams
+
+
+def is_in_event_loop() -> bool:
+    try:
+        get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+async def request(params: GlobalParams, endpoint: ModuleType, **kwargs) -> Any:
+    """
+    Calls a generated endpoint module (e.g. fleet.dock_ship) and returns its parsed response
+    """
+    if is_in_event_loop():
+        response = await endpoint.asyncio_detailed(client=params.client, **kwargs)
+    else:
+        response = endpoint.sync_detailed(client=params.client, **kwargs)
+    return response.parsed
+
+
+def run_sync(coroutine: Coroutine) -> Any:
+    """
+    Runs a handler coroutine outside the event loop, where its requests don't suspend
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError(f"{coroutine.__qualname__} suspended outside of an event loop")
@@ -3,8 +3,10 @@ from rich.pretty import pprint
 from event_queue import QueueEvent, EventType
 from global_params import GlobalParams
 from handle_result import HandleResult
+from pagination import fetch_all_pages
 from printers import print_contracts, SUCCESS_PREFIX, FAIL_PREFIX
 from space_traders_api_client.api.contracts import get_contracts, accept_contract, fulfill_contract, deliver_contract
+from space_traders_api_client.models.contract import Contract
 from space_traders_api_client.models.deliver_contract_json_body import DeliverContractJsonBody
 from strategies.base_contract import BaseContractStrategy
 
@@ -80,7 +82,7 @@ class ContractHandler:
         if result.data:
             result_contract = result.data.contract
             with params.lock:
-                params.game_state.agent = result.data.agent
+                params.game_state.update_agent(result.data.agent)
                 params.game_state.contracts[result_contract.id] = result_contract
             params.console.print(f"{SUCCESS_PREFIX}Accepted contract [b]{result_contract.id}[/]")
             pprint(result.data.contract)
@@ -90,17 +92,21 @@ class ContractHandler:
         else:
             params.console.print(f"{FAIL_PREFIX}Failed to accept contract")
 
+        return result.data
+
     @staticmethod
     def fulfill(params: GlobalParams, event: QueueEvent):
         contract_id = event.args[0]
         result = fulfill_contract.sync(client=params.client, contract_id=contract_id)
         if result.data:
             with params.lock:
-                params.game_state.agent = result.data.agent
+                params.game_state.update_agent(result.data.agent)
                 params.game_state.contracts[contract_id] = result.data.contract
 
             params.console.print(f"{SUCCESS_PREFIX}Contract [b]{contract_id}[/] fulfilled!")
 
+        return result.data
+
     @staticmethod
     def deliver(params: GlobalParams, event: QueueEvent):
         contract_id = event.args[0]
@@ -118,16 +124,27 @@ class ContractHandler:
         if result.data:
             with params.lock:
                 params.game_state.contracts[contract_id] = result.data.contract
-                params.game_state.ships[ship_symbol].cargo = result.data.cargo
+                params.game_state.update_ship(ship_symbol, cargo=result.data.cargo)
             params.console.print(f"{SUCCESS_PREFIX}[bold magenta]{ship_symbol}[/] delivered [b]{units}[/] [u]{trade_symbol}[/] for contract [b]{contract_id}[/]")
 
+        return result.data
+
     @staticmethod
     def fetch_all(params: GlobalParams, event: QueueEvent):
-        result = get_contracts.sync(client=params.client)
-        # NOTE: might need pagination handling in the future
-        params.console.print(SUCCESS_PREFIX, f"Contracts: [b u]{len(result.data)}[/]")
+        def on_page(contracts: list[Contract]):
+            # stream into state as pages arrive
+            with params.lock:
+                params.game_state.contracts.update((contract.id, contract) for contract in contracts)
+
+        contracts = fetch_all_pages(
+            lambda page, limit: get_contracts.sync(client=params.client, page=page, limit=limit),
+            on_page=on_page, concurrency=params.rate_limiter.burst
+        )
+        params.console.print(SUCCESS_PREFIX, f"Contracts: [b u]{len(contracts)}[/]")
         with params.lock:
             params.game_state.contracts = {
-                contract.id: contract for contract in result.data
+                contract.id: contract for contract in contracts
             }
-            print_contracts(params.game_state.contracts.values())
+        print_contracts(contracts)
+
+        return contracts
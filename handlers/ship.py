@@ -1,14 +1,15 @@
 from datetime import datetime, timezone
-from json import dump, load
 
-from dateutil.parser import isoparse
 from loguru import logger
+from pony.orm import db_session
 from rich.pretty import pprint
 
+from database.store import insert_surveys, get_survey
 from event_queue.queue_event import QueueEvent, EventType
 from global_params import GlobalParams
 from handle_result import HandleResult
-from printers import print_ships, SUCCESS_PREFIX
+from pagination import fetch_all_pages
+from printers import print_ships, SUCCESS_PREFIX, FAIL_PREFIX
 from space_traders_api_client.api.fleet import create_survey
 from space_traders_api_client.api.fleet import (
     get_my_ships, purchase_ship, navigate_ship, dock_ship, refuel_ship, orbit_ship, extract_resources, sell_cargo,
@@ -20,11 +21,11 @@ from space_traders_api_client.models import (
     PurchaseCargoPurchaseCargoRequest,
     PurchaseShipJsonBody, Ship, ShipType, ShipNavStatus,
     SellCargoSellCargoRequest,
-    Survey, SurveySize, SurveyDeposit,
     JettisonJsonBody
 )
 from space_traders_api_client.types import Unset
 from strategies.base_strategy import get_resource_count
+from .api import request
 
 
 def get_cargo_space(ship: Ship) -> int:
@@ -60,7 +61,7 @@ class ShipHandler:
         }
 
     @staticmethod
-    def dock(params: GlobalParams, event: QueueEvent) -> HandleResult | None:
+    async def dock(params: GlobalParams, event: QueueEvent) -> HandleResult | None:
         ship_symbol = event.args[0]
 
         # skip request and save rps if the ship is already on full fuel
@@ -70,18 +71,19 @@ class ShipHandler:
                 logger.debug(f"{ship_symbol} skipping dock - already docked")
                 return HandleResult.SKIP
 
-        result = dock_ship.sync(client=params.client, ship_symbol=ship_symbol)
+        result = await request(params, dock_ship, ship_symbol=ship_symbol)
 
         if result.data:
             params.console.print(
                 f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] docked at [waypoint]{result.data.nav.waypoint_symbol}[/]"
             )
             with params.lock:
-                ship = params.game_state.ships[ship_symbol]
-                ship.nav = result.data.nav
+                params.game_state.update_ship(ship_symbol, nav=result.data.nav)
+
+        return result.data
 
     @staticmethod
-    def orbit(params: GlobalParams, event: QueueEvent) -> HandleResult | None:
+    async def orbit(params: GlobalParams, event: QueueEvent) -> HandleResult | None:
         ship_symbol = event.args[0]
 
         # skip request and save rps if the ship is already on full fuel
@@ -91,7 +93,7 @@ class ShipHandler:
                 logger.debug(f"{ship_symbol} skipping orbit - already IN_ORBIT")
                 return HandleResult.SKIP
 
-        result = orbit_ship.sync(client=params.client, ship_symbol=ship_symbol)
+        result = await request(params, orbit_ship, ship_symbol=ship_symbol)
 
         if result.data:
             params.console.print(
@@ -99,11 +101,12 @@ class ShipHandler:
                 f"[waypoint]{result.data.nav.waypoint_symbol}[/]"
             )
             with params.lock:
-                ship = params.game_state.ships[ship_symbol]
-                ship.nav = result.data.nav
+                params.game_state.update_ship(ship_symbol, nav=result.data.nav)
+
+        return result.data
 
     @staticmethod
-    def navigate(params: GlobalParams, event: QueueEvent):
+    async def navigate(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
         waypoint = event.args[1]
 
@@ -111,18 +114,18 @@ class ShipHandler:
             waypoint_symbol=waypoint
         )
 
-        result = navigate_ship.sync(client=params.client, ship_symbol=ship_symbol, json_body=body)
+        result = await request(params, navigate_ship, ship_symbol=ship_symbol, json_body=body)
         if result.data:
             route = result.data.nav.route
             params.console.print(f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] navigating towards [waypoint]{waypoint}[/]. "
                                  f"Estimated: [duration]{route.arrival - route.departure_time}[/]")
             with params.lock:
-                ship = params.game_state.ships[ship_symbol]
-                ship.nav = result.data.nav
-                ship.fuel = result.data.fuel
+                params.game_state.update_ship(ship_symbol, nav=result.data.nav, fuel=result.data.fuel)
+
+        return result.data
 
     @staticmethod
-    def extract(params: GlobalParams, event: QueueEvent):
+    async def extract(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
 
         current_datetime = datetime.now(tz=timezone.utc)
@@ -141,7 +144,7 @@ class ShipHandler:
             survey=survey
         )
         # TODO: handle exhausted surveys 400 response somehow
-        result = extract_resources.sync(client=params.client, ship_symbol=ship_symbol, json_body=body)
+        result = await request(params, extract_resources, ship_symbol=ship_symbol, json_body=body)
         if result.data:
             extraction_yield = result.data.extraction.yield_
             cooldown = result.data.cooldown
@@ -153,12 +156,12 @@ class ShipHandler:
                                  f"On cooldown for [cooldown]{cooldown_duration} "
                                  f"({cooldown.expiration.isoformat(timespec='seconds')})[/]")
             with params.lock:
-                ship = params.game_state.ships[ship_symbol]
-                ship.cargo = result.data.cargo
-                ship.additional_properties["cooldown"] = cooldown
+                params.game_state.update_ship(ship_symbol, cargo=result.data.cargo, cooldown=cooldown)
+
+        return result.data
 
     @staticmethod
-    def refuel(params: GlobalParams, event: QueueEvent) -> HandleResult | None:
+    async def refuel(params: GlobalParams, event: QueueEvent) -> HandleResult | None:
         ship_symbol = event.args[0]
 
         with params.lock:
@@ -167,33 +170,36 @@ class ShipHandler:
                 logger.debug(f"{ship_symbol} skipping fuel - already on full fuel")
                 return HandleResult.SKIP
 
-        result = refuel_ship.sync(client=params.client, ship_symbol=ship_symbol)
+        result = await request(params, refuel_ship, ship_symbol=ship_symbol)
 
         if result.data:
             params.console.print(
                 f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] refueled to {result.data.fuel.current}"
             )
             with params.lock:
-                ship = params.game_state.ships[ship_symbol]
-                ship.fuel = result.data.fuel
-                params.game_state.agent = result.data.agent
+                params.game_state.update_ship(ship_symbol, fuel=result.data.fuel)
+                params.game_state.update_agent(result.data.agent)
+
+        return result.data
 
     @staticmethod
-    def purchase(params: GlobalParams, event: QueueEvent):
+    async def purchase(params: GlobalParams, event: QueueEvent):
         body = PurchaseShipJsonBody(
             waypoint_symbol=event.args[0],
             ship_type=ShipType(event.args[1].upper())
         )
-        result = purchase_ship.sync(client=params.client, json_body=body)
+        result = await request(params, purchase_ship, json_body=body)
         if result.data:
             new_ship = result.data.ship
             with params.lock:
                 params.console.print(f"{SUCCESS_PREFIX}[ship]{new_ship.symbol}[/] has been purchased!")
-                params.game_state.agent = result.data.agent
-                params.game_state.ships[new_ship.symbol] = new_ship
+                params.game_state.update_agent(result.data.agent)
+                params.game_state.put_ships([new_ship])
+
+        return result.data
 
     @staticmethod
-    def sell_cargo_item(params: GlobalParams, event: QueueEvent):
+    async def sell_cargo_item(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
         symbol = event.args[1]
         units = event.args[2]
@@ -216,11 +222,10 @@ class ShipHandler:
             symbol=symbol,
             units=units
         )
-        result = sell_cargo.sync(client=params.client, ship_symbol=ship_symbol, json_body=body)
+        result = await request(params, sell_cargo, ship_symbol=ship_symbol, json_body=body)
         with params.lock:
-            ship = params.game_state.ships[ship_symbol]
-            params.game_state.agent = result.data.agent
-            ship.cargo = result.data.cargo
+            params.game_state.update_agent(result.data.agent)
+            params.game_state.update_ship(ship_symbol, cargo=result.data.cargo)
 
         transaction = result.data.transaction
         params.console.print(
@@ -229,8 +234,10 @@ class ShipHandler:
             f"for ${transaction.total_price} (${transaction.price_per_unit} per unit)"
         )
 
+        return result.data
+
     @staticmethod
-    def buy_cargo_item(params: GlobalParams, event: QueueEvent):
+    async def buy_cargo_item(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
         resource_symbol = event.args[1]
         units = event.args[2]
@@ -250,10 +257,10 @@ class ShipHandler:
             units=units
         )
 
-        result = purchase_cargo.sync(client=params.client, ship_symbol=ship_symbol, json_body=body)
+        result = await request(params, purchase_cargo, ship_symbol=ship_symbol, json_body=body)
         with params.lock:
-            params.game_state.agent = result.data.agent
-            params.game_state.ships[ship_symbol].cargo = result.data.cargo
+            params.game_state.update_agent(result.data.agent)
+            params.game_state.update_ship(ship_symbol, cargo=result.data.cargo)
 
         transaction = result.data.transaction
         params.console.print(
@@ -261,8 +268,10 @@ class ShipHandler:
             f"for ${transaction.total_price} (${transaction.price_per_unit} per unit)"
         )
 
+        return result.data
+
     @staticmethod
-    def jettison_cargo_item(params: GlobalParams, event: QueueEvent):
+    async def jettison_cargo_item(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
         resource_symbol = event.args[1]
         units = event.args[2]
@@ -282,31 +291,44 @@ class ShipHandler:
             units=units
         )
 
-        result = jettison.sync(client=params.client, ship_symbol=ship_symbol, json_body=body)
+        result = await request(params, jettison, ship_symbol=ship_symbol, json_body=body)
         with params.lock:
-            params.game_state.ships[ship_symbol].cargo = result.data.cargo
+            params.game_state.update_ship(ship_symbol, cargo=result.data.cargo)
 
         params.console.print(
             f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] jettisoned {units} [resource]{resource_symbol}[/]"
         )
 
+        return result.data
+
     @staticmethod
     def fetch_all(params: GlobalParams, event: QueueEvent):
-        result = get_my_ships.sync(client=params.client, limit=20)
-        # NOTE: might need pagination handling in the future
-        params.console.print(f"{SUCCESS_PREFIX}Ships: [b u]{len(result.data)}[/]")
+        def on_page(ships: list[Ship]):
+            # stream into state as pages arrive
+            with params.lock:
+                params.game_state.put_ships(ships)
+
+        ships = fetch_all_pages(
+            lambda page, limit: get_my_ships.sync(client=params.client, page=page, limit=limit),
+            on_page=on_page, concurrency=params.rate_limiter.burst
+        )
+        params.console.print(f"{SUCCESS_PREFIX}Ships: [b u]{len(ships)}[/]")
 
         with params.lock:
-            params.game_state.ships = {ship.symbol: ship for ship in result.data}
-            print_ships(result.data)
+            # drop ships that are no longer ours
+            params.game_state.put_ships(ships, replace=True)
+            snapshot = params.game_state.snapshot()
+        # printing a large fleet takes a while, the lock is released by then
+        print_ships(list(snapshot.ships.values()))
+
+        return ships
 
     @staticmethod
-    def create_survey_method(params: GlobalParams, event: QueueEvent):
+    async def create_survey_method(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
-        result = create_survey.sync(client=params.client, ship_symbol=ship_symbol)
+        result = await request(params, create_survey, ship_symbol=ship_symbol)
         with params.lock:
-            ship = params.game_state.ships[ship_symbol]
-            ship.additional_properties["cooldown"] = result.data.cooldown
+            params.game_state.update_ship(ship_symbol, cooldown=result.data.cooldown)
             survey_log_data = []
 
             for survey in result.data.surveys:
@@ -314,31 +336,30 @@ class ShipHandler:
                 deposits = ", ".join(f"[resource]{deposit.symbol}[/]" for deposit in survey.deposits)
                 survey_log_data.append(f"[waypoint]{survey.signature}[/]([green u]{survey.size}[/]): {deposits}")
 
-                with open(f"fetched_json_data/surveys/{survey.signature}.json", "w") as target:
-                    dump(survey.to_dict(), target)
-
             survey_log_data = "\n".join(survey_log_data)
             params.console.print(f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] created surveys:\n{survey_log_data}")
 
+        with db_session:
+            insert_surveys(result.data.surveys)
+
+        return result.data
+
     @staticmethod
     def load_survey(params: GlobalParams, event: QueueEvent):
-        survey_name = event.args[0]
+        signature = event.args[0]
 
-        with open(f"surveys/{survey_name}.json", "r") as src:
-            survey = load(src)
+        with db_session:
+            survey = get_survey(signature)
+        if survey is None:
+            params.console.print(f"{FAIL_PREFIX}No stored survey [b]{signature}[/]")
+            return HandleResult.FAIL
 
-            with params.lock:
-                params.game_state.surveys[survey["symbol"]][survey["signature"]] = Survey(
-                    symbol=survey["symbol"],
-                    signature=survey["signature"],
-                    expiration=isoparse(survey["expiration"]),
-                    size=SurveySize(survey["size"]),
-                    deposits=[SurveyDeposit(deposit["symbol"]) for deposit in survey["deposits"]]
-                )
-                pprint(params.game_state.surveys)
+        with params.lock:
+            params.game_state.surveys[survey.symbol][survey.signature] = survey
+            pprint(params.game_state.surveys)
 
     @staticmethod
-    def jump(params: GlobalParams, event: QueueEvent):
+    async def jump(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
         system_symbol = event.args[1]
 
@@ -346,12 +367,10 @@ class ShipHandler:
             system_symbol=system_symbol
         )
 
-        result = jump_ship.sync(client=params.client, ship_symbol=ship_symbol, json_body=body)
+        result = await request(params, jump_ship, ship_symbol=ship_symbol, json_body=body)
 
         with params.lock:
-            ship = params.game_state.ships[ship_symbol]
-            ship.nav = result.data.nav
-            ship.additional_properties["cooldown"] = result.data.cooldown
+            params.game_state.update_ship(ship_symbol, nav=result.data.nav, cooldown=result.data.cooldown)
 
             cooldown = result.data.cooldown
             cooldown_duration = cooldown.expiration - datetime.now(tz=timezone.utc)
@@ -362,8 +381,10 @@ class ShipHandler:
                 f"({cooldown.expiration.isoformat(timespec='seconds')})[/]"
             )
 
+        return result.data
+
     @staticmethod
-    def flight_mode(params: GlobalParams, event: QueueEvent):
+    async def flight_mode(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
         mode = event.args[1]
 
@@ -376,30 +397,34 @@ class ShipHandler:
         body = PatchShipNavJsonBody(
             flight_mode=ShipNavFlightMode(mode)
         )
-        result = patch_ship_nav.sync(client=params.client, ship_symbol=ship_symbol, json_body=body)
+        result = await request(params, patch_ship_nav, ship_symbol=ship_symbol, json_body=body)
         with params.lock:
-            ship = params.game_state.ships[ship_symbol]
-            ship.nav = result.data
+            params.game_state.update_ship(ship_symbol, nav=result.data)
             params.console.print(f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] is now in [flight_mode]{mode}[/] flight mode")
 
+        return result.data
+
     @staticmethod
-    def chart(params: GlobalParams, event: QueueEvent):
+    async def chart(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
 
-        result = create_chart.sync(client=params.client, ship_symbol=ship_symbol)
+        result = await request(params, create_chart, ship_symbol=ship_symbol)
         params.console.print(
             f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] created chart [waypoint]{result.data.chart.waypoint_symbol}[/]"
         )
 
+        return result.data
+
     @staticmethod
-    def scan_waypoints(params: GlobalParams, event: QueueEvent):
+    async def scan_waypoints(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
 
-        result = create_ship_waypoint_scan.sync(client=params.client, ship_symbol=ship_symbol)
+        result = await request(params, create_ship_waypoint_scan, ship_symbol=ship_symbol)
         params.console.print(
             f"{SUCCESS_PREFIX}[ship]{ship_symbol}[/] scanned waypoints."
         )
         with params.lock:
-            ship = params.game_state.ships[ship_symbol]
-            ship.additional_properties["cooldown"] = result.data.cooldown
+            params.game_state.update_ship(ship_symbol, cooldown=result.data.cooldown)
         pprint(result.data)
+
+        return result.data
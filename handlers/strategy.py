@@ -1,12 +1,12 @@
-from json import load
-from os import walk
-from os.path import join
+from pony.orm import db_session
 
+from database.store import get_system_markets
 from event_queue import QueueEvent, EventType
 from global_params import global_params, GlobalParams
 from handle_result import HandleResult
-from space_traders_api_client.models import Market
+from printers import INFO_PREFIX, FAIL_PREFIX
 from strategies.in_system_trade import SystemTradeStrategy
+from strategies.jump_gate_surveyor import JumpGateSurveyor
 
 
 class StrategyHandler:
@@ -14,16 +14,26 @@ class StrategyHandler:
 
     def __init__(self):
         self.active_strategies = {
-            "in_system_trade": SystemTradeStrategy(global_params)
+            "in_system_trade": SystemTradeStrategy(global_params),
+            "jump_gate_surveyor": JumpGateSurveyor(global_params),
         }
 
         self.handlers = {
             "trade": self.assign_trade_ship,
             "market_update": self.assign_system_market_updater,
             "trade_routes": self.construct_trade_routes,
-            "assign_ship_standby": self.assign_ship_standby
+            "assign_ship_standby": self.assign_ship_standby,
+            "cancel_ship_events": self.cancel_ship_events,
+            "budget_share": self.set_budget_share,
+            "explore": self.assign_explorer_probe,
+            "explore_stop": self.release_explorer_probe,
         }
 
+    @staticmethod
+    def __remember_ship(params: GlobalParams, event: QueueEvent):
+        # queued again on the next start, so the ship goes back to its strategy
+        params.event_queue.remember_assignment(f"ship:{event.args[0]}", event)
+
     def assign_trade_ship(self, params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
         resource = event.args[1]
@@ -32,6 +42,7 @@ class StrategyHandler:
 
         with params.lock:
             self.active_strategies["in_system_trade"].assign_ship(ship_symbol, resource, source, target)
+        self.__remember_ship(params, event)
 
         return HandleResult.SKIP
 
@@ -41,22 +52,49 @@ class StrategyHandler:
 
         with params.lock:
             self.active_strategies["in_system_trade"].assign_market_updater(ship_symbol, system)
+        self.__remember_ship(params, event)
+
+        return HandleResult.SKIP
+
+    def assign_explorer_probe(self, params: GlobalParams, event: QueueEvent):
+        ship_symbol = event.args[0]
+        surveyor = self.active_strategies["jump_gate_surveyor"]
+
+        with params.lock:
+            if len(event.args) > 1:
+                # exploration prefers systems near this one, headquarters by default
+                surveyor.starting_system = event.args[1]
+            surveyor.assign_probe(ship_symbol)
+        self.__remember_ship(params, event)
+
+        return HandleResult.SKIP
+
+    def release_explorer_probe(self, params: GlobalParams, event: QueueEvent):
+        ship_symbol = event.args[0]
+
+        with params.lock:
+            result = self.active_strategies["jump_gate_surveyor"].release_probe(ship_symbol)
+        if result == HandleResult.FAIL:
+            params.console.print(f"{FAIL_PREFIX}[ship]{ship_symbol}[/] is not exploring")
+        else:
+            params.event_queue.forget_assignment(f"ship:{ship_symbol}")
+            params.console.print(f"{INFO_PREFIX}[ship]{ship_symbol}[/] stopped exploring")
 
         return HandleResult.SKIP
 
     def construct_trade_routes(self, params: GlobalParams, event: QueueEvent):
         system = event.args[0]
 
-        for root, _, files in walk("fetched_json_data/markets"):
-            for file_name in files:
-                if not file_name.startswith(system):
-                    continue
-                with open(join(root, file_name), "r") as src:
-                    with params.lock:
-                        market = Market.from_dict(load(src))
-                        params.game_state.markets[market.symbol] = market
+        # stored trade goods of the whole system in one query
+        with db_session:
+            markets = get_system_markets(system)
+        with params.lock:
+            params.game_state.markets.update(markets)
+            self.active_strategies["in_system_trade"].assign_system(system)
+        # ships on standby get their routes again after a restart
+        params.event_queue.remember_assignment(f"trade_routes:{system}", event)
 
-        self.active_strategies["in_system_trade"].assign_system(system)
+        # takes the lock only to assign the routes found
         self.active_strategies["in_system_trade"].build_trade_routes()
 
     def assign_ship_standby(self, params: GlobalParams, event: QueueEvent):
@@ -64,5 +102,28 @@ class StrategyHandler:
 
         with params.lock:
             self.active_strategies["in_system_trade"].assign_ship_standby(ship_symbol)
+        self.__remember_ship(params, event)
+
+        return HandleResult.SKIP
+
+    @staticmethod
+    def cancel_ship_events(params: GlobalParams, event: QueueEvent):
+        ship_symbol = event.args[0]
+
+        cancelled = params.event_queue.cancel_for_ship(ship_symbol)
+        params.event_queue.forget_assignment(f"ship:{ship_symbol}")
+        params.console.print(f"{INFO_PREFIX}Cancelled {cancelled} pending events of [ship]{ship_symbol}[/]")
+
+        return HandleResult.SKIP
+
+    @staticmethod
+    def set_budget_share(params: GlobalParams, event: QueueEvent):
+        origin = event.args[0]
+        # no share (or "none") lifts the limit
+        share = float(event.args[1]) if len(event.args) > 1 and event.args[1] != "none" else None
+
+        params.request_budget.set_share(origin, share)
+        share_str = f"{share:.0%}" if share is not None else "unlimited"
+        params.console.print(f"{INFO_PREFIX}Request budget share of [b]{origin}[/] set to {share_str}")
 
         return HandleResult.SKIP
@@ -1,13 +1,29 @@
-from json import dump
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime
 
+from loguru import logger
+from pony.orm import db_session, select
 from rich.pretty import pprint
 
-from event_queue import QueueEvent, EventType
+from database.galaxy import get_crawl_state, upsert_systems, upsert_waypoints
+from database.store import get_system_symbol, upsert_market, upsert_shipyard, upsert_jump_gate
+from database.system import DBSystem
+from event_queue import QueueEvent, EventType, EventLane
 from global_params import GlobalParams
-from printers import print_waypoints, FAIL_PREFIX, print_market, SUCCESS_PREFIX, print_shipyard
+from pagination import fetch_pages, fetch_all_pages, get_page_count, MAX_PAGE_LIMIT
+from printers import print_waypoints, FAIL_PREFIX, print_market, SUCCESS_PREFIX, print_shipyard, INFO_PREFIX
 from space_traders_api_client.api.systems import (
-    get_system_waypoints, get_waypoint, get_market, get_system, get_jump_gate, get_shipyard
+    get_system_waypoints, get_waypoint, get_market, get_system, get_jump_gate, get_shipyard, get_systems
 )
+from .api import request
+
+CRAWLER_ORIGIN = "crawler"
+SYSTEMS_CRAWL = "systems"
+# systems pages stored per transaction
+CRAWL_SYSTEM_PAGES_PER_CHUNK = 10
+# systems whose waypoints are stored per transaction
+CRAWL_WAYPOINT_SYSTEMS_PER_CHUNK = 10
 
 
 class SystemHandler:
@@ -21,74 +37,202 @@ class SystemHandler:
             "system_waypoints": self.fetch_system_waypoints,
             "fetch_market": self.fetch_market,
             "shipyard": self.fetch_shipyard,
+            "crawl": self.crawl,
+            "crawl_systems": self.crawl_systems,
+            "crawl_waypoints": self.crawl_waypoints,
         }
 
     @staticmethod
-    def fetch_waypoint(params: GlobalParams, event: QueueEvent):
+    async def fetch_waypoint(params: GlobalParams, event: QueueEvent):
         waypoint = event.args[0]
-        system = "-".join(waypoint.split("-")[0:2])
+        system = get_system_symbol(waypoint)
 
-        result = get_waypoint.sync(client=params.client, system_symbol=system, waypoint_symbol=waypoint)
+        result = await request(params, get_waypoint, system_symbol=system, waypoint_symbol=waypoint)
         if result.data:
             pprint(result.data)
+            with db_session:
+                upsert_waypoints(system, [result.data], complete=False)
         else:
             params.console.print(f"{FAIL_PREFIX}System [system]{system}[/] not found")
 
+        return result.data
+
     @staticmethod
     def fetch_system_waypoints(params: GlobalParams, event: QueueEvent):
         system = event.args[0]
-        result = get_system_waypoints.sync(client=params.client, system_symbol=system)
-        if result.data:
-            print_waypoints(result.data)
-
-            with open(f"fetched_json_data/waypoints/{system}.json", "w") as target_file:
-                dump([wp.to_dict() for wp in result.data], target_file)
+        waypoints = fetch_all_pages(
+            lambda page, limit: get_system_waypoints.sync(system, client=params.client, page=page, limit=limit)
+        )
+        if waypoints:
+            print_waypoints(waypoints)
+
+            with db_session:
+                upsert_waypoints(system, waypoints)
         else:
             params.console.print(f"{FAIL_PREFIX}Failed to fetch system [system]{system}[/] waypoints")
 
+        return waypoints
+
     @staticmethod
-    def fetch_market(params: GlobalParams, event: QueueEvent):
+    async def fetch_market(params: GlobalParams, event: QueueEvent):
         waypoint = event.args[0]
-        system = "-".join(waypoint.split("-")[0:2])
+        system = get_system_symbol(waypoint)
 
-        result = get_market.sync(client=params.client, system_symbol=system, waypoint_symbol=waypoint)
+        result = await request(params, get_market, system_symbol=system, waypoint_symbol=waypoint)
         # remove debug when done
         print_market(result.data)
         params.console.print(f"{SUCCESS_PREFIX}Updated [waypoint]{waypoint}[/] Market")
         with params.lock:
             params.game_state.markets[waypoint] = result.data
+        params.market_history.record(result.data)
 
-        with open(f"fetched_json_data/markets/{waypoint}.json", "w") as target_file:
-            dump(result.data.to_dict(), target_file)
+        with db_session:
+            upsert_market(result.data)
+
+        return result.data
 
     @staticmethod
-    def fetch_shipyard(params: GlobalParams, event: QueueEvent):
+    async def fetch_shipyard(params: GlobalParams, event: QueueEvent):
         waypoint = event.args[0]
-        system = "-".join(waypoint.split("-")[0:2])
+        system = get_system_symbol(waypoint)
 
-        result = get_shipyard.sync(client=params.client, system_symbol=system, waypoint_symbol=waypoint)
+        result = await request(params, get_shipyard, system_symbol=system, waypoint_symbol=waypoint)
         # remove debug when done
         print_shipyard(result.data)
         params.console.print(f"{SUCCESS_PREFIX}Updated [waypoint]{waypoint}[/] Shipyard")
 
-        with open(f"fetched_json_data/shipyards/{waypoint}.json", "w") as target_file:
-            dump(result.data.to_dict(), target_file)
+        with db_session:
+            upsert_shipyard(result.data)
+
+        return result.data
 
     @staticmethod
-    def fetch_system(params: GlobalParams, event: QueueEvent):
+    async def fetch_system(params: GlobalParams, event: QueueEvent):
         system = event.args[0]
 
-        result = get_system.sync(client=params.client, system_symbol=system)
+        result = await request(params, get_system, system_symbol=system)
 
-        with open(f"fetched_json_data/systems/{system}.json", "w") as target_file:
-            dump(result.data.to_dict(), target_file)
+        with db_session:
+            upsert_systems([result.data])
+        params.system_graph.add_systems([(result.data.symbol, result.data.x, result.data.y)])
+
+        return result.data
 
     @staticmethod
-    def fetch_jump_gate(params: GlobalParams, event: QueueEvent):
+    async def fetch_jump_gate(params: GlobalParams, event: QueueEvent):
         waypoint = event.args[0]
-        system = "-".join(waypoint.split("-")[0:2])
+        system = get_system_symbol(waypoint)
+
+        result = await request(params, get_jump_gate, system_symbol=system, waypoint_symbol=waypoint)
 
-        result = get_jump_gate.sync(client=params.client, system_symbol=system, waypoint_symbol=waypoint)
+        with db_session:
+            upsert_jump_gate(waypoint, result.data)
+        params.system_graph.add_gate(
+            system, [(connected.symbol, connected.x, connected.y) for connected in result.data.connected_systems]
+        )
+        params.console.print(
+            f"{SUCCESS_PREFIX}Charted [system]{system}[/] jump gate - "
+            f"{len(result.data.connected_systems)} connected systems"
+        )
 
-        with open(f"fetched_json_data/jump_gates/{system}.json", "w") as target_file:
-            dump(result.data.to_dict(), target_file)
+        return result.data
+
+    @staticmethod
+    def __queue_crawl_chunks(params: GlobalParams, event_name: str, items: list, chunk_size: int) -> int:
+        # crawling runs in the background lane, so it only takes what the strategies leave over
+        chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+        for chunk in chunks:
+            params.event_queue.put(
+                EventType.SYSTEM, event_name, chunk, lane=EventLane.BACKGROUND, origin=CRAWLER_ORIGIN
+            )
+        return len(chunks)
+
+    @staticmethod
+    def crawl(params: GlobalParams, event: QueueEvent):
+        """
+        Starts crawling the whole galaxy into the database, or resumes where the last crawl stopped
+        """
+        with db_session:
+            state = get_crawl_state(SYSTEMS_CRAWL)
+            total, done_pages = state.total, set(state.done_pages)
+
+        if total is None:
+            # first page tells how many there are
+            first = get_systems.sync(client=params.client, page=1, limit=MAX_PAGE_LIMIT)
+            with db_session:
+                upsert_systems(first.data)
+                state = get_crawl_state(SYSTEMS_CRAWL)
+                state.total = total = first.meta.total
+                state.done_pages = [1]
+                state.updated = datetime.utcnow()
+            params.system_graph.add_systems((system.symbol, system.x, system.y) for system in first.data)
+            done_pages = {1}
+
+        pending_pages = [
+            page for page in range(1, get_page_count(total, MAX_PAGE_LIMIT) + 1) if page not in done_pages
+        ]
+        with db_session:
+            # systems stored by previous crawls whose waypoints are still missing
+            uncrawled = list(select(s.symbol for s in DBSystem if not s.waypoints_crawled))
+
+        system_chunks = SystemHandler.__queue_crawl_chunks(
+            params, "crawl_systems", pending_pages, CRAWL_SYSTEM_PAGES_PER_CHUNK
+        )
+        waypoint_chunks = SystemHandler.__queue_crawl_chunks(
+            params, "crawl_waypoints", uncrawled, CRAWL_WAYPOINT_SYSTEMS_PER_CHUNK
+        )
+        params.console.print(
+            f"{INFO_PREFIX}Crawling [b]{len(pending_pages)}[/] systems pages in {system_chunks} chunks "
+            f"and waypoints of [b]{len(uncrawled)}[/] systems in {waypoint_chunks} chunks"
+        )
+
+    @staticmethod
+    def crawl_systems(params: GlobalParams, event: QueueEvent):
+        pages = [int(page) for page in event.args]
+
+        results = fetch_pages(
+            lambda page, limit: get_systems.sync(client=params.client, page=page, limit=limit),
+            pages, concurrency=params.rate_limiter.burst
+        )
+        systems = [system for page in sorted(results) for system in results[page]]
+
+        # systems of the whole chunk and the checkpoint commit together
+        with db_session:
+            created = upsert_systems(systems)
+            state = get_crawl_state(SYSTEMS_CRAWL)
+            state.done_pages = sorted(set(state.done_pages) | set(results))
+            state.updated = datetime.utcnow()
+            done, total = len(state.done_pages), get_page_count(state.total or 0, MAX_PAGE_LIMIT)
+        params.system_graph.add_systems((system.symbol, system.x, system.y) for system in systems)
+
+        logger.info(f"[crawler] stored {len(systems)} systems ({created} new), pages {done}/{total}")
+
+        SystemHandler.__queue_crawl_chunks(
+            params, "crawl_waypoints", [system.symbol for system in systems], CRAWL_WAYPOINT_SYSTEMS_PER_CHUNK
+        )
+        return systems
+
+    @staticmethod
+    def crawl_waypoints(params: GlobalParams, event: QueueEvent):
+        symbols = list(event.args)
+        with db_session:
+            # replayed or duplicated chunks skip what is already stored
+            systems = list(select(s.symbol for s in DBSystem if s.symbol in symbols and not s.waypoints_crawled))
+        if not systems:
+            return
+
+        def fetch_system(system: str) -> list:
+            return fetch_all_pages(
+                lambda page, limit: get_system_waypoints.sync(system, client=params.client, page=page, limit=limit)
+            )
+
+        with ThreadPoolExecutor(max_workers=max(1, min(params.rate_limiter.burst, len(systems)))) as pool:
+            # context is copied here, pool threads have their own empty one - requests stay accounted to the crawler
+            futures = [pool.submit(copy_context().run, fetch_system, system) for system in systems]
+            waypoints = [future.result() for future in futures]
+
+        with db_session:
+            for system, system_waypoints in zip(systems, waypoints):
+                upsert_waypoints(system, system_waypoints)
+
+        logger.info(f"[crawler] stored waypoints of {len(systems)} systems")
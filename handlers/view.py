@@ -1,10 +1,11 @@
 from event_queue import QueueEvent, EventType
 from global_params import GlobalParams
 from printers import print_ships, print_contracts, FAIL_PREFIX, print_ship, print_agent, print_market, print_shipyard, \
-    print_surveys
+    print_surveys, print_dead_letters, print_budget, print_system_path, print_state_changes
 from space_traders_api_client.api.systems import (
     get_shipyard, get_market
 )
+from system_graph import TravelProfile
 
 
 class ViewHandler:
@@ -22,28 +23,29 @@ class ViewHandler:
             "market": self.view_market,
             "shipyard": self.view_shipyard,
             "surveys": self.view_surveys,
+            "dead_letters": self.view_dead_letters,
+            "budget": self.view_budget,
+            "path": self.view_path,
+            "changes": self.view_changes,
         }
 
     @staticmethod
     def view_ship(params: GlobalParams, event: QueueEvent):
         ship_symbol = event.args[0]
-        ship = params.game_state.ships.get(ship_symbol, None)
+        ship = params.snapshot().ships.get(ship_symbol, None)
         if ship is None:
             params.console.print(f"No ship with symbol [ship]{ship_symbol}[/]", style="red")
             return
 
-        with params.lock:
-            print_ship(ship)
+        print_ship(ship)
 
     @staticmethod
     def view_all_ships(params: GlobalParams, event: QueueEvent):
-        with params.lock:
-            print_ships(list(params.game_state.ships.values()))
+        print_ships(list(params.snapshot().ships.values()))
 
     @staticmethod
     def view_agent(params: GlobalParams, event: QueueEvent):
-        with params.lock:
-            print_agent(params.game_state.agent)
+        print_agent(params.snapshot().agent)
 
     @staticmethod
     def view_contract(params: GlobalParams, event: QueueEvent):
@@ -51,8 +53,7 @@ class ViewHandler:
 
     @staticmethod
     def view_all_contracts(params: GlobalParams, event: QueueEvent):
-        with params.lock:
-            print_contracts(params.game_state.contracts.values())
+        print_contracts(params.snapshot().contracts.values())
 
     @staticmethod
     def view_waypoint(params: GlobalParams, event: QueueEvent):
@@ -86,3 +87,40 @@ class ViewHandler:
     def view_surveys(params: GlobalParams, event: QueueEvent):
         with params.lock:
             print_surveys(params.game_state.surveys)
+
+    @staticmethod
+    def view_dead_letters(params: GlobalParams, event: QueueEvent):
+        print_dead_letters(params.retry_policy.dead_letters)
+
+    @staticmethod
+    def view_budget(params: GlobalParams, event: QueueEvent):
+        budget = params.request_budget
+        print_budget(budget.get_usage(), budget.get_ship_totals(), budget.window)
+
+    @staticmethod
+    def view_path(params: GlobalParams, event: QueueEvent):
+        """
+        path <from system> <to system> [speed] [warp range]
+        """
+        source, destination, *rest = event.args
+        speed = float(rest[0]) if rest else 30
+        warp_range = int(rest[1]) if len(rest) > 1 else 0
+
+        hops = params.system_graph.find_path(source, destination, TravelProfile(speed, warp_range))
+        if hops is None:
+            params.console.print(f"{FAIL_PREFIX}No known path from [system]{source}[/] to [system]{destination}[/]")
+            return
+        print_system_path(source, destination, hops)
+
+    @staticmethod
+    def view_changes(params: GlobalParams, event: QueueEvent):
+        """
+        changes [ship symbol]
+        """
+        ship_symbol = event.args[0] if event.args else None
+        with params.lock:
+            changes = [
+                change for change in params.game_state.changes
+                if ship_symbol is None or getattr(change, "ship_symbol", None) == ship_symbol
+            ]
+        print_state_changes(changes)
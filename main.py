@@ -1,58 +1,38 @@
 from os import getenv
-from queue import Empty
 from sys import stdout
-from threading import Thread, get_ident as get_thread_id
-from time import sleep
 
 from dotenv import load_dotenv
 from loguru import logger
+from pony.orm import db_session
 
+from async_executor import AsyncExecutor
 from database import bind_db
-from event_queue import QueueEvent
-from event_queue import event_queue
+from database.store import get_system_coords, get_jump_links
+from event_queue import event_queue, EventJournal
 from event_queue.event_types import EventType
+from executor import Executor, EXIT_CMD
 from global_params import global_params
-from handle_result import HandleResult
 from handlers import handle_event
-
-EXIT_CMD = "exit"
-
-
-def thread_command_runner():
-    thread_id = get_thread_id()
-
-    while True:
-        global_params.event_queue.update_scheduled()
-        try:
-            event: QueueEvent = global_params.event_queue.get(timeout=0.6)
-        except Empty:
-            continue
-
-        if event.event_name == "exit":
-            logger.debug(f"[thread {thread_id}] exiting...")
-            break
-
-        logger.debug(f"[thread {thread_id}] executing {event}")
-
-        result = handle_event(global_params, event)
-
-        if result == HandleResult.SKIP:
-            logger.debug(f"{event} has been skipped by handler")
-            continue
-        # notify event queue that processing for this event is complete
-        # this also notifies all subscribers
-        global_params.event_queue.event_done(event, result)
-        # sleeping on a timer to respect rate limits (2r/s)
-        # could do it smarter with headers and burst limit handling, but I'm lazy
-        sleep(0.55)
+from printers import INFO_PREFIX
+from request_budget import parse_shares
 
 
 def main():
     load_dotenv()
     bind_db()
 
-    _thread = Thread(target=thread_command_runner, daemon=True)
-    _thread.start()
+    # fraction of requests each strategy may take while others are waiting
+    global_params.request_budget.shares.update(
+        parse_shares(getenv("BUDGET_SHARES", "trade=0.6,mining=0.25,scouting=0.1,exploration=0.05"))
+    )
+
+    if getenv("EXECUTOR_MODE", "threads") == "async":
+        # single event loop, async handlers share one AsyncClient
+        executor = AsyncExecutor(global_params, concurrency=int(getenv("EXECUTOR_CONCURRENCY", "16")))
+    else:
+        # more than one worker lets different ships proceed in parallel, keeping per-ship order
+        executor = Executor(global_params, workers=int(getenv("EXECUTOR_WORKERS", "1")))
+    executor.start()
 
     logger.remove(0)  # remove default
     # only write errors in stdout
@@ -60,6 +40,13 @@ def main():
     logger.add("exec.log", rotation="1 day", retention="2 days", enqueue=True)
     logger.add("error.log", rotation="1 day", retention="2 days", enqueue=True, level="ERROR")
 
+    journal = EventJournal(getenv("JOURNAL_PATH", "event_journal.jsonl"))
+    market_history_path = getenv("MARKET_HISTORY_PATH", "market_history.bin")
+    global_params.market_history.load(market_history_path)
+    with db_session:
+        global_params.system_graph.load(get_system_coords(), get_jump_links())
+    logger.info(f"System graph: {len(global_params.system_graph)} systems")
+
     token = getenv("TOKEN", "undefined")
     is_token_present = token != "undefined"
     logger.info(f"Token: {'found' if is_token_present else 'NOT FOUND'}")
@@ -68,9 +55,14 @@ def main():
         global_params.console.rule("Fetching game data", style="red", align="left")
         global_params.client.token = token
         # fetch all relevant base data
-        global_params.event_queue.put(EventType.AGENT, "fetch")
-        global_params.event_queue.put(EventType.SHIP, "fetch_all")
-        global_params.event_queue.put(EventType.CONTRACT, "fetch_all")
+        global_params.event_queue.put(EventType.AGENT, "bootstrap")
+
+        # strategy assignments and pending fetches of the previous run go after the bootstrap,
+        # so strategies plan again against fresh state
+        replay = getenv("JOURNAL_REPLAY", "true").lower() in ("1", "true", "yes")
+        replayed = global_params.event_queue.attach_journal(journal, replay=replay)
+        if replayed:
+            global_params.console.print(f"{INFO_PREFIX}Replayed [b]{replayed}[/] pending events from the journal")
 
         with open("autorun.txt", "r") as autorun_src:
             for line in autorun_src:
@@ -115,8 +107,12 @@ def main():
             else:
                 global_params.event_queue.put(event_type, event_name, args)
 
-    # wait for processing thread to finish
-    _thread.join()
+    # wait for processing threads to finish
+    executor.join()
+    journal.close()
+    global_params.market_history.save(market_history_path)
+    # release pooled keep-alive connections
+    global_params.client.close()
     logger.info("...done")
 
 
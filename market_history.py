@@ -0,0 +1,248 @@
+# append-only history of market observations, one row per (waypoint, resource, time).
+# every series keeps its columns in typed arrays, so a row costs ~30 bytes instead of a python object.
+# recent rows are kept as observed, older ones are averaged into buckets, and the oldest are dropped
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pickle import dump, load, HIGHEST_PROTOCOL
+from statistics import fmean, pstdev
+from threading import Lock
+from time import time
+
+from loguru import logger
+
+from space_traders_api_client.models import Market, MarketTradeGoodSupply
+from space_traders_api_client.types import Unset
+
+# supply levels stored as their index
+SUPPLY_LEVELS = [
+    MarketTradeGoodSupply.SCARCE, MarketTradeGoodSupply.LIMITED,
+    MarketTradeGoodSupply.MODERATE, MarketTradeGoodSupply.ABUNDANT,
+]
+HOUR = 3600.0
+
+
+@dataclass(slots=True)
+class PriceStats:
+    samples: int
+    purchase_mean: float
+    sell_mean: float
+    # price change per hour (least squares slope)
+    purchase_trend: float
+    sell_trend: float
+    # standard deviation relative to the mean
+    purchase_volatility: float
+    sell_volatility: float
+
+
+class PriceSeries:
+    """
+    Columns of a single (waypoint, resource) series, ordered by time
+    """
+    __slots__ = ["timestamps", "purchase", "sell", "volume", "supply", "compacted_until"]
+
+    def __init__(self):
+        self.timestamps = array("d")
+        self.purchase = array("l")
+        self.sell = array("l")
+        self.volume = array("l")
+        self.supply = array("b")
+        # rows before this are bucketed already
+        self.compacted_until = 0.0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __columns(self) -> tuple[array, ...]:
+        return self.timestamps, self.purchase, self.sell, self.volume, self.supply
+
+    def append(self, timestamp: float, purchase: int, sell: int, volume: int, supply: int):
+        # late observations go in place, so the series stays sorted
+        index = len(self.timestamps)
+        if index and self.timestamps[-1] > timestamp:
+            index = bisect_left(self.timestamps, timestamp)
+        for column, value in zip(self.__columns(), (timestamp, purchase, sell, volume, supply)):
+            column.insert(index, value)
+
+    def drop_before(self, timestamp: float):
+        index = bisect_left(self.timestamps, timestamp)
+        if index:
+            for column in self.__columns():
+                del column[:index]
+
+    def downsample(self, before: float, bucket: float):
+        """
+        Averages rows older than `before` into one row per bucket
+        """
+        before = before - before % bucket
+        start = bisect_left(self.timestamps, self.compacted_until)
+        end = bisect_left(self.timestamps, before)
+        if end - start < 2:
+            self.compacted_until = max(self.compacted_until, before)
+            return
+
+        rows = [array(column.typecode) for column in self.__columns()]
+        bucket_start = start
+        while bucket_start < end:
+            bucket_key = self.timestamps[bucket_start] // bucket
+            bucket_end = bucket_start + 1
+            while bucket_end < end and self.timestamps[bucket_end] // bucket == bucket_key:
+                bucket_end += 1
+
+            for target, column in zip(rows, self.__columns()):
+                values = column[bucket_start:bucket_end]
+                average = fmean(values)
+                target.append(average if column.typecode == "d" else round(average))
+            bucket_start = bucket_end
+
+        for column, bucketed in zip(self.__columns(), rows):
+            column[start:end] = bucketed
+        self.compacted_until = before
+
+    def window(self, since: float) -> tuple[array, array, array]:
+        start = bisect_left(self.timestamps, since)
+        return self.timestamps[start:], self.purchase[start:], self.sell[start:]
+
+
+def _slope(timestamps: array, values: array) -> float:
+    """
+    Least squares slope in value per hour
+    """
+    if len(timestamps) < 2:
+        return 0.0
+    mean_t = fmean(timestamps)
+    mean_v = fmean(values)
+    variance = sum((t - mean_t) ** 2 for t in timestamps)
+    if variance == 0:
+        return 0.0
+    covariance = sum((t - mean_t) * (v - mean_v) for t, v in zip(timestamps, values))
+    return covariance / variance * HOUR
+
+
+def _volatility(values: array) -> float:
+    if len(values) < 2:
+        return 0.0
+    mean = fmean(values)
+    return pstdev(values, mean) / mean if mean else 0.0
+
+
+class MarketHistory:
+    def __init__(self, raw_retention: float = 6 * HOUR, bucket: float = HOUR, retention: float = 7 * 24 * HOUR):
+        self.__lock = Lock()
+        # observations younger than raw_retention are kept as they are,
+        # older ones are averaged per bucket and dropped after retention
+        self.raw_retention = raw_retention
+        self.bucket = bucket
+        self.retention = retention
+
+        self.__series: dict[tuple[str, str], PriceSeries] = {}
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return sum(len(series) for series in self.__series.values())
+
+    def record(self, market: Market, observed: datetime | None = None):
+        """
+        Appends current trade goods of a market
+        """
+        if isinstance(market.trade_goods, Unset):
+            return
+
+        timestamp = observed.timestamp() if observed is not None else time()
+        with self.__lock:
+            for good in market.trade_goods:
+                series = self.__series.get((market.symbol, good.symbol), None)
+                if series is None:
+                    series = self.__series[(market.symbol, good.symbol)] = PriceSeries()
+
+                series.append(
+                    timestamp, good.purchase_price, good.sell_price, good.trade_volume,
+                    SUPPLY_LEVELS.index(good.supply)
+                )
+                self.__compact(series, timestamp)
+
+    def __compact(self, series: PriceSeries, now: float):
+        # bucketing runs once a full bucket of raw rows got old enough
+        if now - self.raw_retention - series.compacted_until >= self.bucket:
+            series.downsample(now - self.raw_retention, self.bucket)
+            series.drop_before(now - self.retention)
+
+    def get_stats(self, waypoint_symbol: str, resource_symbol: str, window: float = 24 * HOUR,
+                  now: float | None = None) -> PriceStats | None:
+        """
+        Price statistics of observations within the window, None when never observed
+        """
+        since = (now if now is not None else time()) - window
+        with self.__lock:
+            series = self.__series.get((waypoint_symbol, resource_symbol), None)
+            if series is None:
+                return None
+            timestamps, purchase, sell = series.window(since)
+
+        if len(timestamps) == 0:
+            return None
+
+        return PriceStats(
+            samples=len(timestamps),
+            purchase_mean=fmean(purchase),
+            sell_mean=fmean(sell),
+            purchase_trend=_slope(timestamps, purchase),
+            sell_trend=_slope(timestamps, sell),
+            purchase_volatility=_volatility(purchase),
+            sell_volatility=_volatility(sell),
+        )
+
+    def get_series(self, waypoint_symbol: str, resource_symbol: str,
+                   since: datetime | None = None) -> list[tuple[datetime, int, int, int, MarketTradeGoodSupply]]:
+        """
+        Rows as (observed, purchase, sell, volume, supply)
+        """
+        with self.__lock:
+            series = self.__series.get((waypoint_symbol, resource_symbol), None)
+            if series is None:
+                return []
+            start = bisect_left(series.timestamps, since.timestamp()) if since is not None else 0
+            return [
+                (
+                    datetime.fromtimestamp(series.timestamps[index], tz=timezone.utc), series.purchase[index],
+                    series.sell[index], series.volume[index], SUPPLY_LEVELS[series.supply[index]]
+                )
+                for index in range(start, len(series))
+            ]
+
+    def save(self, path: str):
+        with self.__lock:
+            with open(path, "wb") as target:
+                dump(
+                    {
+                        key: (
+                            series.compacted_until, series.timestamps, series.purchase, series.sell, series.volume,
+                            series.supply
+                        )
+                        for key, series in self.__series.items()
+                    },
+                    target, protocol=HIGHEST_PROTOCOL
+                )
+
+    def load(self, path: str) -> int:
+        """
+        Restores history saved by a previous run. Returns the number of series
+        """
+        try:
+            with open(path, "rb") as src:
+                saved = load(src)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.error(f"[market history] failed to load {path}: {e}")
+            return 0
+
+        with self.__lock:
+            for key, (compacted_until, timestamps, purchase, sell, volume, supply) in saved.items():
+                series = PriceSeries()
+                series.compacted_until = compacted_until
+                series.timestamps, series.purchase, series.sell = timestamps, purchase, sell
+                series.volume, series.supply = volume, supply
+                self.__series[key] = series
+            return len(saved)
@@ -0,0 +1,144 @@
+# fuel-aware in-system navigation: picks a flight mode per leg and stops at fuel stations only when the fuel
+# on board doesn't reach the destination. paths are found with dijkstra over the origin, the destination and
+# the fuel stations in between, each leg costing its travel time plus the value of the fuel it burns
+from dataclasses import dataclass, field
+from heapq import heapify, heappush, heappop
+from math import inf
+from typing import Collection
+
+from space_traders_api_client.models import ShipNavFlightMode
+from spatial_index import SpatialIndex
+
+# travel time multipliers of the flight modes (seconds = 15 + distance * multiplier / speed)
+FLIGHT_MODE_MULTIPLIERS = {
+    ShipNavFlightMode.BURN: 12.5,
+    ShipNavFlightMode.CRUISE: 25.0,
+    ShipNavFlightMode.DRIFT: 250.0,
+}
+# seconds a fuel unit is worth - below 0.5 burning fuel for speed never pays off
+DEFAULT_FUEL_VALUE = 0.5
+# a refuel stop costs dock, refuel and orbit requests, and some time
+REFUEL_STOP_SECONDS = 30.0
+
+
+def get_fuel_cost(distance: float, mode: ShipNavFlightMode) -> int:
+    if mode == ShipNavFlightMode.DRIFT:
+        return 1
+    fuel = max(1, round(distance))
+    return 2 * fuel if mode == ShipNavFlightMode.BURN else fuel
+
+
+def get_travel_seconds(distance: float, mode: ShipNavFlightMode, speed: float) -> float:
+    return 15 + max(1, round(distance)) * FLIGHT_MODE_MULTIPLIERS[mode] / max(speed, 1)
+
+
+@dataclass(slots=True)
+class NavigationLeg:
+    origin: str
+    destination: str
+    mode: ShipNavFlightMode
+    distance: float
+    fuel: int
+    seconds: float
+    # refuel at origin before taking the leg
+    refuel: bool = False
+
+
+@dataclass(slots=True)
+class NavigationPlan:
+    legs: list[NavigationLeg] = field(default_factory=list)
+    seconds: float = 0.0
+    fuel_left: int = 0
+
+    @property
+    def refuel_at_origin(self) -> bool:
+        return bool(self.legs) and self.legs[0].refuel
+
+
+class NavigationPlanner:
+    def __init__(self, index: SpatialIndex, fuel_stations: Collection[str], fuel_value: float = DEFAULT_FUEL_VALUE):
+        self.index = index
+        self.fuel_stations = set(fuel_stations)
+        self.fuel_value = fuel_value
+
+    def __best_leg(self, origin: str, destination: str, fuel: int, speed: float,
+                   reserve: int = 0) -> NavigationLeg | None:
+        distance = self.index.distance(origin, destination)
+        best, best_cost = None, inf
+        for mode in FLIGHT_MODE_MULTIPLIERS:
+            fuel_cost = get_fuel_cost(distance, mode)
+            if fuel_cost > fuel - reserve:
+                continue
+            seconds = get_travel_seconds(distance, mode, speed)
+            cost = seconds + fuel_cost * self.fuel_value
+            if cost < best_cost:
+                best, best_cost = NavigationLeg(origin, destination, mode, distance, fuel_cost, seconds), cost
+        return best
+
+    def plan(self, origin: str, destination: str, fuel: int, capacity: int, speed: float,
+             reserve: int = 0) -> NavigationPlan | None:
+        """
+        Cheapest way from origin to destination, arriving with at least reserve fuel
+        (not needed when the destination sells fuel). None when unreachable
+        """
+        if origin == destination:
+            return NavigationPlan(fuel_left=fuel)
+
+        # ships without fuel tanks (probes) fly anywhere
+        if capacity == 0:
+            distance = self.index.distance(origin, destination)
+            seconds = get_travel_seconds(distance, ShipNavFlightMode.CRUISE, speed)
+            leg = NavigationLeg(origin, destination, ShipNavFlightMode.CRUISE, distance, 0, seconds)
+            return NavigationPlan([leg], seconds, 0)
+
+        if destination in self.fuel_stations:
+            reserve = 0
+
+        # states are (waypoint, refueled there) - fuel on departure is as is at origin, a full tank after any refuel
+        costs: dict[tuple[str, bool], float] = {(origin, False): 0.0}
+        if origin in self.fuel_stations and fuel < capacity:
+            costs[(origin, True)] = REFUEL_STOP_SECONDS
+        previous: dict[tuple[str, bool], tuple[tuple[str, bool], NavigationLeg]] = {}
+        heap = [(cost, node, refueled) for (node, refueled), cost in costs.items()]
+        heapify(heap)
+
+        stops = self.fuel_stations - {origin, destination}
+        while heap:
+            cost, node, refueled = heappop(heap)
+            if cost > costs.get((node, refueled), inf):
+                continue
+            if node == destination:
+                return self.__build_plan((node, refueled), previous, fuel, capacity)
+
+            departure_fuel = capacity if refueled else fuel
+            for next_node in (*stops, destination):
+                if next_node == node:
+                    continue
+                leg_reserve = reserve if next_node == destination else 0
+                leg = self.__best_leg(node, next_node, departure_fuel, speed, leg_reserve)
+                if leg is None:
+                    continue
+                leg.refuel = refueled
+                # every stop on the way is a refuel stop
+                next_state = (next_node, next_node != destination)
+                next_cost = cost + leg.seconds + leg.fuel * self.fuel_value
+                if next_node != destination:
+                    next_cost += REFUEL_STOP_SECONDS
+                if next_cost < costs.get(next_state, inf):
+                    costs[next_state] = next_cost
+                    previous[next_state] = ((node, refueled), leg)
+                    heappush(heap, (next_cost, next_node, next_state[1]))
+
+        return None
+
+    @staticmethod
+    def __build_plan(state: tuple[str, bool], previous: dict, fuel: int, capacity: int) -> NavigationPlan:
+        legs = []
+        while state in previous:
+            state, leg = previous[state]
+            legs.append(leg)
+        legs.reverse()
+
+        last = legs[-1]
+        departure_fuel = capacity if last.refuel else fuel
+        return NavigationPlan(legs, sum(leg.seconds for leg in legs), departure_fuel - last.fuel)
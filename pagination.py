@@ -0,0 +1,61 @@
+# pages through list endpoints: the first page tells the total (meta.total), the rest are requested concurrently.
+# page requests go through the shared client, so the rate limiter keeps them within the burst budget
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from math import ceil
+from typing import Any, Callable
+
+# maximum page size the API allows
+MAX_PAGE_LIMIT = 20
+
+# (page, limit) -> parsed response with `data` and `meta`
+PageFetcher = Callable[[int, int], Any]
+# called with items of every page as soon as it arrives
+PageCallback = Callable[[list], None]
+
+
+def get_page_count(total: int, limit: int = MAX_PAGE_LIMIT) -> int:
+    return max(1, ceil(total / limit))
+
+
+def fetch_pages(fetch_page: PageFetcher, pages: range, limit: int = MAX_PAGE_LIMIT,
+                on_page: PageCallback | None = None, concurrency: int = 4) -> dict[int, list]:
+    """
+    Fetches given pages concurrently. Returns page number to its items
+    """
+    results = {}
+    if len(pages) == 0:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pages)))) as pool:
+        # each request runs in a copy of the caller context, so it's accounted to the calling event
+        futures = {
+            pool.submit(copy_context().run, fetch_page, page, limit): page
+            for page in pages
+        }
+        for future in as_completed(futures):
+            items = future.result().data
+            results[futures[future]] = items
+            if on_page is not None:
+                on_page(items)
+
+    return results
+
+
+def fetch_all_pages(fetch_page: PageFetcher, limit: int = MAX_PAGE_LIMIT,
+                    on_page: PageCallback | None = None, concurrency: int = 4) -> list:
+    """
+    Returns items of all pages in page order
+    """
+    first = fetch_page(1, limit)
+    if on_page is not None:
+        on_page(first.data)
+
+    results = fetch_pages(
+        fetch_page, range(2, get_page_count(first.meta.total, limit) + 1), limit, on_page, concurrency
+    )
+
+    items = list(first.data)
+    for page in sorted(results):
+        items.extend(results[page])
+    return items
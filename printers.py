@@ -7,6 +7,9 @@ from rich.panel import Panel
 from rich.table import Table
 
 from console import console
+from game_state import StateChange, CargoChange, CreditsChange, StatusChange, FuelChange
+from request_budget import OriginUsage
+from retry_policy import DeadLetter
 from space_traders_api_client.models import Survey
 from space_traders_api_client.models.agent import Agent
 from space_traders_api_client.models.contract import Contract
@@ -15,6 +18,7 @@ from space_traders_api_client.models.ship import Ship
 from space_traders_api_client.models.ship_nav import ShipNavStatus
 from space_traders_api_client.models.shipyard import Shipyard
 from space_traders_api_client.models.waypoint import Waypoint, Unset
+from system_graph import SystemHop
 
 SUCCESS_PREFIX = f"[white on green]SUCCESS[/] ┃ "  # noqa
 FAIL_PREFIX = f"[black on red] FAIL  [/] ┃ "  # noqa
@@ -267,3 +271,102 @@ def print_shipyard(shipyard: Shipyard):
 
 def print_surveys(surveys: list[Survey]):
     pass
+
+
+def print_dead_letters(dead_letters: Iterable[DeadLetter]):
+    table = Table(title="Dead Letters", header_style="custom_table_header", show_lines=True)
+    table.add_column("Date")
+    table.add_column("Event")
+    table.add_column("Kind")
+    table.add_column("Attempts", style="cyan")
+    table.add_column("Error", style="red")
+
+    for dead_letter in dead_letters:
+        table.add_row(
+            dead_letter.when.strftime(TIME_FORMAT),
+            str(dead_letter.event),
+            str(dead_letter.kind.value),
+            str(dead_letter.attempts),
+            dead_letter.error
+        )
+
+    console.print(table)
+
+
+def print_budget(usage: Iterable[OriginUsage], ship_totals: dict[str, int], window: float):
+    table = Table(title=f"Request Budget (last {window:.0f}s)", header_style="custom_table_header")
+    table.add_column("Origin")
+    table.add_column("Share", justify="right")
+    table.add_column("Recent", justify="right", style="cyan")
+    table.add_column("Utilization", justify="right")
+    table.add_column("Waiting", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Throttled", justify="right", style="red")
+
+    for entry in usage:
+        over_share = entry.share is not None and entry.utilization > entry.share
+        table.add_row(
+            entry.origin,
+            f"{entry.share:.0%}" if entry.share is not None else "-",
+            str(entry.recent),
+            f"[{'red' if over_share else 'green'}]{entry.utilization:.0%}[/]",
+            str(entry.waiting),
+            str(entry.total),
+            str(entry.throttled),
+        )
+
+    ships_table = Table(title="Requests by Ship", header_style="custom_table_header")
+    ships_table.add_column("Ship", style="ship")
+    ships_table.add_column("Total", justify="right")
+
+    for ship_symbol, total in sorted(ship_totals.items(), key=lambda entry: entry[1], reverse=True):
+        ships_table.add_row(ship_symbol, str(total))
+
+    console.print(Columns([table, ships_table]))
+
+
+def print_system_path(source: str, destination: str, hops: list[SystemHop]):
+    total = timedelta(seconds=round(sum(hop.seconds for hop in hops)))
+    table = Table(title=f"{source} => {destination} ({total})", header_style="custom_table_header")
+    table.add_column("From", style="system")
+    table.add_column("To", style="system")
+    table.add_column("Kind")
+    table.add_column("Distance", justify="right")
+    table.add_column("Time", justify="right", style="cyan")
+
+    for hop in hops:
+        table.add_row(
+            hop.origin, hop.destination, hop.kind, f"{hop.distance:.0f}", str(timedelta(seconds=round(hop.seconds)))
+        )
+
+    console.print(table)
+
+
+def __format_change(change: StateChange) -> str:
+    if isinstance(change, CargoChange):
+        deltas = ", ".join(
+            f"{'+' if delta > 0 else ''}{delta} [resource]{symbol}[/]" for symbol, delta in change.deltas.items()
+        )
+        return f"cargo {deltas} ({change.units}/{change.capacity})"
+    if isinstance(change, CreditsChange):
+        return f"credits {'+' if change.delta > 0 else ''}{change.delta} (${change.credits})"
+    if isinstance(change, StatusChange):
+        return f"{change.previous} -> {change.status} at [waypoint]{change.waypoint_symbol}[/]"
+    if isinstance(change, FuelChange):
+        return f"fuel {change.previous} -> {change.current}"
+    return ", ".join(sorted(change.fields))
+
+
+def print_state_changes(changes: Iterable[StateChange]):
+    table = Table(title="Recent Changes", header_style="custom_table_header")
+    table.add_column("Ship", style="ship")
+    table.add_column("Version", justify="right", style="cyan")
+    table.add_column("Kind")
+    table.add_column("Change")
+
+    for change in changes:
+        table.add_row(
+            getattr(change, "ship_symbol", "-"), str(change.version), type(change).__name__, __format_change(change)
+        )
+
+    console.print(table)
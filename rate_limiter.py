@@ -0,0 +1,162 @@
+# token bucket limiter that mirrors SpaceTraders limits:
+# a static pool (refills continuously, N per second) and a burst pool (M requests, refilled once per window).
+# hooked into httpx client events, so only requests that actually hit the network are charged
+from asyncio import sleep as async_sleep
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic, sleep
+from typing import Mapping
+
+from dateutil.parser import isoparse
+from loguru import logger
+
+HEADER_LIMIT_PER_SECOND = "x-ratelimit-limit-per-second"
+HEADER_LIMIT_STATIC = "x-ratelimit-limit"
+HEADER_LIMIT_BURST = "x-ratelimit-limit-burst"
+HEADER_BURST_DURATION = "x-ratelimit-burst-duration"
+HEADER_REMAINING = "x-ratelimit-remaining"
+HEADER_RESET = "x-ratelimit-reset"
+HEADER_RETRY_AFTER = "retry-after"
+
+TOO_MANY_REQUESTS = 429
+
+
+def _parse_float(headers: Mapping[str, str], name: str) -> float | None:
+    value = headers.get(name, None)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    def __init__(self, per_second: float = 2.0, burst: int = 10, burst_duration: float = 10.0):
+        self.__lock = Lock()
+
+        self.per_second = per_second
+        self.burst = burst
+        self.burst_duration = burst_duration
+
+        self.__static_tokens = per_second
+        self.__static_updated = monotonic()
+
+        self.__burst_tokens = float(burst)
+        # burst window starts with the first request drawn from it
+        self.__burst_reset_at: float | None = None
+
+        # set by retry-after, nothing goes out until then
+        self.__blocked_until = 0.0
+
+    def __refill(self, now: float):
+        elapsed = now - self.__static_updated
+        self.__static_tokens = min(self.per_second, self.__static_tokens + elapsed * self.per_second)
+        self.__static_updated = now
+
+        if self.__burst_reset_at is not None and now >= self.__burst_reset_at:
+            self.__burst_tokens = float(self.burst)
+            self.__burst_reset_at = None
+
+    def __try_acquire(self) -> float:
+        """
+        Takes a token if one is available. Returns 0 on success, otherwise amount of seconds to wait before retrying
+        """
+        now = monotonic()
+        self.__refill(now)
+
+        if now < self.__blocked_until:
+            return self.__blocked_until - now
+
+        if self.__static_tokens >= 1:
+            self.__static_tokens -= 1
+            return 0
+
+        if self.__burst_tokens >= 1:
+            if self.__burst_reset_at is None:
+                self.__burst_reset_at = now + self.burst_duration
+            self.__burst_tokens -= 1
+            return 0
+
+        wait_static = (1 - self.__static_tokens) / self.per_second
+        if self.__burst_reset_at is not None:
+            return min(wait_static, self.__burst_reset_at - now)
+        return wait_static
+
+    def __try_acquire_locked(self) -> float:
+        with self.__lock:
+            return self.__try_acquire()
+
+    def acquire(self):
+        while wait := self.__try_acquire_locked():
+            logger.debug(f"[rate limiter] waiting {wait:.3f}s for a request token")
+            sleep(wait)
+
+    async def acquire_async(self):
+        # same as acquire, but yields to the event loop instead of blocking the thread
+        while wait := self.__try_acquire_locked():
+            logger.debug(f"[rate limiter] waiting {wait:.3f}s for a request token")
+            await async_sleep(wait)
+
+    def update(self, headers: Mapping[str, str], status_code: int | None = None):
+        """
+        Syncs local buckets with the limits reported by the server
+        """
+        now = monotonic()
+
+        with self.__lock:
+            self.__refill(now)
+
+            per_second = _parse_float(headers, HEADER_LIMIT_PER_SECOND) or _parse_float(headers, HEADER_LIMIT_STATIC)
+            if per_second:
+                self.per_second = per_second
+
+            burst = _parse_float(headers, HEADER_LIMIT_BURST)
+            if burst:
+                self.burst = int(burst)
+
+            burst_duration = _parse_float(headers, HEADER_BURST_DURATION)
+            if burst_duration:
+                self.burst_duration = burst_duration
+
+            # server knows better - never assume more burst than it reports
+            remaining = _parse_float(headers, HEADER_REMAINING)
+            if remaining is not None:
+                self.__burst_tokens = min(self.__burst_tokens, remaining)
+
+            reset = headers.get(HEADER_RESET, None)
+            if reset is not None and remaining is not None and remaining < self.burst:
+                try:
+                    reset_in = (isoparse(reset) - datetime.now(tz=timezone.utc)).total_seconds()
+                    self.__burst_reset_at = now + min(max(reset_in, 0.0), self.burst_duration)
+                except ValueError:
+                    logger.debug(f"[rate limiter] malformed reset header: {reset}")
+
+            retry_after = _parse_float(headers, HEADER_RETRY_AFTER)
+            if retry_after is None and status_code == TOO_MANY_REQUESTS:
+                # no hint given, back off for a single static refill
+                retry_after = 1 / self.per_second
+
+            if retry_after is not None:
+                logger.debug(f"[rate limiter] server asked to retry after {retry_after}s")
+                self.__blocked_until = max(self.__blocked_until, now + retry_after)
+                self.__static_tokens = 0
+                self.__burst_tokens = 0
+                if self.__burst_reset_at is None:
+                    self.__burst_reset_at = now + self.burst_duration
+
+    # httpx event hooks
+
+    def on_request(self, request):
+        self.acquire()
+
+    def on_response(self, response):
+        self.update(response.headers, response.status_code)
+
+    # httpx.AsyncClient event hooks
+
+    async def on_request_async(self, request):
+        await self.acquire_async()
+
+    async def on_response_async(self, response):
+        self.update(response.headers, response.status_code)
@@ -0,0 +1,154 @@
+# ledger of where the request budget goes: every request is attributed to the origin (strategy) and ship
+# of the event that sends it. origins may be given shares of the budget, enforced when the queue hands out events:
+# events of an origin above its share are passed over while origins below theirs have events waiting,
+# so no budget is wasted and nothing sits on an executor worker while yielding
+from collections import Counter, deque
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+from typing import Mapping
+
+from event_queue import current_event
+
+# requests sent outside of any event (or by events without origin) - console commands, startup fetches
+MANUAL_ORIGIN = "manual"
+
+
+@dataclass(slots=True)
+class OriginUsage:
+    origin: str
+    share: float | None
+    # requests within the sliding window
+    recent: int
+    utilization: float
+    # events ready to run at the last dequeue
+    waiting: int
+    total: int
+    throttled: int
+
+
+def parse_shares(value: str) -> dict[str, float]:
+    """
+    Parses "trade=0.6,mining=0.3,scouting=0.1"
+    """
+    shares = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        origin, share = part.split("=")
+        shares[origin.strip()] = float(share)
+    return shares
+
+
+class RequestBudget:
+    def __init__(self, shares: dict[str, float] | None = None, window: float = 60.0):
+        self.__lock = Lock()
+
+        # origin to its fraction of requests; origins without one are never throttled
+        self.shares: dict[str, float] = dict(shares or {})
+        self.window = window
+
+        # (sent at, origin) within the window
+        self.__recent: deque[tuple[float, str]] = deque()
+        self.__recent_counts: Counter[str] = Counter()
+        # origin to its ready events, as seen by the last dequeue
+        self.__waiting: Counter[str] = Counter()
+
+        self.__totals: Counter[str] = Counter()
+        self.__ship_totals: Counter[str] = Counter()
+        self.__event_totals: Counter[str] = Counter()
+        self.__throttled: Counter[str] = Counter()
+
+    def set_share(self, origin: str, share: float | None):
+        with self.__lock:
+            if share is None:
+                self.shares.pop(origin, None)
+            else:
+                self.shares[origin] = share
+
+    def __expire(self, now: float):
+        while self.__recent and self.__recent[0][0] < now - self.window:
+            _, origin = self.__recent.popleft()
+            self.__recent_counts[origin] -= 1
+
+    def __is_over_share(self, origin: str) -> bool:
+        share = self.shares.get(origin, None)
+        total = len(self.__recent)
+        if share is None or total == 0:
+            return False
+        return self.__recent_counts[origin] / total > share
+
+    def get_deferred(self, waiting: Mapping[str | None, int]) -> set[str | None]:
+        """
+        Origins whose ready events have to wait: above their share while an origin within its share has
+        events ready. Called by the event queue with ready events per origin whenever it hands one out
+        """
+        with self.__lock:
+            self.__expire(monotonic())
+            self.__waiting = Counter({origin or MANUAL_ORIGIN: count for origin, count in waiting.items()})
+
+            over_share = {origin for origin in waiting if self.__is_over_share(origin or MANUAL_ORIGIN)}
+            if len(over_share) == len(waiting):
+                # nobody to yield to
+                return set()
+
+            for origin in over_share:
+                self.__throttled[origin or MANUAL_ORIGIN] += 1
+            return over_share
+
+    def charge(self):
+        """
+        Records a request sent by the current event
+        """
+        event = current_event.get()
+        if event is None:
+            origin, ship_symbol, event_name = MANUAL_ORIGIN, None, None
+        else:
+            origin = event.origin or MANUAL_ORIGIN
+            ship_symbol, event_name = event.ship_symbol, f"{event.event_type}.{event.event_name}"
+
+        with self.__lock:
+            self.__recent.append((monotonic(), origin))
+            self.__recent_counts[origin] += 1
+
+            self.__totals[origin] += 1
+            if ship_symbol is not None:
+                self.__ship_totals[ship_symbol] += 1
+            if event_name is not None:
+                self.__event_totals[event_name] += 1
+
+    def get_usage(self) -> list[OriginUsage]:
+        now = monotonic()
+        with self.__lock:
+            self.__expire(now)
+            total = len(self.__recent)
+            origins = set(self.__totals) | set(self.shares)
+
+            return [
+                OriginUsage(
+                    origin=origin,
+                    share=self.shares.get(origin, None),
+                    recent=self.__recent_counts[origin],
+                    utilization=self.__recent_counts[origin] / total if total else 0.0,
+                    waiting=self.__waiting[origin],
+                    total=self.__totals[origin],
+                    throttled=self.__throttled[origin],
+                )
+                for origin in sorted(origins)
+            ]
+
+    def get_ship_totals(self) -> dict[str, int]:
+        with self.__lock:
+            return dict(self.__ship_totals)
+
+    def get_event_totals(self) -> dict[str, int]:
+        with self.__lock:
+            return dict(self.__event_totals)
+
+    # httpx event hooks
+
+    def on_request(self, request):
+        self.charge()
+
+    async def on_request_async(self, request):
+        self.charge()
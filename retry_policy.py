@@ -0,0 +1,115 @@
+# classifies failed events and puts retryable ones back into the queue,
+# so a single 429 or 502 doesn't kill a strategy chain for good
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from json import loads
+from random import uniform
+from threading import Lock
+
+import httpx
+from loguru import logger
+
+from event_queue import EventQueue, QueueEvent
+from handle_result import HandleResult
+from space_traders_api_client.errors import UnexpectedStatus
+
+TOO_MANY_REQUESTS = 429
+TRANSIENT_STATUSES = {500, 502, 503, 504}
+
+
+class FailureKind(str, Enum):
+    # server limit hit - retry when server allows us to
+    RATE_LIMITED = "rate_limited"
+    # network hiccup or server-side error - retry with backoff
+    TRANSIENT = "transient"
+    # invalid request or state, retrying won't help
+    PERMANENT = "permanent"
+
+
+@dataclass(slots=True)
+class DeadLetter:
+    event: QueueEvent
+    kind: FailureKind
+    attempts: int
+    error: str
+    when: datetime
+
+
+def _get_retry_after(content: bytes) -> float | None:
+    # 429 body: {"error": {"code": 429, "data": {"retryAfter": 1.2, ...}}}
+    try:
+        return float(loads(content)["error"]["data"]["retryAfter"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def classify_failure(error: Exception) -> tuple[FailureKind, float | None]:
+    """
+    Returns failure kind and server-provided retry delay (in seconds), if any
+    """
+    if isinstance(error, UnexpectedStatus):
+        if error.status_code == TOO_MANY_REQUESTS:
+            return FailureKind.RATE_LIMITED, _get_retry_after(error.content)
+        if error.status_code in TRANSIENT_STATUSES:
+            return FailureKind.TRANSIENT, None
+        return FailureKind.PERMANENT, None
+
+    # includes timeouts
+    if isinstance(error, httpx.TransportError):
+        return FailureKind.TRANSIENT, None
+
+    return FailureKind.PERMANENT, None
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.__lock = Lock()
+        # event id to amount of failed attempts
+        self.__attempts: dict[int, int] = {}
+        self.dead_letters: list[DeadLetter] = []
+
+    def get_delay(self, attempt: int, retry_after: float | None) -> float:
+        if retry_after is not None:
+            return retry_after
+        # exponential backoff with jitter, so retries of a failed batch don't come back all at once
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * uniform(1.0, 1.25)
+
+    def handle_failure(self, queue: EventQueue, event: QueueEvent, error: Exception) -> HandleResult:
+        """
+        Reschedules event if failure is retryable.
+        Returns HandleResult.RETRY for rescheduled events, HandleResult.FAIL for dead ones
+        """
+        kind, retry_after = classify_failure(error)
+
+        with self.__lock:
+            attempt = self.__attempts.get(event.id, 0) + 1
+
+            if kind == FailureKind.PERMANENT or attempt > self.max_attempts:
+                self.__attempts.pop(event.id, None)
+                self.dead_letters.append(DeadLetter(
+                    event=event, kind=kind, attempts=attempt, error=str(error), when=datetime.now(tz=timezone.utc)
+                ))
+                return HandleResult.FAIL
+
+            self.__attempts[event.id] = attempt
+
+        delay = self.get_delay(attempt, retry_after)
+        logger.warning(f"{event} failed ({kind}), retry {attempt}/{self.max_attempts} in {delay:.2f}s: {error}")
+        # the event keeps holding its ship until the retry runs, so later events of the ship wait for it
+        queue.schedule(datetime.now(tz=timezone.utc) + timedelta(seconds=delay), event)
+
+        return HandleResult.RETRY
+
+    def forget(self, event: QueueEvent):
+        with self.__lock:
+            self.__attempts.pop(event.id, None)
+
+    def get_attempts(self, event: QueueEvent) -> int:
+        with self.__lock:
+            return self.__attempts.get(event.id, 0)
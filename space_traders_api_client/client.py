@@ -1,13 +1,20 @@
 import ssl
-from typing import Dict, Union
+from threading import Lock
+from typing import Any, Dict, Optional, Union
 
 import attr
+import httpx
 
 
 @attr.s(auto_attribs=True)
 class Client:
     """A class for keeping track of data related to the API
 
+    Every endpoint routes its requests through a single long-lived `httpx.Client` owned by this object,
+    so connections (and TLS sessions) are kept alive and reused between calls.
+    Call `close()` or use the client as a context manager to release the pool.
+    `asyncio` endpoints do the same with a shared `httpx.AsyncClient`, released with `aclose()` or `async with`.
+
     Attributes:
         base_url: The base URL for the API, all requests are made to a relative path to this URL
         cookies: A dictionary of cookies to be sent with every request
@@ -19,6 +26,12 @@ class Client:
         raise_on_unexpected_status: Whether or not to raise an errors.UnexpectedStatus if the API returns a
             status code that was not documented in the source OpenAPI document.
         follow_redirects: Whether or not to follow redirects. Default value is False.
+        http2: Whether or not to negotiate HTTP/2 for the pooled connection. Requires the optional `h2` package.
+        max_connections: The maximum amount of concurrent connections kept by the pool.
+        keepalive_expiry: Time in seconds an idle keep-alive connection is held open before being closed.
+        httpx_args: Additional keyword arguments passed to the `httpx.Client` constructor (event hooks, proxies...).
+        async_httpx_args: Additional keyword arguments passed to the `httpx.AsyncClient` constructor.
+            Event hooks passed here have to be coroutine functions.
     """
 
     base_url: str
@@ -28,6 +41,15 @@ class Client:
     verify_ssl: Union[str, bool, ssl.SSLContext] = attr.ib(True, kw_only=True)
     raise_on_unexpected_status: bool = attr.ib(False, kw_only=True)
     follow_redirects: bool = attr.ib(False, kw_only=True)
+    http2: bool = attr.ib(False, kw_only=True)
+    max_connections: int = attr.ib(10, kw_only=True)
+    keepalive_expiry: float = attr.ib(60.0, kw_only=True)
+    httpx_args: Dict[str, Any] = attr.ib(factory=dict, kw_only=True)
+    async_httpx_args: Dict[str, Any] = attr.ib(factory=dict, kw_only=True)
+
+    _client: Optional[httpx.Client] = attr.ib(None, init=False, repr=False, eq=False)
+    _async_client: Optional[httpx.AsyncClient] = attr.ib(None, init=False, repr=False, eq=False)
+    _client_lock: Lock = attr.ib(factory=Lock, init=False, repr=False, eq=False)
 
     def get_headers(self) -> Dict[str, str]:
         """Get headers to be used in all endpoints"""
@@ -51,6 +73,87 @@ class Client:
         """Get a new client matching this one with a new timeout (in seconds)"""
         return attr.evolve(self, timeout=timeout)
 
+    def set_httpx_client(self, client: httpx.Client) -> "Client":
+        """Manually set the underlying httpx.Client
+
+        **NOTE**: headers, cookies and timeout are still sent per request, but pool settings of this object are ignored.
+        """
+        with self._client_lock:
+            self._client = client
+        return self
+
+    def _get_limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def get_httpx_client(self) -> httpx.Client:
+        """Get the underlying httpx.Client, constructing a new one if not previously set"""
+        # endpoints may be called from several threads at once, only one of them should build the pool
+        with self._client_lock:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.Client(
+                    verify=self.verify_ssl,
+                    http2=self.http2,
+                    limits=self._get_limits(),
+                    **self.httpx_args,
+                )
+            return self._client
+
+    def set_async_httpx_client(self, async_client: httpx.AsyncClient) -> "Client":
+        """Manually set the underlying httpx.AsyncClient
+
+        **NOTE**: headers, cookies and timeout are still sent per request, but pool settings of this object are ignored.
+        """
+        with self._client_lock:
+            self._async_client = async_client
+        return self
+
+    def get_async_httpx_client(self) -> httpx.AsyncClient:
+        """Get the underlying httpx.AsyncClient, constructing a new one if not previously set
+
+        The async client is bound to the event loop it was first used in.
+        """
+        with self._client_lock:
+            if self._async_client is None or self._async_client.is_closed:
+                self._async_client = httpx.AsyncClient(
+                    verify=self.verify_ssl,
+                    http2=self.http2,
+                    limits=self._get_limits(),
+                    **self.async_httpx_args,
+                )
+            return self._async_client
+
+    def close(self) -> None:
+        """Close the underlying httpx.Client and release all pooled connections"""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self) -> None:
+        """Close the underlying httpx.AsyncClient and release all pooled connections"""
+        with self._client_lock:
+            async_client, self._async_client = self._async_client, None
+        if async_client is not None:
+            await async_client.aclose()
+
+    def __enter__(self) -> "Client":
+        self.get_httpx_client()
+        return self
+
+    def __exit__(self, *args: Any, **kwargs: Any) -> None:
+        self.close()
+
+    async def __aenter__(self) -> "Client":
+        self.get_async_httpx_client()
+        return self
+
+    async def __aexit__(self, *args: Any, **kwargs: Any) -> None:
+        await self.aclose()
+
 
 @attr.s(auto_attribs=True)
 class AuthenticatedClient(Client):
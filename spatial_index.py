@@ -0,0 +1,41 @@
+# positions of a system's waypoints, indexed once when a system is loaded:
+# pairwise distances are a precomputed matrix, so distance lookups don't measure everything again
+from typing import Iterable
+
+import numpy as np
+
+from space_traders_api_client.models import Waypoint
+
+
+def pairwise_distances(coords: np.ndarray) -> np.ndarray:
+    """
+    Euclidean distance matrix of (n x 2) coordinates
+    """
+    deltas = coords[:, np.newaxis, :] - coords[np.newaxis, :, :]
+    return np.sqrt((deltas ** 2).sum(axis=-1))
+
+
+class SpatialIndex:
+    def __init__(self, waypoints: Iterable[Waypoint]):
+        waypoints = list(waypoints)
+        self.symbols = [wp.symbol for wp in waypoints]
+        self.index = {symbol: index for index, symbol in enumerate(self.symbols)}
+        self.coords = np.array([(wp.x, wp.y) for wp in waypoints], dtype=float).reshape(-1, 2)
+
+        self.distances = pairwise_distances(self.coords)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def distance(self, from_symbol: str, to_symbol: str) -> float:
+        return float(self.distances[self.index[from_symbol], self.index[to_symbol]])
+
+    def distance_matrix(self, symbols: list[str]) -> np.ndarray:
+        """
+        Distances between given waypoints, in their order
+        """
+        indexes = [self.index[symbol] for symbol in symbols]
+        return self.distances[np.ix_(indexes, indexes)]
@@ -4,19 +4,22 @@
 # when cargo is full, refuel, deliver, refuel, move back
 # repeat until the contract is complete
 from dataclasses import dataclass
+from functools import partial
 from datetime import timedelta, timezone, datetime
 from math import floor
 
 from loguru import logger
 from rich.pretty import pprint
 
-from event_queue import event_queue
-from event_queue.event_types import EventType
+from event_queue import event_queue, origin_scope
+from event_queue.event_types import EventType, EventLane
 from event_queue.queue_event import QueueEvent
 from global_params import GlobalParams, RESERVED_ITEMS
+from space_traders_api_client.models import (
+    CreateSurveyResponse201Data, ExtractResourcesResponse201Data, NavigateShipResponse200Data
+)
 from space_traders_api_client.models.ship import Ship
 from space_traders_api_client.models.ship_nav_status import ShipNavStatus
-from space_traders_api_client.types import UNSET, Unset
 from strategies.base_strategy import queue_create_survey, queue_dock, queue_refuel, queue_navigate
 
 
@@ -26,6 +29,10 @@ from strategies.base_strategy import queue_create_survey, queue_dock, queue_refu
 # TODO: restore delivery state on restart (check if ship has contract cargo, and how many, and proceed with delivery)
 
 
+# request budget origin - chains started here keep it through completion callbacks
+MINING_ORIGIN = "mining"
+
+
 @dataclass(slots=True)
 class ContractDelivery:
     waypoint: str
@@ -40,10 +47,6 @@ class BaseContractStrategy:
     def __init__(self, params: GlobalParams, contract_id: str, asteroid_id: str):
         self.__asteroid_field = asteroid_id  # "X1-DC54-89945X"
 
-        self.__pending_navigates: dict[int, str] = {}
-        self.__pending_extracts: dict[int, str] = {}
-        self.__pending_delivery_navigates: dict[int, ContractDelivery] = {}
-
         self.__params = params
 
         self.assigned_ship_symbols = {}
@@ -67,10 +70,6 @@ class BaseContractStrategy:
 
         pprint(self.required_resources)
 
-        event_queue.subscribe(EventType.SHIP, "extract", self.on_extract)
-        event_queue.subscribe(EventType.SHIP, "navigate", self.on_navigate)
-        event_queue.subscribe(EventType.SHIP, "survey", self.on_create_survey)
-
         self.start()
 
     def __validate_survey(self, signature: str) -> bool:
@@ -117,7 +116,7 @@ class BaseContractStrategy:
             # everything else is sold
             else:
                 event_queue.put(
-                    EventType.SHIP, "sell_cargo_item", (ship.symbol, item.symbol, item.units)
+                    EventType.SHIP, "sell_cargo_item", (ship.symbol, item.symbol, item.units), lane=EventLane.CRITICAL
                 )
 
         return contract_items
@@ -133,26 +132,25 @@ class BaseContractStrategy:
         return [ship_symbol, ]
 
     def __extract(self, ship_symbol: str, when: datetime | None = None):
+        # extracting right as the cooldown expires is what the contract income depends on
         event = event_queue.new_event(
-            EventType.SHIP, "extract", self.__get_extract_payload(ship_symbol)
+            EventType.SHIP, "extract", self.__get_extract_payload(ship_symbol), EventLane.CRITICAL
         )
         if when is not None:
-            event_queue.schedule(when, event)
+            event_queue.schedule(when, event, on_done=self.on_extract)
         else:
-            event_queue.put(event=event)
-        self.__pending_extracts[event.id] = ship_symbol
+            event_queue.put(event=event, on_done=self.on_extract)
 
     def __navigate(self, ship_symbol: str, waypoint: str, when: datetime | None = None):
         event = event_queue.new_event(
             EventType.SHIP, "navigate", [ship_symbol, waypoint]
         )
         if when is not None:
-            event_queue.schedule(when, event)
+            event_queue.schedule(when, event, replace=True, on_done=self.on_navigate)
         else:
-            event_queue.put(event=event)
-        self.__pending_navigates[event.id] = ship_symbol
+            event_queue.put(event=event, on_done=self.on_navigate)
 
-    def on_create_survey(self, event: QueueEvent):
+    def on_create_survey(self, event: QueueEvent, response: CreateSurveyResponse201Data):
         ship_symbol = self.assigned_surveyor
         if ship_symbol is None:
             return
@@ -161,7 +159,6 @@ class BaseContractStrategy:
 
         with self.__params.lock:
             expired = []
-            ship = self.__params.game_state.ships[ship_symbol]
 
             for signature, survey in self.__params.game_state.surveys.get(self.__asteroid_field, {}).items():
                 if survey.symbol != self.__asteroid_field:
@@ -180,7 +177,7 @@ class BaseContractStrategy:
                 del self.__params.game_state.surveys[self.__asteroid_field][expired_survey_signature]
 
             # surveying puts ship on cooldown
-            when = ship.additional_properties["cooldown"].expiration + timedelta(seconds=5)
+            when = response.cooldown.expiration + timedelta(seconds=5)
 
             # if a suitable survey is found, schedule mining;
             # otherwise schedule another try
@@ -188,15 +185,11 @@ class BaseContractStrategy:
                 queue_dock(ship_symbol, when)
                 self.__extract(ship_symbol, when)
             else:
-                queue_create_survey(ship_symbol, when)
+                queue_create_survey(ship_symbol, when, on_done=self.on_create_survey)
 
-    def on_extract(self, event: QueueEvent):
-        ship_symbol = self.__pending_extracts.get(event.id, UNSET)
+    def on_extract(self, event: QueueEvent, response: ExtractResourcesResponse201Data):
+        ship_symbol = event.args[0]
         logger.debug(f"Extract complete: {event} {ship_symbol}")
-        if isinstance(ship_symbol, Unset):
-            return logger.debug(f"Incoming extract ID was issued externally")
-        if ship_symbol is None:
-            return logger.debug(f"MISSING SHIP SYMBOL IN PENDING EXTRACT ID {event.id}")
 
         with self.__params.lock:
             ship = self.__params.game_state.ships[ship_symbol]
@@ -233,7 +226,7 @@ class BaseContractStrategy:
                 delivery_target.fulfill = True
                 logger.debug(f"Completed mining for contract {self.contract_id}")
 
-            when = ship.additional_properties["cooldown"].expiration + timedelta(seconds=5)
+            when = response.cooldown.expiration + timedelta(seconds=5)
 
             # not enough to deliver, loop mining (respecting cooldown)
             if delivery_target is None:
@@ -245,30 +238,29 @@ class BaseContractStrategy:
                             f"Previously-used survey {self.survey_signature} became invalid, "
                             f"creating new with {ship_symbol}"
                         )
-                        queue_create_survey(ship_symbol, when)
+                        queue_create_survey(ship_symbol, when, on_done=self.on_create_survey)
                         return
 
                 self.__extract(ship_symbol, when)
             # enough to deliver; orbit and move to the point
             else:
-                orbit_event = event_queue.new_event(EventType.SHIP, "orbit", (ship_symbol,)),
+                orbit_event = event_queue.new_event(EventType.SHIP, "orbit", (ship_symbol,))
 
-                # have to create navigate explicitly to record into a different pending list
+                # navigate is created explicitly to carry the delivery along to its callback
                 navigate_to_deliver_event = event_queue.new_event(
                     EventType.SHIP, "navigate", (ship_symbol, delivery_target.waypoint)
                 )
 
-                self.__pending_delivery_navigates[navigate_to_deliver_event.id] = delivery_target
-
-                event_queue.schedule(when, (
-                    orbit_event, navigate_to_deliver_event
-                ))
+                event_queue.schedule(when, orbit_event)
+                event_queue.schedule(
+                    when, navigate_to_deliver_event, on_done=partial(self.on_navigate_delivery, delivery_target)
+                )
 
-    def __handle_navigate_delivery(self, delivery: ContractDelivery, event: QueueEvent):
+    def on_navigate_delivery(self, delivery: ContractDelivery, event: QueueEvent,
+                             response: NavigateShipResponse200Data):
+        # navigate to contract delivery executed, schedule dock and delivery
         ship_symbol = delivery.ship
-        with self.__params.lock:
-            ship = self.__params.game_state.ships[ship_symbol]
-            arrival_time = ship.nav.route.arrival + timedelta(seconds=10)
+        arrival_time = response.nav.route.arrival + timedelta(seconds=10)
         # these are instant, so we can batch them together
         # THE ORDER IS PRESERVED
 
@@ -283,31 +275,17 @@ class BaseContractStrategy:
             events_payload.append((EventType.CONTRACT, "fulfill", (self.contract_id,)))
         events_payload.append((EventType.SHIP, "orbit", (ship_symbol,)))
 
-        events = event_queue.new_events_from(*events_payload)
+        events = event_queue.new_events_from(*events_payload, lane=EventLane.CRITICAL)
         event_queue.schedule(arrival_time, events)
 
-        queue_navigate(ship_symbol, self.__asteroid_field, when=arrival_time, record_to=self.__pending_navigates)
-
-        del self.__pending_delivery_navigates[event.id]
+        queue_navigate(ship_symbol, self.__asteroid_field, when=arrival_time, on_done=self.on_navigate)
 
-    def on_navigate(self, event: QueueEvent):
+    def on_navigate(self, event: QueueEvent, response: NavigateShipResponse200Data):
         logger.debug(f"Navigate complete: {event}")
         # once the navigate request is complete, we know when ship is going to arrive
         # schedule events to perform on arrival
-
-        # navigate to contract delivery executed, schedule dock and delivery
-        delivery = self.__pending_delivery_navigates.get(event.id, None)
-        if delivery is not None:
-            self.__handle_navigate_delivery(delivery, event)
-            return
-
-        ship_symbol = self.__pending_navigates.get(event.id, None)
-        if not ship_symbol:
-            return logger.debug(f"Incoming navigate ID was issued externally")
-
-        with self.__params.lock:
-            ship = self.__params.game_state.ships[ship_symbol]
-            complete_time = ship.nav.route.arrival + timedelta(seconds=10)
+        ship_symbol = event.args[0]
+        complete_time = response.nav.route.arrival + timedelta(seconds=10)
 
         expected_events = event_queue.new_events_from(
             (EventType.SHIP, "dock", (ship_symbol,)),
@@ -316,8 +294,6 @@ class BaseContractStrategy:
         event_queue.schedule(complete_time, expected_events)
         self.__extract(ship_symbol, when=complete_time)
 
-        del self.__pending_navigates[event.id]
-
     def update_ship(self, ship_symbol: str):
         logger.debug(f"raw update ship: {ship_symbol}")
         with self.__params.lock:
@@ -335,11 +311,11 @@ class BaseContractStrategy:
                 logger.debug(f"moving ship towards asteroid {ship_symbol}")
                 # handle fuel being not full
                 # handle dock / orbit states
-                queue_navigate(ship_symbol, self.__asteroid_field, record_to=self.__pending_navigates)
+                queue_navigate(ship_symbol, self.__asteroid_field, on_done=self.on_navigate)
             else:
                 if self.assigned_surveyor is not None and ship_symbol == self.assigned_surveyor and self.survey_signature is None:
                     logger.debug(f"creating survey: {ship_symbol}")
-                    queue_create_survey(ship_symbol)
+                    queue_create_survey(ship_symbol, on_done=self.on_create_survey)
                     return
 
                 logger.debug(f"initiating mining: {ship_symbol}")
@@ -352,6 +328,7 @@ class BaseContractStrategy:
 
                 self.__extract(ship_symbol)
 
+    @origin_scope(MINING_ORIGIN)
     def start(self):
         for ship_symbol in self.assigned_ship_symbols:
             self.update_ship(ship_symbol)
@@ -359,7 +336,10 @@ class BaseContractStrategy:
     def assign_surveyor(self, ship_symbol: str):
         self.assigned_surveyor = ship_symbol
 
+    @origin_scope(MINING_ORIGIN)
     def assign_ship(self, ship_symbol: str):
+        # whatever the ship was scheduled to do before is no longer relevant
+        event_queue.cancel_for_ship(ship_symbol)
         self.update_ship(ship_symbol)
 
     def assign_survey(self, survey_signature: str):
@@ -1,11 +1,15 @@
 # baseclass for any strategy, that describes some shortcut methods
-from datetime import datetime
-from json import load
-from math import dist
+from datetime import datetime, timedelta
+from functools import partial
 from typing import Collection
 
-from event_queue import event_queue
-from event_queue.queue_event import EventType, QueueEvent
+from pony.orm import db_session
+
+from database.store import get_system_waypoints
+from event_queue import event_queue, EventFuture
+from event_queue.event_types import EventLane
+from event_queue.queue_event import EventType, QueueEvent, EventCallback
+from navigation import NavigationPlan
 from space_traders_api_client.models import ShipNavFlightMode, Waypoint, WaypointTraitSymbol, ShipCargoItem
 
 RESERVED_ITEMS = {
@@ -13,114 +17,172 @@ RESERVED_ITEMS = {
 }
 
 
-def queue_create_survey(ship_symbol: str, when: datetime | None = None):
+def __when_handler(event: QueueEvent, when: datetime | None = None, replace: bool = False,
+                   on_done: EventCallback | None = None) -> EventFuture:
+    # returns future of the event that will run - scheduled duplicates are coalesced
     if when is not None:
-        events = event_queue.new_events_from(
-            (EventType.SHIP, "orbit", [ship_symbol]),
-            (EventType.SHIP, "survey", [ship_symbol])
-        )
-        event_queue.schedule(when, events)
-        return
+        return event_queue.schedule(when, event, replace=replace, on_done=on_done)
+    return event_queue.put(event=event, on_done=on_done)
 
-    # make sure we are in orbit (slightly suboptimal, wastes rps if we are already orbiting)
-    event_queue.put(EventType.SHIP, "orbit", [ship_symbol])
-    event_queue.put(EventType.SHIP, "survey", [ship_symbol, ])
 
+def queue_create_survey(ship_symbol: str, when: datetime | None = None, on_done: EventCallback | None = None,
+                        lane: EventLane = EventLane.NORMAL) -> EventFuture:
+    # make sure we are in orbit (orbit handler skips the request if we are already orbiting)
+    orbit_event, survey_event = event_queue.new_events_from(
+        (EventType.SHIP, "orbit", [ship_symbol]),
+        (EventType.SHIP, "survey", [ship_symbol]),
+        lane=lane,
+    )
+    __when_handler(orbit_event, when)
+    return __when_handler(survey_event, when, on_done=on_done)
 
-def __when_handler(event: QueueEvent, when: datetime | None = None):
-    if when is not None:
-        event_queue.schedule(when, event)
-    else:
-        event_queue.put(event=event)
 
+def queue_dock(ship_symbol: str, when: datetime | None = None, lane: EventLane = EventLane.NORMAL) -> EventFuture:
+    event = event_queue.new_event(
+        EventType.SHIP, "dock", [ship_symbol], lane
+    )
+    return __when_handler(event, when)
 
-def queue_dock(ship_symbol: str, when: datetime | None = None):
+
+def queue_orbit(ship_symbol: str, when: datetime | None = None, lane: EventLane = EventLane.NORMAL) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "dock", [ship_symbol]
+        EventType.SHIP, "orbit", [ship_symbol], lane
     )
-    __when_handler(event, when)
+    return __when_handler(event, when)
 
 
-def queue_orbit(ship_symbol: str, when: datetime | None = None):
+def queue_refuel(ship_symbol: str, when: datetime | None = None, lane: EventLane = EventLane.NORMAL) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "orbit", [ship_symbol]
+        EventType.SHIP, "refuel", [ship_symbol], lane
     )
-    __when_handler(event, when)
+    return __when_handler(event, when)
 
 
-def queue_refuel(ship_symbol: str, when: datetime | None = None):
+def queue_navigate(ship_symbol: str, waypoint: str, when: datetime | None = None, on_done: EventCallback | None = None,
+                   lane: EventLane = EventLane.NORMAL) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "refuel", [ship_symbol]
+        EventType.SHIP, "navigate", [ship_symbol, waypoint], lane
     )
-    __when_handler(event, when)
+    # ship can only go one way - newer navigate replaces a stale one
+    return __when_handler(event, when, replace=True, on_done=on_done)
 
 
-def queue_navigate(ship_symbol: str, waypoint: str, when: datetime | None = None,
-                   record_to: dict[int, str] | None = None):
+def queue_sell_cargo(ship_symbol: str, resource_symbol: str, units: int, when: datetime | None = None,
+                     lane: EventLane = EventLane.CRITICAL) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "navigate", [ship_symbol, waypoint]
+        EventType.SHIP, "sell_cargo_item", [ship_symbol, resource_symbol, units], lane
     )
-    __when_handler(event, when)
-    if record_to is not None:
-        record_to[event.id] = ship_symbol
+    return __when_handler(event, when)
 
 
-def queue_sell_cargo(ship_symbol: str, resource_symbol: str, units: int, when: datetime | None = None):
+def queue_buy_cargo(ship_symbol: str, resource_symbol: str, units: int, when: datetime | None = None,
+                    lane: EventLane = EventLane.NORMAL) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "sell_cargo_item", [ship_symbol, resource_symbol, units]
+        EventType.SHIP, "buy_cargo_item", [ship_symbol, resource_symbol, units], lane
     )
-    __when_handler(event, when)
+    return __when_handler(event, when)
 
 
-def queue_buy_cargo(ship_symbol: str, resource_symbol: str, units: int, when: datetime | None = None):
+def queue_flight_mode(ship_symbol: str, flight_mode: ShipNavFlightMode, when: datetime | None = None,
+                      lane: EventLane = EventLane.NORMAL) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "buy_cargo_item", [ship_symbol, resource_symbol, units]
+        EventType.SHIP, "flight_mode", [ship_symbol, flight_mode], lane
     )
-    __when_handler(event, when)
+    return __when_handler(event, when, replace=True)
 
 
-def queue_flight_mode(ship_symbol: str, flight_mode: ShipNavFlightMode, when: datetime | None = None):
+def queue_fetch_system(system_symbol: str, when: datetime | None = None, on_done: EventCallback | None = None,
+                       lane: EventLane = EventLane.BACKGROUND) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "flight_mode", [ship_symbol, flight_mode]
+        EventType.SYSTEM, "system", [system_symbol], lane
     )
-    __when_handler(event, when)
+    return __when_handler(event, when, on_done=on_done)
 
 
-def queue_fetch_system_waypoints(ship_symbol: str, system_symbol: str, when: datetime | None = None,
-                                 record_to: dict[int, str] | None = None):
+def queue_fetch_system_waypoints(system_symbol: str, when: datetime | None = None, on_done: EventCallback | None = None,
+                                 lane: EventLane = EventLane.BACKGROUND) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SYSTEM, "system_waypoints", [system_symbol]
+        EventType.SYSTEM, "system_waypoints", [system_symbol], lane
     )
-    __when_handler(event, when)
-    if record_to is not None:
-        record_to[event.id] = ship_symbol
+    return __when_handler(event, when, on_done=on_done)
 
 
-def queue_fetch_market(waypoint_symbol: str, when: datetime | None = None,
-                       record_to: dict[int, str] | None = None):
+def queue_fetch_market(waypoint_symbol: str, when: datetime | None = None, on_done: EventCallback | None = None,
+                       lane: EventLane = EventLane.BACKGROUND) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SYSTEM, "fetch_market", [waypoint_symbol]
+        EventType.SYSTEM, "fetch_market", [waypoint_symbol], lane
     )
-    __when_handler(event, when)
-    if record_to is not None:
-        record_to[event.id] = waypoint_symbol
+    return __when_handler(event, when, on_done=on_done)
 
 
-def queue_jettison_cargo(ship_symbol: str, resource_symbol: str, units: int, when: datetime | None = None):
+def queue_fetch_shipyard(waypoint_symbol: str, when: datetime | None = None, on_done: EventCallback | None = None,
+                         lane: EventLane = EventLane.BACKGROUND) -> EventFuture:
     event = event_queue.new_event(
-        EventType.SHIP, "jettison_cargo_item", [ship_symbol, resource_symbol, units]
+        EventType.SYSTEM, "shipyard", [waypoint_symbol], lane
     )
-    __when_handler(event, when)
+    return __when_handler(event, when, on_done=on_done)
 
 
-def load_system_waypoints(system_name: str) -> list[Waypoint] | None:
-    # TODO: this should be handled by the database!!
-    try:
-        with open(f"fetched_json_data/waypoints/{system_name}.json", "r") as src:
-            return [Waypoint.from_dict(wp) for wp in load(src)]
-    except FileNotFoundError:
+def queue_fetch_jump_gate(waypoint_symbol: str, when: datetime | None = None, on_done: EventCallback | None = None,
+                          lane: EventLane = EventLane.BACKGROUND) -> EventFuture:
+    event = event_queue.new_event(
+        EventType.SYSTEM, "jump_gate", [waypoint_symbol], lane
+    )
+    return __when_handler(event, when, on_done=on_done)
+
+
+def queue_jump(ship_symbol: str, system_symbol: str, when: datetime | None = None,
+               on_done: EventCallback | None = None, lane: EventLane = EventLane.NORMAL) -> EventFuture:
+    event = event_queue.new_event(
+        EventType.SHIP, "jump", [ship_symbol, system_symbol], lane
+    )
+    return __when_handler(event, when, on_done=on_done)
+
+
+def queue_jettison_cargo(ship_symbol: str, resource_symbol: str, units: int, when: datetime | None = None,
+                         lane: EventLane = EventLane.NORMAL) -> EventFuture:
+    event = event_queue.new_event(
+        EventType.SHIP, "jettison_cargo_item", [ship_symbol, resource_symbol, units], lane
+    )
+    return __when_handler(event, when)
+
+
+def queue_navigation_plan(ship_symbol: str, plan: NavigationPlan, flight_mode: ShipNavFlightMode,
+                          when: datetime | None = None, on_done: EventCallback | None = None,
+                          lane: EventLane = EventLane.NORMAL) -> EventFuture | None:
+    """
+    Queues the first leg of the plan, the following ones are queued on arrival after a refuel stop.
+    Refueling at origin is up to the caller (usually docked there anyway). on_done is called for the last leg
+    """
+    if not plan.legs:
         return None
 
+    leg = plan.legs[0]
+    # flight mode handler skips the request when it is set already
+    if leg.mode != flight_mode:
+        queue_flight_mode(ship_symbol, leg.mode, when=when, lane=lane)
+
+    if len(plan.legs) > 1:
+        rest = NavigationPlan(plan.legs[1:], plan.seconds - leg.seconds, plan.fuel_left)
+        leg_done = partial(__on_navigation_leg, ship_symbol, rest, leg.mode, on_done, lane)
+    else:
+        leg_done = on_done
+    return queue_navigate(ship_symbol, leg.destination, when=when, on_done=leg_done, lane=lane)
+
+
+def __on_navigation_leg(ship_symbol: str, plan: NavigationPlan, flight_mode: ShipNavFlightMode,
+                        on_done: EventCallback | None, lane: EventLane, event: QueueEvent, response):
+    arrival = response.nav.route.arrival + timedelta(seconds=10)
+    queue_dock(ship_symbol, when=arrival, lane=lane)
+    queue_refuel(ship_symbol, when=arrival, lane=lane)
+    queue_orbit(ship_symbol, when=arrival, lane=lane)
+    queue_navigation_plan(ship_symbol, plan, flight_mode, when=arrival, on_done=on_done, lane=lane)
+
+
+def load_system_waypoints(system_name: str) -> list[Waypoint] | None:
+    with db_session:
+        return get_system_waypoints(system_name) or None
+
 
 def filter_waypoints_by_traits(waypoints: Collection[Waypoint], traits: list[WaypointTraitSymbol]) -> list[Waypoint]:
     required_count = len(traits)
@@ -130,18 +192,5 @@ def filter_waypoints_by_traits(waypoints: Collection[Waypoint], traits: list[Way
     ]
 
 
-def get_nearest_waypoint_from(coords: tuple[int, int], waypoints: Collection[Waypoint]) -> Waypoint | None:
-    # build a list of Waypoint - distance to it, sort in asc, return first
-    if len(waypoints) == 0:
-        return
-
-    distances = [
-        (wp, dist(coords, (wp.x, wp.y)))
-        for wp in waypoints
-    ]
-    distances.sort(key=lambda entry: entry[1])
-    return distances[0][0]
-
-
 def get_resource_count(inventory: list[ShipCargoItem], resource_name: str):
     return next((item.units for item in inventory if item.symbol == resource_name), 0)
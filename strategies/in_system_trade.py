@@ -1,24 +1,54 @@
 # buy X in one waypoint, move to another, sell, return, repeat
 # all done within a single system
-from collections import defaultdict
+from collections import deque
 from dataclasses import dataclass
 from datetime import timedelta, datetime, timezone
+from functools import partial
 from math import dist
+from typing import Mapping
 
 from loguru import logger
 from rich.pretty import pprint
 
 from console import console
-from event_queue import event_queue, QueueEvent, EventType
+from event_queue import event_queue, QueueEvent, EventLane, EventCallback, origin_scope
 from global_params import GlobalParams, RESERVED_ITEMS
 from handle_result import HandleResult
+from market_history import HOUR
+from navigation import NavigationPlanner, NavigationPlan, get_fuel_cost
 from printers import INFO_PREFIX
-from space_traders_api_client.models import Waypoint, ShipNavFlightMode, WaypointTraitSymbol, Ship
+from space_traders_api_client.models import (
+    Waypoint, ShipNavFlightMode, WaypointTraitSymbol, Ship, Market, MarketTradeGood, NavigateShipResponse200Data
+)
+from space_traders_api_client.types import Unset
+from spatial_index import SpatialIndex
 from strategies.base_strategy import (
     queue_dock, queue_refuel, queue_sell_cargo, queue_buy_cargo, queue_navigate, queue_orbit,
     queue_flight_mode, load_system_waypoints, filter_waypoints_by_traits,
-    get_nearest_waypoint_from, queue_fetch_market, queue_jettison_cargo
+    queue_fetch_market, queue_jettison_cargo, queue_navigation_plan
 )
+from tour_planner import plan_tour, split_tour
+from trade_routes import MarketMatrix, HaulerProfile, RouteCandidate, find_top_routes, assign_routes
+
+
+# request budget origins - chains started here keep them through completion callbacks
+TRADE_ORIGIN = "trade"
+SCOUTING_ORIGIN = "scouting"
+
+# market observations considered for price dynamics
+PRICE_HISTORY_WINDOW = 12 * HOUR
+# fewer observations say nothing about the trend
+MIN_PRICE_SAMPLES = 3
+# prices are projected this far ahead - roughly the time until a ship trades there
+PRICE_PROJECTION_HOURS = 0.5
+# routes kept from every search
+TOP_TRADE_ROUTES = 10
+# markets with prices deviating this much (relative) are scanned every round
+VOLATILE_PRICE = 0.05
+# other markets are scanned every n-th round
+LOW_PRIORITY_SCAN_ROUNDS = 3
+SCAN_ROUND_PAUSE = timedelta(minutes=10)
+FUEL_SYMBOL = "FUEL"
 
 
 @dataclass(slots=True)
@@ -31,96 +61,86 @@ class TradeRoute:
         return f"TradeRoute[<{self.resource_symbol}> {self.source_waypoint} => {self.target_waypoint}]"
 
 
-# TODO: fuel estimation to avoid over-spending on it and save RPS
-#  (only refuel when we need to - when distance is greater than current fuel) - saves a lot of RPS
-#  for cross-system trades we'll have to refuel every time we bought (or make proper cost calculator for full path)
-
-
 class SystemTradeStrategy:
     def __init__(self, params: GlobalParams):
         # market updater part
-        self.__market_updater = None
+        self.__market_updaters: list[str] = []
         self.target_system = None
         self.target_waypoints: dict[str, Waypoint] = {}
+        self.spatial_index: SpatialIndex | None = None
+        # rebuilt with routes, as fuel stations are known from fetched markets
+        self.__navigation_planner: NavigationPlanner | None = None
         self.waypoints_with_marketplace: list[Waypoint] = []
-        self.visited_marketplaces: dict[str, bool] = {}
-        self.__pending_navigate_market: dict[int, str] = {}
-        self.__pending_fetch_market: dict[int, str] = {}
+        # markets each updater has yet to scan this round, in tour order
+        self.__scan_tours: dict[str, deque[str]] = {}
+        # updaters done with their part of the round, waiting for the rest
+        self.__idle_updaters: set[str] = set()
+        self.__scan_round = 0
+        # market to the round it was last scanned in
+        self.__last_scanned: dict[str, int] = {}
 
         # trading part
         self.trade_routes: dict[str, TradeRoute] = {}
-        self.__pending_navigate_target = {}
-        self.__pending_navigate_source = {}
         self.__pending_route_change: dict[str, TradeRoute] = {}
         self.__params = params
         self.__halt_trade = False
 
         self.assigned_ships = {}
 
-        event_queue.subscribe(EventType.SHIP, "navigate", self.on_navigate)
-        event_queue.subscribe(EventType.SYSTEM, "fetch_market", self.on_fetch_market)
+    # completion callbacks, attached to the events this strategy queues
 
-    def on_navigate(self, event: QueueEvent):
-        ship_symbol_market_updater = self.__pending_navigate_market.get(event.id, None)
-        if ship_symbol_market_updater is not None:
-            del self.__pending_navigate_market[event.id]
-            with self.__params.lock:
-                return self.handle_navigate_market_update(ship_symbol_market_updater, event)
+    def on_navigate_market(self, event: QueueEvent, response: NavigateShipResponse200Data):
+        with self.__params.lock:
+            self.handle_navigate_market_update(event.args[0], event)
 
+    def on_navigate_target(self, event: QueueEvent, response: NavigateShipResponse200Data):
         # ship started navigation towards selling target - queue dock, refuel, sell, return to source
-        ship_symbol_target = self.__pending_navigate_target.get(event.id, None)
-        if ship_symbol_target is not None:
-            del self.__pending_navigate_target[event.id]
-            with self.__params.lock:
-                return self.handle_navigate_target(ship_symbol_target)
+        with self.__params.lock:
+            self.handle_navigate_target(event.args[0])
 
+    def on_navigate_source(self, event: QueueEvent, response: NavigateShipResponse200Data):
         # ship started navigation towards purchase source - queue dock, refuel, purchase, move to target
-        ship_symbol_source = self.__pending_navigate_source.get(event.id, None)
-        if ship_symbol_source is not None:
-            del self.__pending_navigate_source[event.id]
-            with self.__params.lock:
-                return self.handle_navigate_source(ship_symbol_source)
-
-    def on_fetch_market(self, event: QueueEvent):
-        waypoint_symbol = self.__pending_fetch_market.get(event.id, None)
-        if waypoint_symbol is None:
-            logger.debug(f"{event.id} Fetched external market")
-            return
-
         with self.__params.lock:
-            ship = self.__params.game_state.ships[self.__market_updater]
-            destination = ship.nav.route.destination
+            self.handle_navigate_source(event.args[0])
 
-            self.visited_marketplaces[waypoint_symbol] = True
+    def on_fetch_market(self, ship_symbol: str, event: QueueEvent, response: Market):
+        waypoint_symbol = event.args[0]
 
-            nearest_wp = get_nearest_waypoint_from(
-                (destination.x, destination.y),
-                self.get_unvisited_market_places()
-            )
-            next_run = None
-            # we have visited all marketplaces - rebuild trade routes and start a new fetch loop
-            if nearest_wp is None:
-                self.build_trade_routes()
-                self.reset_visited_marketplaces()
-                # reset and mark this marketplace as visited - we just scanned it
-                self.visited_marketplaces[waypoint_symbol] = True
-                nearest_wp = get_nearest_waypoint_from(
-                    (destination.x, destination.y),
-                    self.get_unvisited_market_places()
-                )
-                next_run = datetime.now(tz=timezone.utc) + timedelta(minutes=30)
+        with self.__params.lock:
+            self.__last_scanned[waypoint_symbol] = self.__scan_round
+            round_complete = self.__scan_next_market(ship_symbol)
+        if round_complete:
+            self.complete_scan_round()
 
-        queue_navigate(
-            self.__market_updater, nearest_wp.symbol, when=next_run, record_to=self.__pending_navigate_market
+    def __get_expected_prices(self, waypoint: str, resource: MarketTradeGood) -> tuple[float, float, float, float]:
+        """
+        Purchase and sell prices projected from their recent trend, and their expected deviations
+        """
+        stats = self.__params.market_history.get_stats(waypoint, resource.symbol, PRICE_HISTORY_WINDOW)
+        if stats is None or stats.samples < MIN_PRICE_SAMPLES:
+            return resource.purchase_price, resource.sell_price, 0.0, 0.0
+
+        purchase_price = max(0.0, resource.purchase_price + stats.purchase_trend * PRICE_PROJECTION_HOURS)
+        sell_price = max(0.0, resource.sell_price + stats.sell_trend * PRICE_PROJECTION_HOURS)
+        return (
+            purchase_price, sell_price,
+            purchase_price * stats.purchase_volatility, sell_price * stats.sell_volatility
         )
-        del self.__pending_fetch_market[event.id]
 
     def build_trade_routes(self):
-        resources = defaultdict(list)
+        """
+        Searches routes on a snapshot of the game state, only taking the lock to assign them.
+        Must not be called with the lock held
+        """
         # list all resources on export and exchange as purchasable;
         # list all resources on import as trade target
         # find correlations and output sorted by profit/cargo
-        logger.debug(f"building trade routes in {self.target_system}")
+        with self.__params.lock:
+            snapshot = self.__params.game_state.snapshot()
+            target_system, target_waypoints = self.target_system, self.target_waypoints
+            spatial_index = self.spatial_index
+            hauler_symbols = list(self.assigned_ships)
+        logger.debug(f"building trade routes in {target_system}")
 
         # basic assumptions for avg trade route efficiency
         assumed_cargo_size = 60
@@ -128,76 +148,77 @@ class SystemTradeStrategy:
         price_threshold = 20 * assumed_cargo_size
         avg_fuel_price = 240
 
-        for waypoint, market in self.__params.game_state.markets.items():
-            if "-".join(waypoint.split("-")[0:2]) != self.target_system:
-                logger.debug(f"saved market {waypoint} is outside target system {self.target_system}")
+        navigation_planner = NavigationPlanner(spatial_index, self.get_fuel_stations(snapshot.markets))
+
+        entries = []
+        for waypoint, market in snapshot.markets.items():
+            if "-".join(waypoint.split("-")[0:2]) != target_system or waypoint not in target_waypoints:
+                logger.debug(f"saved market {waypoint} is outside target system {target_system}")
                 continue
 
             for resource in market.trade_goods:
-                resources[resource.symbol].append((waypoint, resource.purchase_price, resource.sell_price))
+                entries.append(
+                    (waypoint, resource.symbol, *self.__get_expected_prices(waypoint, resource), resource.trade_volume)
+                )
 
         trade_routes = []
-
-        for resource_name, markets_data in resources.items():
-            logger.debug(f"searching for trade routes for {resource_name}")
-            by_purchase_price = sorted(markets_data, key=lambda entry: entry[1])
-            by_sell_price = sorted(markets_data, key=lambda entry: entry[2], reverse=True)
-
-            for purchase_entry, sell_entry in zip(by_purchase_price, by_sell_price):
-                # don't trade on the same waypoint
-                p_wp = purchase_entry[0]
-                s_wp = sell_entry[0]
-                if p_wp == s_wp:
-                    continue
-
-                raw_trade_margin = assumed_cargo_size * (sell_entry[2] - purchase_entry[1])
-
-                # distance to calculate fuel costs, assumed CRUISE
-                distance = self.get_waypoints_distance(p_wp, s_wp)
-
-                # assuming optimized refueling, two ways so * 2 / 100 = / 50
-                fuel_cost = (distance / 50.0) * avg_fuel_price
-                trip_margin = raw_trade_margin - fuel_cost
-                if trip_margin >= price_threshold:
-                    logger.debug(
-                        f"{resource_name}: significant trade margin {p_wp} <=> {s_wp} | {raw_trade_margin} {trip_margin}"
-                    )
-                    trade_routes.append((resource_name, p_wp, s_wp, raw_trade_margin, trip_margin))
+        if entries:
+            matrix = MarketMatrix.from_entries(entries)
+            distances = spatial_index.distance_matrix(matrix.waypoints)
+            # distance to calculate fuel costs, assumed CRUISE;
+            # assuming optimized refueling, two ways so * 2 / 100 = / 50
+            trade_routes = find_top_routes(
+                matrix, distances, assumed_cargo_size, avg_fuel_price / 50.0, price_threshold, TOP_TRADE_ROUTES
+            )
 
         if len(trade_routes) <= 0:
             logger.debug(f"No valid trade routes with expected minimal margin!")
-            self.__halt_trade = True
+            with self.__params.lock:
+                self.__navigation_planner = navigation_planner
+                self.__halt_trade = True
             return
 
-        self.__halt_trade = False
+        pprint(trade_routes)
 
-        trade_routes.sort(key=lambda entry: entry[4], reverse=True)
+        # spread the fleet over the best routes instead of flooding a single one
+        haulers = []
+        for ship_symbol in hauler_symbols:
+            ship = snapshot.ships[ship_symbol]
+            haulers.append(HaulerProfile(ship_symbol, ship.cargo.capacity, ship.engine.speed))
+        assignment = assign_routes(trade_routes, haulers, avg_fuel_price / 50.0)
 
-        pprint(trade_routes)
-        new_best_route_data = trade_routes[0]
-        new_best_route = TradeRoute(
-            resource_symbol=new_best_route_data[0],
-            source_waypoint=new_best_route_data[1],
-            target_waypoint=new_best_route_data[2],
-        )
-        logger.debug(f"Updated best trade route to {new_best_route}")
+        with self.__params.lock:
+            self.__navigation_planner = navigation_planner
+            self.__halt_trade = False
+            self.apply_route_assignment(assignment)
 
+    def apply_route_assignment(self, assignment: dict[str, RouteCandidate]):
         for ship_symbol in self.assigned_ships.keys():
+            route_data = assignment.get(ship_symbol, None)
+            if route_data is None:
+                logger.debug(f"{ship_symbol} would add no profit on any route - keeping it as it is")
+                continue
+
+            new_route = TradeRoute(
+                resource_symbol=route_data.resource_symbol,
+                source_waypoint=route_data.source_waypoint,
+                target_waypoint=route_data.target_waypoint,
+            )
             current_route = self.trade_routes.get(ship_symbol, None)
             # the ship was on standby, assign properly
             if current_route is None:
                 logger.debug(f"{ship_symbol} has no current trade route - assigning")
                 self.assign_ship(
                     ship_symbol,
-                    new_best_route.resource_symbol,
-                    new_best_route.source_waypoint,
-                    new_best_route.target_waypoint
+                    new_route.resource_symbol,
+                    new_route.source_waypoint,
+                    new_route.target_waypoint
                 )
-            elif current_route != new_best_route:
-                logger.debug(f"{ship_symbol} changing trade route to {new_best_route}")
-                self.__pending_route_change[ship_symbol] = new_best_route
+            elif current_route != new_route:
+                logger.debug(f"{ship_symbol} changing trade route to {new_route}")
+                self.__pending_route_change[ship_symbol] = new_route
             else:
-                logger.debug(f"{ship_symbol} is already on the best trade route")
+                logger.debug(f"{ship_symbol} is already on its assigned trade route")
 
     def __get_navigate_complete_time(self, ship_symbol: str) -> datetime | None:
         current_time = datetime.now(tz=timezone.utc)
@@ -207,22 +228,159 @@ class SystemTradeStrategy:
             return ship.nav.route.arrival + timedelta(seconds=10)
 
     def get_waypoints_distance(self, wp_from_name: str, wp_to_name: str):
-        return dist(
-            (self.target_waypoints[wp_from_name].x, self.target_waypoints[wp_from_name].y),
-            (self.target_waypoints[wp_to_name].x, self.target_waypoints[wp_to_name].y)
-        )
+        return self.spatial_index.distance(wp_from_name, wp_to_name)
 
-    def get_unvisited_market_places(self) -> list[Waypoint]:
-        return [
-            wp for wp in self.waypoints_with_marketplace
-            if self.visited_marketplaces.get(wp.symbol, False) is False
-        ]
+    def __get_scan_priority(self, waypoint_symbol: str) -> bool:
+        """
+        Markets that current routes depend on, or with volatile prices, are scanned every round
+        """
+        for route in self.trade_routes.values():
+            if waypoint_symbol in (route.source_waypoint, route.target_waypoint):
+                return True
+
+        market = self.__params.game_state.markets.get(waypoint_symbol, None)
+        if market is None:
+            return True
+        for resource in market.trade_goods:
+            stats = self.__params.market_history.get_stats(waypoint_symbol, resource.symbol, PRICE_HISTORY_WINDOW)
+            if stats is not None and max(stats.purchase_volatility, stats.sell_volatility) >= VOLATILE_PRICE:
+                return True
+        return False
+
+    def get_markets_due(self) -> list[str]:
+        due = []
+        for wp in self.waypoints_with_marketplace:
+            last_scanned = self.__last_scanned.get(wp.symbol, None)
+            interval = 1 if self.__get_scan_priority(wp.symbol) else LOW_PRIORITY_SCAN_ROUNDS
+            if last_scanned is None or self.__scan_round - last_scanned >= interval:
+                due.append(wp.symbol)
+        return due
+
+    def __get_updater_distance(self, ship_symbol: str, waypoint_symbol: str) -> float:
+        destination = self.__params.game_state.ships[ship_symbol].nav.route.destination
+        if destination.symbol in self.spatial_index:
+            return self.spatial_index.distance(destination.symbol, waypoint_symbol)
+        target = self.target_waypoints[waypoint_symbol]
+        return dist((destination.x, destination.y), (target.x, target.y))
+
+    def plan_scan_round(self):
+        """
+        Plans a tour over markets due this round and splits it between the updaters
+        """
+        self.__scan_tours = {ship_symbol: deque() for ship_symbol in self.__market_updaters}
+        if not self.waypoints_with_marketplace or not self.__market_updaters:
+            return
 
-    def reset_visited_marketplaces(self):
-        self.visited_marketplaces = {
-            wp.symbol: False for wp in self.waypoints_with_marketplace
+        # a round with nothing due is skipped
+        markets = self.get_markets_due()
+        while not markets:
+            self.__scan_round += 1
+            markets = self.get_markets_due()
+
+        distances = self.spatial_index.distance_matrix(markets)
+        parts = split_tour(plan_tour(distances), distances, len(self.__market_updaters))
+
+        # every updater takes the part with the nearest end, walking it from that end
+        for ship_symbol in self.__market_updaters:
+            if not parts:
+                break
+            best = min(
+                ((part, reverse) for part in parts for reverse in (False, True)),
+                key=lambda entry: self.__get_updater_distance(
+                    ship_symbol, markets[entry[0][-1] if entry[1] else entry[0][0]]
+                )
+            )
+            part, reverse = best
+            parts.remove(part)
+            self.__scan_tours[ship_symbol] = deque(markets[index] for index in (reversed(part) if reverse else part))
+
+        logger.debug(f"scan round {self.__scan_round}: {len(markets)} markets, tours {self.__scan_tours}")
+
+    def complete_scan_round(self):
+        """
+        Rebuilds trade routes from prices of the round and starts the next one after a pause
+        """
+        self.build_trade_routes()
+        with self.__params.lock:
+            self.__scan_round += 1
+            self.plan_scan_round()
+            next_run = datetime.now(tz=timezone.utc) + SCAN_ROUND_PAUSE
+            idle, self.__idle_updaters = self.__idle_updaters, set()
+            for idle_symbol in idle:
+                if self.__scan_tours.get(idle_symbol, None):
+                    self.__scan_next_market(idle_symbol, next_run)
+
+    def __scan_next_market(self, ship_symbol: str, when: datetime | None = None) -> bool:
+        """
+        Sends the updater to its next market. True when the whole round is complete
+        """
+        tour = self.__scan_tours.get(ship_symbol, None)
+        if not tour:
+            self.__idle_updaters.add(ship_symbol)
+            # others may still scan their part of the round
+            return not any(self.__scan_tours.values())
+
+        waypoint_symbol = tour.popleft()
+        ship = self.__params.game_state.ships[ship_symbol]
+        # if a ship is already at the market, fetch it and move on
+        if ship.nav.route.destination.symbol == waypoint_symbol and when is None:
+            logger.debug(f"{ship_symbol} is on {waypoint_symbol}")
+            self.handle_navigate_market_update(ship_symbol)
+        else:
+            queue_navigate(
+                ship_symbol, waypoint_symbol, when=when, on_done=self.on_navigate_market, lane=EventLane.BACKGROUND
+            )
+        return False
+
+    def get_fuel_stations(self, markets: Mapping[str, Market]) -> set[str]:
+        return {
+            waypoint for waypoint, market in markets.items()
+            if waypoint in self.spatial_index and not isinstance(market.trade_goods, Unset)
+            and any(good.symbol == FUEL_SYMBOL for good in market.trade_goods)
         }
 
+    def plan_navigation(self, ship_symbol: str, origin: str, destination: str,
+                        return_to: str | None = None) -> NavigationPlan | None:
+        """
+        Cheapest path with flight modes and refuel stops; arriving with enough fuel to cruise back to return_to
+        """
+        if self.__navigation_planner is None:
+            return None
+        if origin not in self.spatial_index or destination not in self.spatial_index:
+            return None
+
+        reserve = 0
+        if return_to is not None and return_to in self.spatial_index:
+            reserve = get_fuel_cost(self.spatial_index.distance(destination, return_to), ShipNavFlightMode.CRUISE)
+
+        ship = self.__params.game_state.ships[ship_symbol]
+        plan = self.__navigation_planner.plan(
+            origin, destination, ship.fuel.current, ship.fuel.capacity, ship.engine.speed, reserve
+        )
+        if plan is None:
+            logger.warning(f"{ship_symbol} can't reach {destination} from {origin} with {ship.fuel.current} fuel")
+        return plan
+
+    def queue_trade_leg(self, ship_symbol: str, trade_route: TradeRoute, origin: str, destination: str,
+                        when: datetime | None, on_done: EventCallback):
+        """
+        Refuels (while still docked at origin) only if the leg needs it, then orbits and navigates by plan
+        """
+        plan = self.plan_navigation(ship_symbol, origin, destination, return_to=origin)
+        if plan is None:
+            # no plan (fuel stations unknown yet) - fall back to the rough estimate and a direct flight
+            self.maybe_queue_refuel(ship_symbol, trade_route, when=when)
+            queue_orbit(ship_symbol, when=when)
+            queue_navigate(ship_symbol, destination, when=when, on_done=on_done)
+            return
+
+        if plan.refuel_at_origin:
+            logger.debug(f"{ship_symbol} needs fuel for {origin} => {destination} - queue refuel")
+            queue_refuel(ship_symbol, when=when)
+        queue_orbit(ship_symbol, when=when)
+        ship = self.__params.game_state.ships[ship_symbol]
+        queue_navigation_plan(ship_symbol, plan, ship.nav.flight_mode, when=when, on_done=on_done)
+
     def maybe_queue_refuel(self, ship_symbol: str, trade_route: TradeRoute, when: datetime | None = None):
         ship = self.__params.game_state.ships[ship_symbol]
         estimated_fuel_cost = self.get_waypoints_distance(
@@ -249,7 +407,7 @@ class SystemTradeStrategy:
                 f"{ship.nav.route.destination.symbol} | {new_trade_route.source_waypoint}"
             )
             queue_navigate(
-                ship_symbol, new_trade_route.source_waypoint, when=arrival, record_to=self.__pending_navigate_source
+                ship_symbol, new_trade_route.source_waypoint, when=arrival, on_done=self.on_navigate_source
             )
         else:
             self.handle_navigate_source(ship_symbol)
@@ -260,22 +418,25 @@ class SystemTradeStrategy:
         logger.debug(f"Handling navigate target {ship_symbol} | {arrival}")
         trade_route = self.trade_routes[ship_symbol]
         queue_dock(ship_symbol, when=arrival)
-        # queue_refuel(ship_symbol, when=arrival)
         queue_sell_cargo(ship_symbol, trade_route.resource_symbol, -1, when=arrival)
-        queue_orbit(ship_symbol, when=arrival)
 
         # check if ship should do new trade route, otherwise navigate to the next loop
         if new_trade_route := self.__pending_route_change.get(ship_symbol, None):
             queue_refuel(ship_symbol, when=arrival)
+            queue_orbit(ship_symbol, when=arrival)
             self.handle_route_switch(ship_symbol, new_trade_route, arrival)
             return
 
         if self.__halt_trade:
             logger.debug(f"Halt trade ordered, {ship_symbol} stops trade on {trade_route}")
             console.print(f"{INFO_PREFIX}[ship]{ship_symbol}[/] stopped trade on {trade_route}")
+            queue_orbit(ship_symbol, when=arrival)
             return
 
-        queue_navigate(ship_symbol, trade_route.source_waypoint, when=arrival, record_to=self.__pending_navigate_source)
+        self.queue_trade_leg(
+            ship_symbol, trade_route, trade_route.target_waypoint, trade_route.source_waypoint, arrival,
+            self.on_navigate_source
+        )
 
     def handle_navigate_source(self, ship_symbol: str):
         arrival = self.__get_navigate_complete_time(ship_symbol)
@@ -285,19 +446,19 @@ class SystemTradeStrategy:
 
         queue_dock(ship_symbol, when=arrival)
 
-        self.maybe_queue_refuel(ship_symbol, trade_route, when=arrival)
-
         self.discard_orphan_cargo(ship, trade_route.resource_symbol, when=arrival)
         queue_buy_cargo(ship_symbol, trade_route.resource_symbol, -1, when=arrival)
-        queue_orbit(ship_symbol, when=arrival)
-        queue_navigate(ship_symbol, trade_route.target_waypoint, when=arrival, record_to=self.__pending_navigate_target)
+        self.queue_trade_leg(
+            ship_symbol, trade_route, trade_route.source_waypoint, trade_route.target_waypoint, arrival,
+            self.on_navigate_target
+        )
 
     def handle_navigate_market_update(self, ship_symbol: str, event: QueueEvent | None = None):
         arrival = self.__get_navigate_complete_time(ship_symbol)
         logger.debug(f"{ship_symbol} fetch market scheduled for arrival")
         ship = self.__params.game_state.ships[ship_symbol]
         destination = ship.nav.route.destination
-        queue_fetch_market(destination.symbol, when=arrival, record_to=self.__pending_fetch_market)
+        queue_fetch_market(destination.symbol, when=arrival, on_done=partial(self.on_fetch_market, ship_symbol))
 
     @staticmethod
     def discard_orphan_cargo(ship: Ship, current_trade_symbol: str, when: datetime | None = None):
@@ -306,7 +467,11 @@ class SystemTradeStrategy:
                 logger.debug(f"{ship.symbol} has left-over cargo: {resource.symbol} {resource.units}")
                 queue_jettison_cargo(ship.symbol, resource.symbol, resource.units, when=when)
 
+    @origin_scope(TRADE_ORIGIN)
     def assign_ship(self, ship_symbol: str, resource_symbol: str, source_waypoint: str, target_waypoint: str):
+        # drop the stale chain of a previous route (or strategy) before building a new one
+        event_queue.cancel_for_ship(ship_symbol)
+
         new_trade_route = TradeRoute(
             resource_symbol=resource_symbol,
             source_waypoint=source_waypoint,
@@ -331,7 +496,7 @@ class SystemTradeStrategy:
         elif ship.nav.waypoint_symbol != source_waypoint:
             logger.debug(
                 f"{ship_symbol} is outside trade route source - {ship.nav.waypoint_symbol} | {source_waypoint}")
-            queue_navigate(ship_symbol, source_waypoint, record_to=self.__pending_navigate_source)
+            queue_navigate(ship_symbol, source_waypoint, on_done=self.on_navigate_source)
         else:
             logger.debug(f"{ship_symbol} is on source waypoint - initiating trade")
 
@@ -340,11 +505,12 @@ class SystemTradeStrategy:
             self.discard_orphan_cargo(ship, resource_symbol)
             queue_buy_cargo(ship_symbol, resource_symbol, -1)  # -1 mean fill entire cargo
             queue_orbit(ship_symbol)
-            queue_navigate(ship_symbol, target_waypoint, record_to=self.__pending_navigate_target)
+            queue_navigate(ship_symbol, target_waypoint, on_done=self.on_navigate_target)
 
+    @origin_scope(SCOUTING_ORIGIN)
     def assign_market_updater(self, ship_symbol: str, system: str):
-        self.__market_updater = ship_symbol
-        self.assign_system(system)
+        if system != self.target_system or self.spatial_index is None:
+            self.assign_system(system)
 
         # TODO: this will have to be removed once they fix it LMAO
         queue_flight_mode(ship_symbol, ShipNavFlightMode.BURN)
@@ -356,26 +522,17 @@ class SystemTradeStrategy:
         self.waypoints_with_marketplace = filter_waypoints_by_traits(
             list(self.target_waypoints.values()), traits=[WaypointTraitSymbol.MARKETPLACE]
         )
-        self.reset_visited_marketplaces()
-
-        ship = self.__params.game_state.ships[ship_symbol]
-        destination = ship.nav.route.destination
-        destination_symbol = destination.symbol
-
-        unvisited = self.get_unvisited_market_places()
+        if ship_symbol not in self.__market_updaters:
+            self.__market_updaters.append(ship_symbol)
 
-        nearest_wp = get_nearest_waypoint_from(
-            (destination.x, destination.y),
-            unvisited
-        )
+        # markets left in this round are re-split to include the new updater
+        self.plan_scan_round()
+        idle, self.__idle_updaters = self.__idle_updaters - {ship_symbol}, set()
 
         queue_orbit(ship_symbol)
-        # if a ship is already at the nearest market, fetch it and move on
-        if destination_symbol == nearest_wp.symbol:
-            logger.debug(f"{ship_symbol} is on nearest {nearest_wp.symbol}")
-            self.handle_navigate_market_update(ship_symbol)
-        else:
-            queue_navigate(ship_symbol, nearest_wp.symbol, record_to=self.__pending_navigate_market)
+        self.__scan_next_market(ship_symbol)
+        for idle_symbol in idle:
+            self.__scan_next_market(idle_symbol)
 
     def assign_ship_standby(self, ship_symbol: str):
         """
@@ -387,4 +544,6 @@ class SystemTradeStrategy:
     def assign_system(self, system_symbol: str):
         self.target_system = system_symbol
         self.target_waypoints = {wp.symbol: wp for wp in load_system_waypoints(system_symbol)}
+        # distances and nearest lookups of the tour and route scoring go through the index
+        self.spatial_index = SpatialIndex(self.target_waypoints.values())
         logger.debug(f"Assigned trade system: {self.target_system}")
@@ -1,11 +1,256 @@
-# strategy for probe to survey learn systems in the jump gate;
-# ideally should be done when persistence is set up to store system data not in the damned json;
-# aimed at discovering markets for cross-system trade and shipyards for other ship types
+# strategy for probes to explore systems through jump gates: every visited system gets its waypoints, markets,
+# shipyards and jump gate fetched into the store, charting the gate extends the system graph with new frontier.
+# probes pick the next system by expected value - markets and shipyards (or just waypoints, when their traits aren't
+# known yet) per hour of travel, with systems near the base preferred - and claim it, so several probes spread out.
+# all fetches go to the background lane under their own origin, so exploring never takes requests from the fleet.
+# events that fail for good release the claim of their system, so it doesn't stay claimed by a stalled probe
+from datetime import datetime, timezone
+from functools import partial
+
+from loguru import logger
+from pony.orm import db_session
+
+from database.store import get_system_symbol, get_jump_gate_symbol, get_system_summaries
+from event_queue import QueueEvent, EventFuture, origin_scope
+from global_params import GlobalParams
+from handle_result import HandleResult
+from market_history import HOUR
+from printers import INFO_PREFIX, SUCCESS_PREFIX, FAIL_PREFIX
+from space_traders_api_client.models import (
+    Waypoint, WaypointType, WaypointTraitSymbol, NavigateShipResponse200Data, JumpShipResponse200Data, JumpGate
+)
+from strategies.base_strategy import (
+    queue_orbit, queue_navigate, queue_jump, queue_fetch_system, queue_fetch_system_waypoints, queue_fetch_market,
+    queue_fetch_shipyard, queue_fetch_jump_gate
+)
+from system_graph import TravelProfile, SystemHop
+
+EXPLORATION_ORIGIN = "exploration"
+# only this many nearest unexplored systems are scored
+MAX_CANDIDATES = 50
+# a shipyard is worth this many markets
+SHIPYARD_VALUE = 3.0
+# share of waypoints expected to be markets, for systems whose traits aren't stored yet
+EXPECTED_MARKET_SHARE = 0.15
+# hours of distance from the base weigh this much against hours of travel
+BASE_DISTANCE_WEIGHT = 0.5
+
 
 class JumpGateSurveyor:
-    def __init__(self, starting_system: str):
+    def __init__(self, params: GlobalParams, starting_system: str | None = None):
+        self.__params = params
         self.starting_system = starting_system
         self.starting_jump_gate = None
 
+        # probe to the system it is exploring or heading to
+        self.probes: dict[str, str | None] = {}
+        # systems explored by this run; ones with gates charted by previous runs are in the system graph
+        self.explored: set[str] = set()
+        # systems a probe is heading to or exploring
+        self.__claimed: set[str] = set()
+
+    def is_unexplored(self, system_symbol: str) -> bool:
+        return (
+            system_symbol not in self.explored and system_symbol not in self.__claimed
+            and system_symbol not in self.__params.system_graph.charted
+        )
+
+    # completion callbacks, attached to the events this strategy queues
+
+    def on_system_waypoints(self, ship_symbol: str, event: QueueEvent, response: list[Waypoint]):
+        with self.__params.lock:
+            self.handle_system_waypoints(ship_symbol, event.args[0], response)
+
+    def on_jump_gate(self, ship_symbol: str | None, system_symbol: str, event: QueueEvent, response: JumpGate):
+        with self.__params.lock:
+            self.handle_system_explored(ship_symbol, system_symbol)
+
+    def on_failed(self, ship_symbol: str | None, system_symbol: str | None, stand_by: bool, future: EventFuture):
+        if future.cancelled() or future.exception() is None or system_symbol is None:
+            return
+
+        with self.__params.lock:
+            logger.warning(f"[exploration] {future.event} failed: {future.exception()}")
+            if system_symbol not in self.explored:
+                self.__claimed.discard(system_symbol)
+            # probe may have been released or moved on in the meantime
+            if ship_symbol is None or self.probes.get(ship_symbol, None) != system_symbol:
+                return
+
+            if stand_by:
+                # ship is in an unknown state, travelling on would likely fail again
+                self.probes[ship_symbol] = None
+                self.__params.console.print(
+                    f"{FAIL_PREFIX}[ship]{ship_symbol}[/] failed to reach [system]{system_symbol}[/], standing by"
+                )
+            else:
+                self.travel_to_next(ship_symbol)
+
+    def on_navigate_gate(self, ship_symbol: str, hops: list[SystemHop], event: QueueEvent,
+                         response: NavigateShipResponse200Data):
+        with self.__params.lock:
+            self.__queue_next_jump(ship_symbol, hops, response.nav.route.arrival)
+
+    def on_jump(self, ship_symbol: str, hops: list[SystemHop], event: QueueEvent, response: JumpShipResponse200Data):
+        system_symbol = event.args[1]
+        with self.__params.lock:
+            if hops:
+                # systems on the way are explored while the jump drive cools down
+                if self.is_unexplored(system_symbol):
+                    self.__claimed.add(system_symbol)
+                    self.explore_system(ship_symbol, system_symbol, continue_travel=False)
+                self.__queue_next_jump(ship_symbol, hops, response.cooldown.expiration)
+            else:
+                self.explore_system(ship_symbol, system_symbol)
+
+    @origin_scope(EXPLORATION_ORIGIN)
     def assign_probe(self, ship_symbol: str):
-        pass
+        ship = self.__params.game_state.ships[ship_symbol]
+        if self.starting_system is None:
+            self.starting_system = get_system_symbol(self.__params.game_state.agent.headquarters)
+        if self.starting_jump_gate is None:
+            with db_session:
+                self.starting_jump_gate = get_jump_gate_symbol(self.starting_system)
+
+        self.probes[ship_symbol] = None
+        system_symbol = ship.nav.system_symbol
+        queue_orbit(ship_symbol)
+        if system_symbol not in self.__params.system_graph:
+            # routes start from the system's position, unknown unless it has been fetched or crawled
+            queue_fetch_system(system_symbol)
+        if self.is_unexplored(system_symbol):
+            self.__claimed.add(system_symbol)
+            self.explore_system(ship_symbol, system_symbol)
+        else:
+            self.travel_to_next(ship_symbol)
+
+    def explore_system(self, ship_symbol: str, system_symbol: str, continue_travel: bool = True):
+        """
+        Fetches waypoints of the system, then its markets, shipyards and the jump gate.
+        Probe moves on once the gate is charted, unless it is only passing through
+        """
+        logger.debug(f"[exploration] {ship_symbol} explores {system_symbol}")
+        if continue_travel:
+            self.probes[ship_symbol] = system_symbol
+        on_done = partial(self.on_system_waypoints, ship_symbol) if continue_travel else self.on_passing_waypoints
+        future = queue_fetch_system_waypoints(system_symbol, on_done=on_done)
+        future.add_done_callback(
+            partial(self.on_failed, ship_symbol if continue_travel else None, system_symbol, False)
+        )
+
+    def on_passing_waypoints(self, event: QueueEvent, response: list[Waypoint]):
+        with self.__params.lock:
+            self.handle_system_waypoints(None, event.args[0], response)
+
+    def handle_system_waypoints(self, ship_symbol: str | None, system_symbol: str, waypoints: list[Waypoint]):
+        gate = None
+        for waypoint in waypoints:
+            traits = {trait.symbol for trait in waypoint.traits}
+            if WaypointTraitSymbol.MARKETPLACE in traits:
+                queue_fetch_market(waypoint.symbol)
+            if WaypointTraitSymbol.SHIPYARD in traits:
+                queue_fetch_shipyard(waypoint.symbol)
+            if waypoint.type == WaypointType.JUMP_GATE:
+                gate = waypoint.symbol
+
+        if gate is None:
+            # nothing to chart, nowhere to jump from
+            logger.warning(f"[exploration] {system_symbol} has no jump gate")
+            self.handle_system_explored(ship_symbol, system_symbol)
+            return
+
+        if system_symbol == self.starting_system:
+            self.starting_jump_gate = gate
+        future = queue_fetch_jump_gate(gate, on_done=partial(self.on_jump_gate, ship_symbol, system_symbol))
+        future.add_done_callback(partial(self.on_failed, ship_symbol, system_symbol, False))
+
+    def handle_system_explored(self, ship_symbol: str | None, system_symbol: str):
+        self.explored.add(system_symbol)
+        self.__claimed.discard(system_symbol)
+        self.__params.console.print(
+            f"{SUCCESS_PREFIX}Explored [system]{system_symbol}[/] ({len(self.explored)} systems explored)"
+        )
+        if ship_symbol is not None and ship_symbol in self.probes:
+            self.travel_to_next(ship_symbol)
+
+    def get_candidates(self, system_symbol: str, profile: TravelProfile) -> list[tuple[float, str]]:
+        """
+        Unexplored systems reachable from system_symbol as (score, system), best first
+        """
+        graph = self.__params.system_graph
+        reachable = sorted(
+            (cost, symbol) for symbol, cost in graph.get_costs(system_symbol, profile).items()
+            if self.is_unexplored(symbol)
+        )[:MAX_CANDIDATES]
+        if not reachable:
+            return []
+
+        base_costs = graph.get_costs(self.starting_system, profile) if self.starting_system else {}
+        with db_session:
+            summaries = get_system_summaries([symbol for _, symbol in reachable])
+
+        candidates = []
+        for cost, symbol in reachable:
+            waypoints, markets, shipyards, crawled = summaries.get(symbol, (0, 0, 0, False))
+            if crawled:
+                value = markets + SHIPYARD_VALUE * shipyards
+            else:
+                value = max(waypoints, 1) * EXPECTED_MARKET_SHARE
+            base_cost = base_costs.get(symbol, cost)
+            hours = (cost + BASE_DISTANCE_WEIGHT * base_cost) / HOUR
+            candidates.append((value / (1 + hours), symbol))
+        candidates.sort(reverse=True)
+        return candidates
+
+    @origin_scope(EXPLORATION_ORIGIN)
+    def travel_to_next(self, ship_symbol: str):
+        ship = self.__params.game_state.ships[ship_symbol]
+        system_symbol = ship.nav.system_symbol
+        profile = TravelProfile(ship.engine.speed)
+
+        for _, target in self.get_candidates(system_symbol, profile):
+            hops = self.__params.system_graph.find_path(system_symbol, target, profile)
+            if hops:
+                break
+        else:
+            self.probes[ship_symbol] = None
+            self.__params.console.print(
+                f"{INFO_PREFIX}[ship]{ship_symbol}[/] has no reachable unexplored systems left, standing by"
+            )
+            return
+
+        with db_session:
+            gate = get_jump_gate_symbol(system_symbol)
+        if gate is None:
+            self.probes[ship_symbol] = None
+            logger.error(f"[exploration] {ship_symbol} can't find jump gate of {system_symbol}, standing by")
+            return
+
+        self.__claimed.add(target)
+        self.probes[ship_symbol] = target
+        logger.debug(f"[exploration] {ship_symbol} heads to {target} in {len(hops)} jumps")
+
+        if ship.nav.waypoint_symbol != gate:
+            future = queue_navigate(ship_symbol, gate, on_done=partial(self.on_navigate_gate, ship_symbol, hops))
+            future.add_done_callback(partial(self.on_failed, ship_symbol, target, True))
+        else:
+            self.__queue_next_jump(ship_symbol, hops, None)
+
+    def __queue_next_jump(self, ship_symbol: str, hops: list[SystemHop], when: datetime | None):
+        # jumping during the cooldown fails for good, so the jump waits for it
+        cooldown = self.__params.game_state.ships[ship_symbol].additional_properties.get("cooldown", None)
+        if cooldown is not None and cooldown.expiration > datetime.now(tz=timezone.utc):
+            when = cooldown.expiration if when is None else max(when, cooldown.expiration)
+
+        hop, rest = hops[0], hops[1:]
+        future = queue_jump(ship_symbol, hop.destination, when=when, on_done=partial(self.on_jump, ship_symbol, rest))
+        future.add_done_callback(partial(self.on_failed, ship_symbol, self.probes.get(ship_symbol, None), True))
+
+    def release_probe(self, ship_symbol: str) -> HandleResult:
+        target = self.probes.pop(ship_symbol, None)
+        if target is None:
+            return HandleResult.FAIL
+        if target not in self.explored:
+            self.__claimed.discard(target)
+        self.__params.event_queue.cancel_for_ship(ship_symbol)
+        return HandleResult.SUCCESS
@@ -0,0 +1,292 @@
+# galaxy graph for cross-system routing: systems are nodes, charted jump gates and warps within range are edges.
+# shortest path trees (dijkstra, by travel seconds) are cached per (source, travel profile), so repeated routing
+# is a walk up the tree; charting a gate only repairs the parts of cached trees the new link improves.
+# one-off queries without a cached tree run A* with a straight line heuristic
+from dataclasses import dataclass, field
+from heapq import heappush, heappop
+from math import dist, inf, ceil
+from threading import Lock
+from typing import Iterable, Iterator
+
+JUMP = "jump"
+WARP = "warp"
+# the cooldown after a jump grows with its distance
+JUMP_COOLDOWN_PER_DISTANCE = 0.1
+MIN_JUMP_COOLDOWN = 60.0
+# warps fly in CRUISE, burning a unit of fuel per distance
+WARP_MULTIPLIER = 50.0
+# side of the cells the systems are bucketed in for warp range lookups
+WARP_GRID_CELL = 500
+
+
+def get_jump_seconds(distance: float) -> float:
+    return max(MIN_JUMP_COOLDOWN, distance * JUMP_COOLDOWN_PER_DISTANCE)
+
+
+def get_warp_seconds(distance: float, speed: float) -> float:
+    return 15 + max(1, round(distance)) * WARP_MULTIPLIER / max(speed, 1)
+
+
+@dataclass(frozen=True, slots=True)
+class TravelProfile:
+    """
+    What a ship can do between systems; warp_range is its fuel capacity, 0 without a warp drive
+    """
+    speed: float
+    warp_range: int = 0
+    can_jump: bool = True
+
+
+@dataclass(slots=True)
+class SystemHop:
+    origin: str
+    destination: str
+    kind: str
+    distance: float
+    seconds: float
+
+
+@dataclass(slots=True)
+class PathTree:
+    source: str
+    costs: dict[str, float] = field(default_factory=dict)
+    # system to the hop reaching it
+    hops: dict[str, SystemHop] = field(default_factory=dict)
+
+
+class SystemGraph:
+    def __init__(self):
+        self.__lock = Lock()
+        self.coords: dict[str, tuple[int, int]] = {}
+        # symmetric, gates link systems within range of each other
+        self.jumps: dict[str, dict[str, float]] = {}
+        # systems whose jump gate connections are known
+        self.charted: set[str] = set()
+
+        self.__grid: dict[tuple[int, int], list[str]] = {}
+        # gates charted in systems whose position isn't known yet, linked once it is
+        self.__pending_gates: dict[str, list[tuple[str, int, int]]] = {}
+        self.__trees: dict[tuple[str, TravelProfile], PathTree] = {}
+
+    def __len__(self) -> int:
+        return len(self.coords)
+
+    def __contains__(self, system_symbol: str) -> bool:
+        return system_symbol in self.coords
+
+    def load(self, systems: Iterable[tuple[str, int, int]], links: Iterable[tuple[str, str]]):
+        """
+        Fills the graph from stored (system, x, y) and (gate system, connected system) entries
+        """
+        with self.__lock:
+            for symbol, x, y in systems:
+                self.__add_system(symbol, x, y)
+            for system, connected in links:
+                if system in self.coords and connected in self.coords:
+                    self.__add_link(system, connected)
+                    self.charted.add(system)
+            self.__trees.clear()
+
+    # changes
+
+    def add_systems(self, systems: Iterable[tuple[str, int, int]]):
+        with self.__lock:
+            new = [symbol for symbol, x, y in systems if self.__add_system(symbol, x, y)]
+            for symbol in new:
+                self.__repair_new_system(symbol)
+                if symbol in self.__pending_gates:
+                    self.__add_gate(symbol, self.__pending_gates.pop(symbol))
+
+    def add_gate(self, system: str, connected: Iterable[tuple[str, int, int]]):
+        """
+        Charts jump gate connections of a system; cached trees are repaired where the new links are shorter
+        """
+        with self.__lock:
+            if system not in self.coords:
+                self.__pending_gates[system] = list(connected)
+                return
+            self.__add_gate(system, connected)
+
+    def __add_gate(self, system: str, connected: Iterable[tuple[str, int, int]]):
+        self.charted.add(system)
+        for symbol, x, y in connected:
+            if self.__add_system(symbol, x, y):
+                self.__repair_new_system(symbol)
+            if symbol in self.jumps.get(system, {}):
+                continue
+            self.__add_link(system, symbol)
+            self.__repair_link(system, symbol)
+
+    def __add_system(self, symbol: str, x: int, y: int) -> bool:
+        if symbol in self.coords:
+            return False
+        self.coords[symbol] = (x, y)
+        self.__grid.setdefault((x // WARP_GRID_CELL, y // WARP_GRID_CELL), []).append(symbol)
+        return True
+
+    def __add_link(self, system: str, connected: str):
+        distance = dist(self.coords[system], self.coords[connected])
+        self.jumps.setdefault(system, {})[connected] = distance
+        self.jumps.setdefault(connected, {})[system] = distance
+
+    def __repair_link(self, system: str, connected: str):
+        for (source, profile), tree in self.__trees.items():
+            if not profile.can_jump:
+                continue
+            distance = self.jumps[system][connected]
+            seconds = get_jump_seconds(distance)
+            for origin, destination in ((system, connected), (connected, system)):
+                cost = tree.costs.get(origin, inf) + seconds
+                if cost < tree.costs.get(destination, inf):
+                    hop = SystemHop(origin, destination, JUMP, distance, seconds)
+                    self.__relax(tree, profile, [(cost, destination, hop)])
+
+    def __repair_new_system(self, symbol: str):
+        # a new system is only reachable by warp until its gate is charted
+        for (source, profile), tree in self.__trees.items():
+            if profile.warp_range <= 0:
+                continue
+            seeds = []
+            for neighbour, distance in self.__get_warp_neighbours(symbol, profile.warp_range):
+                if neighbour in tree.costs:
+                    seconds = get_warp_seconds(distance, profile.speed)
+                    hop = SystemHop(neighbour, symbol, WARP, distance, seconds)
+                    seeds.append((tree.costs[neighbour] + seconds, symbol, hop))
+            if seeds:
+                self.__relax(tree, profile, seeds)
+
+    # routing
+
+    def __get_warp_neighbours(self, system: str, warp_range: int) -> Iterator[tuple[str, float]]:
+        x, y = self.coords[system]
+        cells = ceil(warp_range / WARP_GRID_CELL)
+        cell_x, cell_y = x // WARP_GRID_CELL, y // WARP_GRID_CELL
+        for grid_x in range(cell_x - cells, cell_x + cells + 1):
+            for grid_y in range(cell_y - cells, cell_y + cells + 1):
+                for neighbour in self.__grid.get((grid_x, grid_y), ()):
+                    distance = dist((x, y), self.coords[neighbour])
+                    if neighbour != system and distance <= warp_range:
+                        yield neighbour, distance
+
+    def __get_hops(self, system: str, profile: TravelProfile) -> Iterator[SystemHop]:
+        if profile.can_jump:
+            for neighbour, distance in self.jumps.get(system, {}).items():
+                yield SystemHop(system, neighbour, JUMP, distance, get_jump_seconds(distance))
+        if profile.warp_range > 0:
+            for neighbour, distance in self.__get_warp_neighbours(system, profile.warp_range):
+                yield SystemHop(system, neighbour, WARP, distance, get_warp_seconds(distance, profile.speed))
+
+    def __relax(self, tree: PathTree, profile: TravelProfile, seeds: list[tuple[float, str, SystemHop | None]]):
+        """
+        Dijkstra from seeds, only ever lowering costs - builds a tree from scratch, or repairs one after a new link
+        """
+        heap = []
+        for cost, system, hop in seeds:
+            if cost < tree.costs.get(system, inf):
+                tree.costs[system] = cost
+                if hop is not None:
+                    tree.hops[system] = hop
+                heappush(heap, (cost, system))
+
+        while heap:
+            cost, system = heappop(heap)
+            if cost > tree.costs[system]:
+                continue
+            for hop in self.__get_hops(system, profile):
+                next_cost = cost + hop.seconds
+                if next_cost < tree.costs.get(hop.destination, inf):
+                    tree.costs[hop.destination] = next_cost
+                    tree.hops[hop.destination] = hop
+                    heappush(heap, (next_cost, hop.destination))
+
+    def get_path_tree(self, source: str, profile: TravelProfile) -> PathTree | None:
+        """
+        Shortest paths from source to every reachable system, cached until the profile changes
+        """
+        with self.__lock:
+            if source not in self.coords:
+                return None
+            tree = self.__trees.get((source, profile), None)
+            if tree is None:
+                tree = self.__trees[(source, profile)] = PathTree(source)
+                self.__relax(tree, profile, [(0.0, source, None)])
+            return tree
+
+    def find_path(self, source: str, destination: str, profile: TravelProfile) -> list[SystemHop] | None:
+        """
+        Fastest hops from source to destination, None when unreachable.
+        Walks a cached tree of the source when there is one, otherwise runs A*
+        """
+        with self.__lock:
+            if source not in self.coords or destination not in self.coords:
+                return None
+            if source == destination:
+                return []
+
+            tree = self.__trees.get((source, profile), None)
+            if tree is not None:
+                return self.__walk_tree(tree, destination)
+            return self.__a_star(source, destination, profile)
+
+    @staticmethod
+    def __walk_tree(tree: PathTree, destination: str) -> list[SystemHop] | None:
+        if destination not in tree.costs:
+            return None
+        hops = []
+        while destination != tree.source:
+            hop = tree.hops[destination]
+            hops.append(hop)
+            destination = hop.origin
+        hops.reverse()
+        return hops
+
+    def __a_star(self, source: str, destination: str, profile: TravelProfile) -> list[SystemHop] | None:
+        # seconds per distance no hop can beat, keeping the heuristic admissible
+        rates = []
+        if profile.can_jump:
+            rates.append(JUMP_COOLDOWN_PER_DISTANCE)
+        if profile.warp_range > 0:
+            rates.append(WARP_MULTIPLIER / max(profile.speed, 1))
+        if not rates:
+            return None
+        rate = min(rates)
+        target = self.coords[destination]
+
+        costs = {source: 0.0}
+        hops: dict[str, SystemHop] = {}
+        heap = [(dist(self.coords[source], target) * rate, source)]
+        closed = set()
+        while heap:
+            _, system = heappop(heap)
+            if system == destination:
+                tree = PathTree(source, costs, hops)
+                return self.__walk_tree(tree, destination)
+            if system in closed:
+                continue
+            closed.add(system)
+
+            for hop in self.__get_hops(system, profile):
+                cost = costs[system] + hop.seconds
+                if cost < costs.get(hop.destination, inf):
+                    costs[hop.destination] = cost
+                    hops[hop.destination] = hop
+                    heappush(heap, (cost + dist(self.coords[hop.destination], target) * rate, hop.destination))
+        return None
+
+    def get_costs(self, source: str, profile: TravelProfile) -> dict[str, float]:
+        """
+        Travel seconds from source to every reachable system, copied from the cached tree
+        """
+        tree = self.get_path_tree(source, profile)
+        if tree is None:
+            return {}
+        with self.__lock:
+            return dict(tree.costs)
+
+    def get_uncharted(self, source: str, profile: TravelProfile) -> list[str]:
+        """
+        Reachable systems whose gates aren't charted yet, nearest first
+        """
+        costs = self.get_costs(source, profile)
+        with self.__lock:
+            return sorted((system for system in costs if system not in self.charted), key=costs.get)
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+from game_state import GameState, CargoChange, CreditsChange, StatusChange
+from space_traders_api_client.models import (
+    Agent, Ship, ShipNav, ShipNavRoute, ShipNavRouteWaypoint, ShipNavStatus, ShipFuel, ShipCargo, ShipCargoItem,
+    WaypointType
+)
+
+WHEN = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_nav(status: ShipNavStatus) -> ShipNav:
+    waypoint = ShipNavRouteWaypoint("X1-A1-B2", WaypointType.PLANET, "X1-A1", 0, 0)
+    return ShipNav("X1-A1", "X1-A1-B2", ShipNavRoute(waypoint, waypoint, WHEN, WHEN), status)
+
+
+def make_cargo(units: int) -> ShipCargo:
+    inventory = [ShipCargoItem("IRON_ORE", "Iron ore", "", units)] if units else []
+    return ShipCargo(40, units, inventory)
+
+
+def make_game_state() -> GameState:
+    game_state = GameState()
+    game_state.update_agent(Agent("account", "AGENT", "X1-A1-B2", 1000))
+    game_state.put_ships([Ship(
+        symbol="SHIP-1", registration=None, nav=make_nav(ShipNavStatus.IN_ORBIT), crew=None, frame=None,
+        reactor=None, engine=None, modules=[], mounts=[], cargo=make_cargo(0), fuel=ShipFuel(100, 100),
+    )])
+    return game_state
+
+
+def test_subscribers_receive_changes_of_their_type():
+    game_state = make_game_state()
+    received = []
+    for change_type in (CargoChange, CreditsChange, StatusChange):
+        game_state.subscribe(change_type, received.append)
+
+    game_state.update_ship("SHIP-1", nav=make_nav(ShipNavStatus.DOCKED))
+    game_state.update_ship("SHIP-1", cargo=make_cargo(10))
+    game_state.update_agent(Agent("account", "AGENT", "X1-A1-B2", 900))
+
+    status, cargo, credits = received
+    assert isinstance(status, StatusChange)
+    assert (status.previous, status.status) == (ShipNavStatus.IN_ORBIT, ShipNavStatus.DOCKED)
+    assert isinstance(cargo, CargoChange) and cargo.deltas == {"IRON_ORE": 10}
+    assert isinstance(credits, CreditsChange) and credits.delta == -100
+
+
+def test_subscribers_skip_other_change_types():
+    game_state = make_game_state()
+    received = []
+    game_state.subscribe(CreditsChange, received.append)
+
+    game_state.update_ship("SHIP-1", nav=make_nav(ShipNavStatus.DOCKED), fuel=ShipFuel(90, 100))
+
+    assert received == []
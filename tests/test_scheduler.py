@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+from event_queue.event_types import EventType
+from event_queue.queue_event import QueueEvent
+from event_queue.scheduler import EventScheduler
+
+WHEN = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def ship_event(event_id: int, event_name: str, ship_symbol: str = "SHIP-1") -> QueueEvent:
+    return QueueEvent(id=event_id, event_type=EventType.SHIP, event_name=event_name, args=[ship_symbol])
+
+
+def test_steps_in_between_are_kept():
+    scheduler = EventScheduler()
+    events = [ship_event(1, "dock"), ship_event(2, "orbit"), ship_event(3, "dock")]
+    for event in events:
+        assert scheduler.push(WHEN, event) is event
+
+    assert len(scheduler) == 3
+    assert [event.event_name for event in scheduler.pop_due(WHEN)] == ["dock", "orbit", "dock"]
+
+
+def test_repeated_last_event_is_coalesced():
+    scheduler = EventScheduler()
+    dock = ship_event(1, "dock")
+    scheduler.push(WHEN, dock)
+
+    assert scheduler.push(WHEN, ship_event(2, "dock")) is dock
+    assert len(scheduler) == 1
+
+
+def test_other_ships_do_not_break_coalescing():
+    scheduler = EventScheduler()
+    dock = ship_event(1, "dock")
+    scheduler.push(WHEN, dock)
+    scheduler.push(WHEN, ship_event(2, "orbit", "SHIP-2"))
+
+    assert scheduler.push(WHEN, ship_event(3, "dock")) is dock
+    assert len(scheduler) == 2
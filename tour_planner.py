@@ -0,0 +1,160 @@
+# closed tours over a set of waypoints: nearest neighbour construction, improved by 2-opt and Or-opt moves.
+# works on indexes into a distance matrix (see SpatialIndex.distance_matrix); a tour may be split between several
+# ships as contiguous, similarly long parts
+import numpy as np
+
+# improvements smaller than this are float noise
+EPSILON = 1e-9
+
+
+def get_tour_length(tour: list[int], distances: np.ndarray, closed: bool = True) -> float:
+    if len(tour) < 2:
+        return 0.0
+    indexes = np.array(tour)
+    length = distances[indexes[:-1], indexes[1:]].sum()
+    if closed:
+        length += distances[indexes[-1], indexes[0]]
+    return float(length)
+
+
+def nearest_neighbour_tour(distances: np.ndarray, start: int = 0) -> list[int]:
+    count = len(distances)
+    visited = np.zeros(count, dtype=bool)
+    tour = [start]
+    visited[start] = True
+    for _ in range(count - 1):
+        row = np.where(visited, np.inf, distances[tour[-1]])
+        nearest = int(np.argmin(row))
+        tour.append(nearest)
+        visited[nearest] = True
+    return tour
+
+
+def two_opt(tour: list[int], distances: np.ndarray, max_passes: int = 50) -> list[int]:
+    """
+    Reverses tour sections while that shortens the tour; every candidate edge pair of a position is scored at once
+    """
+    tour = np.array(tour)
+    count = len(tour)
+    if count < 4:
+        return tour.tolist()
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(count - 2):
+            a, b = tour[i], tour[i + 1]
+            # edge (a, b) against every later edge (c, d) not adjacent to it
+            js = np.arange(i + 2, count if i > 0 else count - 1)
+            c = tour[js]
+            d = tour[(js + 1) % count]
+            deltas = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+            best = int(np.argmin(deltas))
+            if deltas[best] < -EPSILON:
+                j = js[best]
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return tour.tolist()
+
+
+def or_opt(tour: list[int], distances: np.ndarray, max_moves: int = 1000) -> list[int]:
+    """
+    Moves sections of 1-3 waypoints (possibly reversed) elsewhere in the tour while that shortens it
+    """
+    tour = list(tour)
+    count = len(tour)
+    if count < 5:
+        return tour
+
+    for _ in range(max_moves):
+        move = __find_or_opt_move(tour, distances)
+        if move is None:
+            break
+        start, length, position, reverse = move
+        section = tour[start:start + length]
+        rest = tour[:start] + tour[start + length:]
+        if reverse:
+            section.reverse()
+        tour = rest[:position + 1] + section + rest[position + 1:]
+    return tour
+
+
+def __find_or_opt_move(tour: list[int], distances: np.ndarray) -> tuple[int, int, int, bool] | None:
+    count = len(tour)
+    for length in (1, 2, 3):
+        for start in range(count - length + 1):
+            section = tour[start:start + length]
+            previous, following = tour[start - 1], tour[(start + length) % count]
+            removal_gain = (
+                distances[previous, section[0]] + distances[section[-1], following] - distances[previous, following]
+            )
+
+            rest = np.array(tour[:start] + tour[start + length:])
+            p, q = rest, np.roll(rest, -1)
+            forward = distances[p, section[0]] + distances[section[-1], q] - distances[p, q]
+            backward = distances[p, section[-1]] + distances[section[0], q] - distances[p, q]
+
+            best_forward, best_backward = int(np.argmin(forward)), int(np.argmin(backward))
+            if forward[best_forward] <= backward[best_backward]:
+                position, cost, reverse = best_forward, forward[best_forward], False
+            else:
+                position, cost, reverse = best_backward, backward[best_backward], True
+
+            if cost < removal_gain - EPSILON:
+                return start, length, position, reverse
+    return None
+
+
+def plan_tour(distances: np.ndarray, start: int = 0) -> list[int]:
+    """
+    Near-optimal closed tour over all indexes of the distance matrix, beginning at start
+    """
+    if len(distances) == 0:
+        return []
+
+    tour = nearest_neighbour_tour(distances, start)
+    # alternate until neither finds anything
+    while True:
+        length = get_tour_length(tour, distances)
+        tour = or_opt(two_opt(tour, distances), distances)
+        if get_tour_length(tour, distances) >= length - EPSILON:
+            break
+
+    offset = tour.index(start)
+    return tour[offset:] + tour[:offset]
+
+
+def split_tour(tour: list[int], distances: np.ndarray, parts: int) -> list[list[int]]:
+    """
+    Cuts a closed tour into contiguous paths, one per ship, keeping the longest path as short as possible
+    """
+    parts = max(1, min(parts, len(tour)))
+    if parts == 1:
+        return [list(tour)]
+
+    best_split, best_longest = None, np.inf
+    # every rotation is a different set of cut points
+    for offset in range(len(tour)):
+        rotated = tour[offset:] + tour[:offset]
+        split = __split_path(rotated, distances, parts)
+        longest = max(get_tour_length(path, distances, closed=False) for path in split)
+        if longest < best_longest:
+            best_split, best_longest = split, longest
+    return best_split
+
+
+def __split_path(path: list[int], distances: np.ndarray, parts: int) -> list[list[int]]:
+    target = get_tour_length(path, distances, closed=False) / parts
+    split = [[path[0]]]
+    length = 0.0
+    for index, waypoint in enumerate(path[1:], start=1):
+        remaining = len(path) - index
+        # start a new part once this one is long enough, while each of the rest still gets a waypoint
+        if len(split) < parts and (length >= target or remaining <= parts - len(split)):
+            split.append([waypoint])
+            length = 0.0
+        else:
+            length += distances[split[-1][-1], waypoint]
+            split[-1].append(waypoint)
+    return split
@@ -0,0 +1,212 @@
+# trade route search over every (source market, target market, resource) at once.
+# prices are laid out as (market x resource) matrices, so spreads, fuel costs and margins of all pairs of a resource
+# come out of a few array operations instead of a python loop per pair.
+# haulers are then spread over the best routes, as every extra hauler on a route moves its prices against us
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+# every trade_volume worth of units moved per trip shifts the prices by this fraction, against us
+PRICE_IMPACT = 0.05
+# docking, refueling and trading per trip, seconds
+TRIP_OVERHEAD = 60.0
+
+
+@dataclass(slots=True)
+class RouteCandidate:
+    resource_symbol: str
+    source_waypoint: str
+    target_waypoint: str
+    purchase_price: float
+    sell_price: float
+    # typical volume of the resource in source and target market
+    source_volume: int
+    target_volume: int
+    distance: float
+    # expected deviation of the per unit margin
+    price_risk: float
+    # margin of a full cargo, before and after fuel costs and price risk
+    raw_margin: float
+    trip_margin: float
+
+    def __str__(self):
+        return (
+            f"RouteCandidate[<{self.resource_symbol}> {self.source_waypoint} => {self.target_waypoint} "
+            f"{self.raw_margin:.0f}/{self.trip_margin:.0f}]"
+        )
+
+
+class MarketMatrix:
+    """
+    Prices of a set of markets as (market x resource) matrices; resources a market doesn't trade are masked out
+    """
+    def __init__(self, waypoints: list[str], resources: list[str]):
+        self.waypoints = waypoints
+        self.resources = resources
+        self.waypoint_index = {waypoint: index for index, waypoint in enumerate(waypoints)}
+        self.resource_index = {resource: index for index, resource in enumerate(resources)}
+
+        shape = (len(waypoints), len(resources))
+        self.purchase = np.zeros(shape)
+        self.sell = np.zeros(shape)
+        # expected deviation of the prices
+        self.purchase_risk = np.zeros(shape)
+        self.sell_risk = np.zeros(shape)
+        self.volume = np.zeros(shape, dtype=np.int64)
+        self.traded = np.zeros(shape, dtype=bool)
+
+    @classmethod
+    def from_entries(cls, entries: list[tuple[str, str, float, float, float, float, int]]) -> "MarketMatrix":
+        """
+        Builds from (waypoint, resource, purchase, sell, purchase risk, sell risk, volume) entries
+        """
+        matrix = cls(
+            sorted({entry[0] for entry in entries}),
+            sorted({entry[1] for entry in entries})
+        )
+        for waypoint, resource, purchase, sell, purchase_risk, sell_risk, volume in entries:
+            index = matrix.waypoint_index[waypoint], matrix.resource_index[resource]
+            matrix.purchase[index] = purchase
+            matrix.sell[index] = sell
+            matrix.purchase_risk[index] = purchase_risk
+            matrix.sell_risk[index] = sell_risk
+            matrix.volume[index] = volume
+            matrix.traded[index] = True
+        return matrix
+
+
+def find_top_routes(matrix: MarketMatrix, distances: np.ndarray, cargo_size: int, fuel_cost_per_distance: float,
+                    min_margin: float, top_k: int = 10) -> list[RouteCandidate]:
+    """
+    Best routes by trip margin over all market pairs, at most top_k of them.
+    distances are indexed by matrix.waypoints
+    """
+    fuel_costs = distances * fuel_cost_per_distance
+
+    # per resource only the markets trading it take part, keeping the pair matrices small
+    found_margins = []
+    found_routes = []
+    for resource_index in range(len(matrix.resources)):
+        markets = np.flatnonzero(matrix.traded[:, resource_index])
+        if len(markets) < 2:
+            continue
+
+        purchase = matrix.purchase[markets, resource_index]
+        sell = matrix.sell[markets, resource_index]
+        # rows are sources, columns targets
+        raw_margins = cargo_size * (sell[np.newaxis, :] - purchase[:, np.newaxis])
+        price_risk = cargo_size * (
+            matrix.purchase_risk[markets, resource_index][:, np.newaxis]
+            + matrix.sell_risk[markets, resource_index][np.newaxis, :]
+        )
+        trip_margins = raw_margins - fuel_costs[np.ix_(markets, markets)] - price_risk
+        # don't trade on the same waypoint
+        np.fill_diagonal(trip_margins, -np.inf)
+
+        sources, targets = np.nonzero(trip_margins >= min_margin)
+        if len(sources) == 0:
+            continue
+        margins = trip_margins[sources, targets]
+        if len(margins) > top_k:
+            best = np.argpartition(margins, -top_k)[-top_k:]
+            sources, targets, margins = sources[best], targets[best], margins[best]
+
+        found_margins.append(margins)
+        found_routes.extend(
+            (resource_index, markets[source], markets[target], raw_margins[source, target], price_risk[source, target])
+            for source, target in zip(sources, targets)
+        )
+
+    if not found_routes:
+        return []
+
+    margins = np.concatenate(found_margins)
+    order = np.argsort(-margins, kind="stable")[:top_k]
+
+    candidates = []
+    for index in order:
+        resource_index, source, target, raw_margin, price_risk = found_routes[index]
+        candidates.append(RouteCandidate(
+            resource_symbol=matrix.resources[resource_index],
+            source_waypoint=matrix.waypoints[source],
+            target_waypoint=matrix.waypoints[target],
+            purchase_price=float(matrix.purchase[source, resource_index]),
+            sell_price=float(matrix.sell[target, resource_index]),
+            source_volume=int(matrix.volume[source, resource_index]),
+            target_volume=int(matrix.volume[target, resource_index]),
+            distance=float(distances[source, target]),
+            price_risk=float(price_risk) / cargo_size,
+            raw_margin=float(raw_margin),
+            trip_margin=float(margins[index]),
+        ))
+    return candidates
+
+
+@dataclass(slots=True)
+class HaulerProfile:
+    ship_symbol: str
+    cargo_capacity: int
+    speed: float
+
+
+def get_trip_hours(distance: float, speed: float) -> float:
+    """
+    Round trip in CRUISE mode
+    """
+    one_way = 15 + distance * 25 / max(speed, 1)
+    return (2 * one_way + TRIP_OVERHEAD) / 3600
+
+
+def get_marginal_profit(route: RouteCandidate, bought_units: int, sold_units: int, hauler: HaulerProfile,
+                        fuel_cost_per_distance: float) -> float:
+    """
+    Profit per hour the hauler adds on top of haulers already buying bought_units of the resource at the source
+    and selling sold_units of it at the target - over this route or any other sharing the market.
+    Buying raises the source price and selling lowers the target price, so every next hauler earns less
+    """
+    buy_impact = PRICE_IMPACT * route.purchase_price / max(route.source_volume, 1)
+    sell_impact = PRICE_IMPACT * route.sell_price / max(route.target_volume, 1)
+    units = hauler.cargo_capacity
+    # the hauler moves the next units through both markets, on average impacted by their midpoint
+    unit_margin = (
+        route.sell_price - route.purchase_price - route.price_risk
+        - buy_impact * (bought_units + units / 2) - sell_impact * (sold_units + units / 2)
+    )
+    trip_profit = units * unit_margin - route.distance * fuel_cost_per_distance
+    return trip_profit / get_trip_hours(route.distance, hauler.speed)
+
+
+def assign_routes(routes: list[RouteCandidate], haulers: list[HaulerProfile],
+                  fuel_cost_per_distance: float) -> dict[str, RouteCandidate]:
+    """
+    Spreads haulers over routes to maximize fleet profit per hour: greedily takes the (hauler, route) pair
+    adding the most, with markets getting less profitable as more cargo of a resource goes through them.
+    Haulers that would make no profit anywhere are left out
+    """
+    assignment: dict[str, RouteCandidate] = {}
+    # (waypoint, resource) to units bought there / sold there per trip by assigned haulers
+    bought_units: Counter[tuple[str, str]] = Counter()
+    sold_units: Counter[tuple[str, str]] = Counter()
+    unassigned = list(haulers)
+
+    while unassigned:
+        best = None
+        for hauler in unassigned:
+            for route in routes:
+                profit = get_marginal_profit(
+                    route, bought_units[(route.source_waypoint, route.resource_symbol)],
+                    sold_units[(route.target_waypoint, route.resource_symbol)], hauler, fuel_cost_per_distance
+                )
+                if profit > 0 and (best is None or profit > best[0]):
+                    best = profit, hauler, route
+        if best is None:
+            break
+
+        _, hauler, route = best
+        assignment[hauler.ship_symbol] = route
+        bought_units[(route.source_waypoint, route.resource_symbol)] += hauler.cargo_capacity
+        sold_units[(route.target_waypoint, route.resource_symbol)] += hauler.cargo_capacity
+        unassigned.remove(hauler)
+
+    return assignment